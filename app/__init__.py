@@ -3,6 +3,16 @@ from flask_session import Session
 
 from app.config import Config
 from app.routes import game_routes
+from app.services.game_history import GameHistory
+from app.services.game_registry import GameRegistry
+from app.services.matchmaking import Matchmaker
+from app.services.status_cache import StatusCache
+from app.simulation.lookahead import configure_expert
+from app.storage.factory import create_store
+from app.storage.history_store import HistoryStore
+from app.utils.game_logger import configure_game_logging
+from app.utils.metrics import configure_metrics
+from app.utils.profiling import configure_profiling
 
 
 def create_app(config_class=Config):
@@ -22,7 +32,34 @@ def create_app(config_class=Config):
         app.config['SESSION_TYPE'] = 'filesystem'
         app.config['SESSION_FILE_DIR'] = '.flask_session'
         app.secret_key = 'SECRET_KEY'
-    Session(app)  # Initialize Flask-Session for this app
+    if app.config.get('SESSION_TYPE') != 'cookie':
+        Session(app)  # Initialize Flask-Session for this app
+    app.extensions['game_store'] = create_store(app.config)
+    app.extensions['game_history'] = None
+    if app.config.get('HISTORY_ENABLED', True):
+        app.extensions['game_history'] = GameHistory(
+            HistoryStore(app.config.get('HISTORY_DB_PATH', 'flaskgame_history.db')),
+            batch_size=app.config.get('HISTORY_BATCH_SIZE', 500),
+            flush_interval=app.config.get('HISTORY_FLUSH_INTERVAL', 1),
+            refresh_interval=app.config.get('LEADERBOARD_REFRESH_INTERVAL', 10),
+            limit=app.config.get('LEADERBOARD_SIZE', 10),
+        )
+    app.extensions['game_registry'] = GameRegistry(
+        app.extensions['game_store'],
+        lock_shards=app.config.get('GAME_LOCK_SHARDS', 64),
+        maxsize=app.config.get('GAME_REGISTRY_SIZE', 1024),
+        idle_timeout=app.config.get('GAME_IDLE_TIMEOUT', 300),
+        sweep_interval=app.config.get('GAME_SWEEP_INTERVAL', 60),
+        state_format=app.config.get('STATE_FORMAT', 'piles'),
+        history=app.extensions['game_history'],
+    )
+    app.extensions['matchmaker'] = Matchmaker(app.extensions['game_registry'],
+                                              max_wait=app.config.get('MATCH_MAX_WAIT', 60))
+    app.extensions['status_cache'] = StatusCache(app.config.get('STATUS_CACHE_SIZE', 1024))
+    configure_game_logging(app.config.get('GAME_LOG_LEVEL'))
+    configure_metrics(app.config)
+    configure_profiling(app.config)
+    configure_expert(app.config)
 
     # Register blueprints
     app.register_blueprint(game_routes.game_blueprint)
@@ -0,0 +1,204 @@
+import asyncio
+import contextvars
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.exceptions import HTTPException
+
+from app import create_app
+from app.config import Config
+
+# Largest request body accepted; game requests are a few hundred bytes.
+MAX_BODY_SIZE = 64 * 1024
+
+# Endpoints whose responses are long-lived streams, handled in the stream pool.
+STREAM_ENDPOINTS = frozenset({'game.game_events', 'game.game_replay'})
+
+
+class GameASGIApp:
+    """
+    ASGI application serving the Flask app, so an ASGI server such as uvicorn can hold
+    many connections in one process.
+
+    Every request is handled by the Flask app itself (same routes, sessions, validation
+    and hooks) in a pool of `threads` worker threads; the event loop only reads requests
+    and writes responses. A connection therefore only takes a thread while a request is
+    being handled: idle keep-alive connections and clients between two polls take none,
+    and the game work of a request (e.g. the expert opponent's rollouts, or replaying a
+    game) never blocks the other connections.
+
+    Streamed responses (the STREAM_ENDPOINTS: /events and /replay) are read one chunk
+    at a time in a pool of their own, of `stream_threads` threads, since an open /events
+    stream holds a thread while it waits for the next change. However many streams are
+    open, the other requests keep their pool; streams opened while every stream thread
+    is busy start as soon as one closes. A stream is closed at the next chunk after its
+    client went away.
+
+    Attributes:
+        flask_app (Flask): The Flask application.
+        threads (int): Number of worker threads for requests.
+        stream_threads (int): Number of worker threads for streamed responses.
+    """
+
+    def __init__(self, flask_app, threads=None, stream_threads=None):
+        """
+        Initializes the application.
+
+        Args:
+            flask_app (Flask): The Flask application, as built by `create_app`.
+            threads (int, optional): Number of worker threads for requests. Defaults to
+                the app's ASGI_THREADS setting.
+            stream_threads (int, optional): Number of worker threads for streamed
+                responses. Defaults to the app's ASGI_STREAM_THREADS setting.
+        """
+        self.flask_app = flask_app
+        self.threads = threads or flask_app.config.get('ASGI_THREADS', 64)
+        self.stream_threads = stream_threads or flask_app.config.get('ASGI_STREAM_THREADS', 256)
+        self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='asgi')
+        self._stream_executor = ThreadPoolExecutor(max_workers=self.stream_threads,
+                                                   thread_name_prefix='asgi-stream')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self._executor.shutdown(wait=False)
+                self._stream_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        body = await self._read_body(receive)
+        if body is None:
+            payload = b'{"message": "Request Entity Too Large"}\n'
+            await send({'type': 'http.response.start', 'status': 413,
+                        'headers': [(b'content-type', b'application/json'),
+                                    (b'content-length', str(len(payload)).encode())]})
+            await send({'type': 'http.response.body', 'body': payload})
+            return
+
+        # The calls of one request share a context, so the request context Flask pushes
+        # in a streamed response's first chunk is still there for the next ones.
+        environ = self._environ(scope, body)
+        executor = self._stream_executor if self._streamed(environ) else self._executor
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+
+        def run(function, *args):
+            return loop.run_in_executor(executor, context.run, function, *args)
+
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                  for name, value in headers]
+            return lambda data: None
+
+        chunks = await run(self.flask_app.wsgi_app, environ, start_response)
+        disconnected = asyncio.Event()
+
+        async def watch_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            disconnected.set()
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            iterator = iter(chunks)
+            chunk = await run(next, iterator, None)
+            await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+            while chunk is not None:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                if disconnected.is_set():
+                    break
+                chunk = await run(next, iterator, None)
+            if not disconnected.is_set():
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            watcher.cancel()
+            if hasattr(chunks, 'close'):
+                await run(chunks.close)
+
+    def _streamed(self, environ):
+        """
+        Tells whether a request is for one of the STREAM_ENDPOINTS.
+        """
+        try:
+            endpoint, _ = self.flask_app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return False
+        return endpoint in STREAM_ENDPOINTS
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_SIZE:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                break
+        return b''.join(chunks)
+
+    @staticmethod
+    def _environ(scope, body):
+        """
+        Builds the WSGI environ of an ASGI HTTP request.
+        """
+        server_name, server_port = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name != 'CONTENT_LENGTH':
+                key = 'HTTP_' + name
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+
+def create_asgi_app(config_class=Config):
+    """
+    Factory function to create the ASGI application.
+
+    Args:
+        config_class (Config, optional): The configuration class to use. Defaults to Config.
+
+    Returns:
+        GameASGIApp: The ASGI application.
+    """
+    return GameASGIApp(create_app(config_class))
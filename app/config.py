@@ -7,10 +7,101 @@ class Config:
     Contains default settings and allows for environment variable overrides.
     """
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'SECRET_KEY'
-    SESSION_TYPE = 'filesystem'
+    # The session only holds the IDs of its games, so Flask's signed cookie
+    # session ('cookie') is enough. Any Flask-Session type can be used instead.
+    SESSION_TYPE = os.environ.get('SESSION_TYPE') or 'cookie'
     SESSION_FILE_DIR = '.flask_session'
+    # Game state store backend: 'filesystem', 'sqlite' or 'redis'.
+    STATE_STORE_TYPE = os.environ.get('STATE_STORE_TYPE') or 'filesystem'
+    STATE_STORE_DIR = os.environ.get('STATE_STORE_DIR') or '.flask_state'
+    STATE_STORE_SQLITE_PATH = os.environ.get('STATE_STORE_SQLITE_PATH') or 'flaskgame.db'
+    STATE_STORE_REDIS_URL = os.environ.get('STATE_STORE_REDIS_URL') or 'redis://localhost:6379/0'
+    # Seconds after the last move at which an abandoned game is evicted from the store.
+    STATE_TTL = int(os.environ.get('STATE_TTL') or 24 * 60 * 60)
+    # Turn actions are persisted as deltas of the piles and values they changed, with a
+    # full snapshot of the game written every STATE_SNAPSHOT_INTERVAL actions.
+    STATE_SNAPSHOT_INTERVAL = int(os.environ.get('STATE_SNAPSHOT_INTERVAL') or 20)
+    # What is stored of a game: 'piles', its cards and values, or 'log', its seed and the
+    # log of its actions, which is smaller and replays the game exactly (e.g. to debug it,
+    # or through /replay). A worker reading a game replays the actions since the checkpoint
+    # written with its latest full snapshot.
+    STATE_FORMAT = os.environ.get('STATE_FORMAT') or 'piles'
+    # Per-worker LRU cache in front of the store. Entries are served for at most
+    # STATE_CACHE_TTL seconds, which bounds how stale a /status poll can be when
+    # another worker has just updated the game.
+    STATE_CACHE_SIZE = int(os.environ.get('STATE_CACHE_SIZE') or 1024)
+    STATE_CACHE_TTL = float(os.environ.get('STATE_CACHE_TTL') or 5)
+    # Each worker keeps the games it last changed in memory (up to GAME_REGISTRY_SIZE,
+    # dropped after GAME_IDLE_TIMEOUT seconds without a move), so a move on a game it
+    # already holds is applied without reading the store. Changes to a game are serialized
+    # within a worker by one of GAME_LOCK_SHARDS locks, and across workers by saves that
+    # fail with a 409 if the game moved on since it was loaded. Every GAME_SWEEP_INTERVAL
+    # seconds, idle games are dropped and expired games purged from the store in bulk.
+    GAME_REGISTRY_SIZE = int(os.environ.get('GAME_REGISTRY_SIZE') or 1024)
+    GAME_IDLE_TIMEOUT = float(os.environ.get('GAME_IDLE_TIMEOUT') or 300)
+    GAME_LOCK_SHARDS = int(os.environ.get('GAME_LOCK_SHARDS') or 64)
+    GAME_SWEEP_INTERVAL = float(os.environ.get('GAME_SWEEP_INTERVAL') or 60)
+    # Most games one session can hold in the lobby (/games); creating another one
+    # deletes the oldest.
+    MAX_SESSION_GAMES = int(os.environ.get('MAX_SESSION_GAMES') or 10)
+    # Seconds a player looking for a player-versus-player game (/match) stays in the
+    # matchmaking queue; a player still waiting calls /match again within that time.
+    MATCH_MAX_WAIT = float(os.environ.get('MATCH_MAX_WAIT') or 60)
+    # Per-worker LRU cache of the rendered status of the latest version of each game,
+    # shared by /status polls and /events streams.
+    STATUS_CACHE_SIZE = int(os.environ.get('STATUS_CACHE_SIZE') or 1024)
+    # The 'expert' opponent tries its purchases out by Monte Carlo rollouts. All the
+    # purchases of its turn share EXPERT_DECISION_BUDGET_MS milliseconds, so an end_turn
+    # takes at most that much longer however many cards it buys; each purchase also plays
+    # at most EXPERT_MAX_ROLLOUTS rollouts.
+    EXPERT_DECISION_BUDGET_MS = float(os.environ.get('EXPERT_DECISION_BUDGET_MS') or 20)
+    EXPERT_MAX_ROLLOUTS = int(os.environ.get('EXPERT_MAX_ROLLOUTS') or 1000)
+    # Finished games are recorded in an SQLite database at HISTORY_DB_PATH for the
+    # /leaderboard, in batches written by a background thread every HISTORY_FLUSH_INTERVAL
+    # seconds (or once HISTORY_BATCH_SIZE games are pending). The leaderboard is rebuilt at
+    # most every LEADERBOARD_REFRESH_INTERVAL seconds and lists the LEADERBOARD_SIZE fastest
+    # wins. Set HISTORY_ENABLED to false to record nothing.
+    HISTORY_ENABLED = (os.environ.get('HISTORY_ENABLED') or 'true').lower() in ('1', 'true', 'yes')
+    HISTORY_DB_PATH = os.environ.get('HISTORY_DB_PATH') or 'flaskgame_history.db'
+    HISTORY_BATCH_SIZE = int(os.environ.get('HISTORY_BATCH_SIZE') or 500)
+    HISTORY_FLUSH_INTERVAL = float(os.environ.get('HISTORY_FLUSH_INTERVAL') or 1)
+    LEADERBOARD_REFRESH_INTERVAL = float(os.environ.get('LEADERBOARD_REFRESH_INTERVAL') or 10)
+    LEADERBOARD_SIZE = int(os.environ.get('LEADERBOARD_SIZE') or 10)
+    # Level of the 'flaskgame.game' event logger. Game events are logged at INFO,
+    # so the default of WARNING keeps them (and their formatting) switched off.
+    GAME_LOG_LEVEL = os.environ.get('GAME_LOG_LEVEL') or 'WARNING'
+    # Timing histograms of each request handling phase, served at /metrics in the
+    # Prometheus text format. Off by default; when off, instrumented code only checks a flag.
+    # With several workers (gunicorn), set METRICS_DIR to a directory they share so that
+    # /metrics reports the totals of all workers rather than those of the one answering.
+    METRICS_ENABLED = (os.environ.get('METRICS_ENABLED') or '').lower() in ('1', 'true', 'yes')
+    METRICS_DIR = os.environ.get('METRICS_DIR') or None
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL') or 5)
+    # cProfile profiles of sampled /play_turn requests. Off by default. When on, a request
+    # is profiled if it sends an 'X-Profile: 1' header, or with probability
+    # PROFILE_SAMPLE_RATE. Only the PROFILE_MAX_FILES most recent profiles are kept.
+    PROFILE_ENABLED = (os.environ.get('PROFILE_ENABLED') or '').lower() in ('1', 'true', 'yes')
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE') or 0)
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or '.flask_profiles'
+    PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES') or 100)
+    # /events streams status updates as server-sent events. Saves made by this process
+    # wake its streams up at once; they also re-check the store every EVENTS_POLL_INTERVAL
+    # seconds for moves handled by other workers. A stream is closed after
+    # EVENTS_MAX_DURATION seconds (below gunicorn's 30 second worker timeout) and the
+    # client reconnects; a comment is sent every EVENTS_KEEPALIVE seconds without updates.
+    EVENTS_POLL_INTERVAL = float(os.environ.get('EVENTS_POLL_INTERVAL') or 2)
+    EVENTS_MAX_DURATION = float(os.environ.get('EVENTS_MAX_DURATION') or 25)
+    EVENTS_KEEPALIVE = float(os.environ.get('EVENTS_KEEPALIVE') or 15)
+    # The ASGI server (asgi:app) handles requests in a pool of ASGI_THREADS threads; idle
+    # connections take none. Streamed responses (/events, /replay) get a pool of their own
+    # of ASGI_STREAM_THREADS threads, as each open /events stream holds one while it waits.
+    ASGI_THREADS = int(os.environ.get('ASGI_THREADS') or 64)
+    ASGI_STREAM_THREADS = int(os.environ.get('ASGI_STREAM_THREADS') or 256)
 
 class TestingConfig(Config):
     TESTING = True
     SESSION_TYPE = 'filesystem'
     SESSION_FILE_DIR = '.test_flask_session'
+    STATE_STORE_TYPE = 'filesystem'
+    STATE_STORE_DIR = '.test_flask_session/state'
+    HISTORY_DB_PATH = ':memory:'
@@ -2,14 +2,20 @@ class Card:
     """
     Represents a card in the game.
 
+    Cards handed out by the catalog are interned and shared between piles,
+    so a card must never be modified once it has been created.
+
     Attributes:
         name (str): The name of the card.
         cost (int): The cost required to purchase or use the card.
         attack (int): The attack power of the card.
         money (int): The monetary value of the card.
+        card_id (int): The catalog ID of the card, or None for cards that are not part of the catalog.
     """
 
-    def __init__(self, name, cost, attack, money):
+    __slots__ = ('name', 'cost', 'attack', 'money', 'card_id')
+
+    def __init__(self, name, cost, attack, money, card_id=None):
         """
         Initializes a new card with the given attributes.
 
@@ -18,11 +24,13 @@ class Card:
             cost (int): The cost required to purchase or use the card.
             attack (int): The attack power of the card.
             money (int): The monetary value of the card.
+            card_id (int, optional): The catalog ID of the card. Defaults to None.
         """
         self.name = name
         self.cost = cost
         self.attack = attack
         self.money = money
+        self.card_id = card_id
 
     def to_dict(self):
         """
@@ -0,0 +1,113 @@
+from app.models.card import Card
+
+# Every card that can appear in a game, keyed by its position in this tuple.
+# The IDs are persisted in session state, so existing entries must never be
+# reordered or removed; new cards are appended at the end.
+CARDS = (
+    Card("Serf", 0, 0, 1, card_id=0),
+    Card("Squire", 0, 1, 0, card_id=1),
+    Card("Levy", 2, 1, 2, card_id=2),
+    Card("Thug", 1, 2, 0, card_id=3),
+    Card("Crossbowman", 3, 4, 0, card_id=4),
+    Card("Baker", 2, 0, 3, card_id=5),
+    Card("Knight", 5, 6, 0, card_id=6),
+    Card("Catapault", 6, 7, 0, card_id=7),
+    Card("Swordsman", 3, 4, 0, card_id=8),
+    Card("Thief", 1, 1, 1, card_id=9),
+    Card("Archer", 2, 3, 0, card_id=10),
+    Card("Tailor", 3, 0, 4, card_id=11),
+)
+
+SERF, SQUIRE, LEVY, THUG, CROSSBOWMAN, BAKER, KNIGHT, CATAPAULT, SWORDSMAN, THIEF, ARCHER, TAILOR = range(12)
+
+# Per-card stats indexed by catalog ID, for code that works on card IDs instead of Card objects.
+COST = tuple(card.cost for card in CARDS)
+ATTACK = tuple(card.attack for card in CARDS)
+MONEY = tuple(card.money for card in CARDS)
+
+# Deck compositions as (card_id, copies) pairs.
+CENTRAL_DECK = (
+    (THUG, 1),
+    (CROSSBOWMAN, 1),
+    (BAKER, 1),
+    (KNIGHT, 1),
+    (CATAPAULT, 1),
+    (SWORDSMAN, 1),
+    (THIEF, 1),
+    (ARCHER, 1),
+    (TAILOR, 1),
+)
+SUPPLEMENT_DECK = (
+    (LEVY, 1),
+)
+STARTER_DECK = (
+    (SERF, 7),
+    (SQUIRE, 3),
+)
+
+
+# Catalog cards by their fields, to recognise the card dictionaries of older sessions.
+_BY_FIELDS = {(card.name, card.cost, card.attack, card.money): card for card in CARDS}
+
+
+def get_card(card_id):
+    """
+    Looks up an interned card by its catalog ID.
+
+    Args:
+        card_id (int): The catalog ID of the card.
+
+    Returns:
+        Card: The shared card instance for the given ID.
+    """
+    return CARDS[card_id]
+
+
+def build_deck(composition):
+    """
+    Builds a fresh, unshuffled list of interned cards for a deck composition.
+
+    Args:
+        composition (tuple): Sequence of (card_id, copies) pairs.
+
+    Returns:
+        list: The cards of the deck, in composition order.
+    """
+    return [CARDS[card_id] for card_id, copies in composition for _ in range(copies)]
+
+
+def encode_pile(cards):
+    """
+    Converts a pile of cards to its compact session representation.
+
+    Catalog cards are stored as their integer ID. Cards created outside the
+    catalog have no ID and fall back to their full dictionary representation.
+
+    Args:
+        cards (list): The cards to encode.
+
+    Returns:
+        list: The encoded pile.
+    """
+    return [card.card_id if card.card_id is not None else card.to_dict() for card in cards]
+
+
+def decode_pile(entries):
+    """
+    Converts an encoded pile back into cards.
+
+    Accepts both catalog IDs and the card dictionaries written by older
+    versions of the game, so sessions created before the catalog existed
+    can still be loaded. A dictionary matching a catalog card is decoded to
+    the interned card, with its ID; any other becomes a card outside the
+    catalog.
+
+    Args:
+        entries (list): The encoded pile.
+
+    Returns:
+        list: The decoded cards.
+    """
+    return [CARDS[entry] if isinstance(entry, int) else
+            _BY_FIELDS.get((entry['name'], entry['cost'], entry['attack'], entry['money'])) or Card(**entry)
+            for entry in entries]
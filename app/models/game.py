@@ -1,32 +1,216 @@
-import logging
 import random
 
-from app.models.card import Card
+from app.models.catalog import (CENTRAL_DECK, STARTER_DECK, SUPPLEMENT_DECK,
+                                build_deck, decode_pile, encode_pile)
+from app.models.policies import (ACQUISITIVE, AGGRESSIVE, HUMAN, Policy,
+                                 get_policy, opponent_policy)
 from app.utils.exceptions import (InsufficientMoneyError,
                                   InsufficientSupplementError,
-                                  InvalidCardIndexError)
+                                  InvalidCardIndexError, NotYourTurnError)
+from app.utils.game_logger import game_log
+from app.utils.metrics import metrics
+
+# The actions a client can take next, the same in every status. Built once and shared
+# by every status, so it must not be modified.
+NEXT_ACTIONS = [
+    {"endpoint": "/play_turn", "action": "play_all"},
+    {"endpoint": "/play_turn", "action": "play_that_card", "card_index": '[0-n]'},
+    {"endpoint": "/play_turn", "action": "buy_card", "card_index": '[0-n]'},
+    {"endpoint": "/play_turn", "action": "attack"},
+    {"endpoint": "/play_turn", "action": "end_turn"},
+]
+
+# Code of the second player joining a player-versus-player game in the action log.
+JOIN = 'J'
 
-logging.basicConfig(level=logging.INFO)
 
 class Game:
     """
     Represents the main game logic and state.
 
+    Against a computer opponent, the client plays `pO` and the computer's turn is played
+    by `end_turn`. In a player-versus-player game (opponent `HUMAN`), `pC` is a second
+    client: the players take turns, each `end_turn` handing the turn over, and every
+    action must come from the side whose turn it is.
+
+    A new game is determined by its seed and its action log: every random number is drawn
+    from one generator seeded with the seed, and every action applied, with the purchases
+    the computer made in reply, is appended to the log. `from_record` rebuilds a game by
+    replaying its log, e.g. to reproduce a bug report. Lookahead does not copy the game:
+    it takes a `Position` (app/simulation/lookahead.py), a snapshot of the piles as
+    catalog IDs, and plays out from that.
+
     Attributes:
-        aggressive (bool): Determines the type of opponent (Aggressive or Acquisitive).
+        opponent (Policy): Buying policy of the computer opponent, or HUMAN.
+        aggressive (bool): Whether the computer opponent is the aggressive one.
         central (dict): Represents the central deck and its state.
         pO (dict): Represents the player's state.
         pC (dict): Represents the computer's state.
+        version (int): Number of turn actions applied to the game so far.
+        dirty (set): (section, field) pairs changed since the game was created or restored.
+        seed (int): Seed of the game's random number generator, or None if it is not known:
+            games restored from a state go on with a new generator.
+        log (list): Action log, one entry per version (see `apply`). Games restored from a
+            state only have the entries played since.
+        rng (random.Random): Random number generator used for every shuffle in this game.
+        turn (str): The side whose turn it is, 'pO' or 'pC'; always 'pO' against the
+            computer, and None while a player-versus-player game waits for its second player.
     """
 
-    def __init__(self, opponent_type="A"):
+    # Fields of the central and player dicts that hold piles of cards.
+    PILE_FIELDS = frozenset(['deck', 'hand', 'active', 'discard', 'supplement'])
+
+    # Purchases the computer makes at the next end_turn while a log is replayed, instead
+    # of asking its policy, whose decisions may depend on timing (see `apply`).
+    _script = None
+
+    def __init__(self, opponent_type="A", seed=None):
         """
         Initializes a new game with the given opponent type.
 
         Args:
-            opponent_type (str, optional): Type of opponent. Defaults to "A" (Aggressive).
+            opponent_type (str or Policy, optional): Type of opponent: the name or alias of a
+                registered policy (see `app.models.policies`), or a policy, e.g. HUMAN for a
+                player-versus-player game. Defaults to "A" (Aggressive).
+            seed (int, optional): Seed of the game's random number generator. Two games created
+                with the same seed and played with the same actions are identical. Defaults to
+                None, a random seed.
+        """
+        self.opponent = opponent_type if isinstance(opponent_type, Policy) else opponent_policy(opponent_type)
+        self.seed = random.getrandbits(63) if seed is None else seed
+        self._rng = random.Random(self.seed)
+        self._initialize_tables()
+        self._initialize_game()
+        if self.pvp:
+            self.turn = None
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Restores a game from a previously saved state.
+
+        Unlike `Game()` followed by `set_state()`, this skips dealing and shuffling a new
+        game, so no cards are built and no random numbers are drawn only to be discarded.
+
+        Args:
+            state (dict): The state returned by `get_state()`.
+
+        Returns:
+            Game: The restored game.
+        """
+        if 'central' not in state:
+            return cls.from_record(state)
+        game = cls.__new__(cls)
+        game.seed = game._rng = None
+        game._initialize_tables()
+        game.set_state(state)
+        return game
+
+    @classmethod
+    def from_record(cls, record, version=None):
+        """
+        Rebuilds a game from its seed and action log, as returned by `get_record()`.
+
+        The game is dealt again from the seed and every logged action replayed, with the
+        computer making the purchases it made then (see `apply`): the result is identical
+        to the game the record was taken from, down to the cards its next shuffles will deal.
+        If the record has a checkpoint no later than the version asked for, the game is
+        restored from it instead and only the actions logged since are replayed.
+
+        Args:
+            record (dict): The record returned by `get_record()`.
+            version (int, optional): Rebuild the game as it was at this version, i.e. after
+                that many logged actions. Defaults to None: the latest version.
+
+        Returns:
+            Game: The rebuilt game, with no fields marked as changed.
+        """
+        log = record['log']
+        version = len(log) if version is None else version
+        checkpoint = record.get('checkpoint')
+        if checkpoint is not None and checkpoint['version'] <= version:
+            game = cls.from_state(checkpoint)
+            game.seed = record['seed']
+            game.log = log[:game.version]
+        else:
+            opponent = record['opponent']
+            game = cls(HUMAN if opponent == HUMAN.name else get_policy(opponent), seed=record['seed'])
+            game.start()
+        for entry in log[game.version:version]:
+            game.apply(entry)
+        game.dirty.clear()
+        return game
+
+    @property
+    def aggressive(self):
+        """
+        bool: Whether the computer opponent is the aggressive one.
+        """
+        return self.opponent is AGGRESSIVE
+
+    @property
+    def pvp(self):
+        """
+        bool: Whether `pC` is played by a second client rather than by the computer.
+        """
+        return self.opponent is HUMAN
+
+    def join(self):
+        """
+        Seats the second player of a player-versus-player game, which starts it with the
+        first player's turn.
+
+        Raises:
+            ValueError: If the game is not waiting for a second player.
+        """
+        if not self.pvp or self.turn is not None:
+            raise ValueError("The game is not waiting for an opponent.")
+        self.turn = 'pO'
+        self.log.append(JOIN)
+        self.version += 1
+        game_log.event('opponent_joined')
+
+    def check_turn(self, player):
+        """
+        Checks that a side may play now: against the computer the player always may, in a
+        player-versus-player game only the side whose turn it is.
+
+        Args:
+            player (str): The side, 'pO' or 'pC', or None for the player against the computer.
+
+        Raises:
+            NotYourTurnError: If it is not `player`'s turn, or the second player has not joined yet.
+        """
+        if not self.pvp:
+            return
+        if self.turn is None:
+            raise NotYourTurnError("Waiting for an opponent to join.")
+        if player != self.turn:
+            raise NotYourTurnError("It is not your turn.")
+
+    @property
+    def replayable(self):
+        """
+        bool: Whether the game can be rebuilt from its seed and action log, i.e. it was
+        not restored from a state, so it can be stored as a record (see `get_record`).
+        """
+        return self.seed is not None and len(self.log) == self.version
+
+    @property
+    def rng(self):
+        """
+        random.Random: Random number generator used for every shuffle in this game.
+
+        Restored games only create (and seed) one when they first need to shuffle.
+        """
+        if self._rng is None:
+            self._rng = random.Random()
+        return self._rng
+
+    def _initialize_tables(self):
+        """
+        Creates the empty central and player state containers.
         """
-        self.aggressive = opponent_type in ["A", "aggressive"]
         self.central = {
             'name': 'central',
             'active': [],
@@ -36,7 +220,21 @@ class Game:
         }
         self.pO = self._initialize_player('player one')
         self.pC = self._initialize_player('player computer')
-        self._initialize_game()
+        self.version = 0
+        self.turn = 'pO'
+        self.log = []
+        self.dirty = set()
+
+    def _touch(self, section, *fields):
+        """
+        Marks fields of the central or a player dict as changed.
+
+        Args:
+            section (str): 'central', 'pO' or 'pC'.
+            *fields (str): The changed fields of that section.
+        """
+        for field in fields:
+            self.dirty.add((section, field))
 
     def _initialize_player(self, name):
         """
@@ -65,34 +263,24 @@ class Game:
         Initializes the game state, setting up the central deck, player decks, and drawing initial cards.
         """
         # Initialize central deck with a set of cards
-        self.central['deck'] = [
-            Card("Thug", 1, 2, 0),
-            Card("Crossbowman", 3, 4, 0),
-            Card("Baker", 2, 0, 3),
-            Card("Knight", 5, 6, 0),
-            Card("Catapault", 6, 7, 0),
-            Card("Swordsman", 3, 4, 0),
-            Card("Thief", 1, 1, 1),
-            Card("Archer", 2, 3, 0),
-            Card("Tailor", 3, 0, 4)
-        ]
+        self.central['deck'] = build_deck(CENTRAL_DECK)
 
         # Shuffle the central deck
-        random.shuffle(self.central['deck'])
+        self.rng.shuffle(self.central['deck'])
 
         # Draw 5 cards to form the active central cards
         self.central['active'] = [self.central['deck'].pop() for _ in range(5)]
 
         # Set the supplement card
-        self.central['supplement'] = [Card("Levy", 2, 1, 2)]
+        self.central['supplement'] = build_deck(SUPPLEMENT_DECK)
 
         # Initialize player's decks with basic cards
-        self.pO['deck'] = [Card("Serf", 0, 0, 1) for _ in range(7)] + [Card("Squire", 0, 1, 0) for _ in range(3)]
-        self.pC['deck'] = [Card("Serf", 0, 0, 1) for _ in range(7)] + [Card("Squire", 0, 1, 0) for _ in range(3)]
+        self.pO['deck'] = build_deck(STARTER_DECK)
+        self.pC['deck'] = build_deck(STARTER_DECK)
 
         # Shuffle player decks
-        random.shuffle(self.pO['deck'])
-        random.shuffle(self.pC['deck'])
+        self.rng.shuffle(self.pO['deck'])
+        self.rng.shuffle(self.pC['deck'])
 
     def start(self):
         """
@@ -106,304 +294,501 @@ class Game:
             self.pO['hand'].append(self.pO['deck'].pop())
             self.pC['hand'].append(self.pC['deck'].pop())
         
-        logging.info("Available Cards")
-        for card in self.central['active']:
-            logging.info(f"Name {card.name} costing {card.cost} with attack {card.attack} and money {card.money}")
-        logging.info("Supplement")
-        for card in self.central['supplement']:
-            logging.info(f"Name {card.name} costing {card.cost} with attack {card.attack} and money {card.money}")
-        logging.info(f"Do you want an aggressive (A) opponent or an acquisative (Q) opponent: {'aggressive' if self.aggressive else 'acquisative'}")
-        logging.info(f"Player Health: {self.pO['health']}")
-        logging.info(f"Computer Health: {self.pC['health']}")
-        logging.info("Your Hand")
-        for index, card in enumerate(self.pO['hand']):
-            logging.info(f"[{index}] Name {card.name} costing {card.cost} with attack {card.attack} and money {card.money}")
-        logging.info("Your Values")
-        logging.info(f"Money {self.pO['money']}, Attack {self.pO['attack']}")
-        
+        if game_log.enabled:
+            game_log.event('game_started', opponent=self.opponent.name)
+            self._log_board()
+            self._log_player()
+
         return {
             'central_available_cards': [{'card_index': index, **card.to_dict()} for index, card in enumerate(self.central['active'])],
             'central_supplement_card': [{'card_index': index + len(self.central['active']), **card.to_dict()} for index, card in enumerate(self.central['supplement'])]            
         }
 
-    def play_turn(self, action, card_index=None):
+    def play_turn(self, action, card_index=None, player=None):
         """
         Executes a turn based on the provided action and card index.
 
+        The action is played by the side whose turn it is: always the player against the
+        computer, either player in a player-versus-player game.
+
         Args:
             action (str): The action to be performed.
             card_index (int, optional): Index of the card to be played or bought. Defaults to None.
+            player (str, optional): The side sending the action, 'pO' or 'pC'. Required in a
+                player-versus-player game, where it must be the side whose turn it is.
+                Defaults to None.
+
+        Raises:
+            NotYourTurnError: If, in a player-versus-player game, it is not `player`'s turn
+                or the second player has not joined yet.
         """
-        logging.info(f"Enter Action: {action}")
-        logging.info(action)            
-        
+        if self.opponent is HUMAN:
+            self.check_turn(player)
+        if self.turn == 'pO':
+            side, me, foe_side, foe, who = 'pO', self.pO, 'pC', self.pC, 'player'
+        else:
+            side, me, foe_side, foe, who = 'pC', self.pC, 'pO', self.pO, 'opponent'
+
+        if game_log.enabled:
+            game_log.event('action', action=action, card_index=card_index)
+
         if(card_index):
             try:
                 card_index = int(card_index)
             except InvalidCardIndexError as e:
-                logging.info(f"Invalid card index: {card_index}")
+                game_log.event('invalid_card_index', card_index=card_index)
                 raise InvalidCardIndexError(f"Invalid card index: {card_index}: {str(e)}")
         
         if action == "P" or action == "play_all":
-            while self.pO['hand']:
-                card = self.pO['hand'].pop()
-                self.pO['money'] += card.money
-                self.pO['attack'] += card.attack
-                self.pO['active'].append(card)
+            entry = 'P'
+            self._touch(side, 'hand', 'active', 'money', 'attack')
+            while me['hand']:
+                card = me['hand'].pop()
+                me['money'] += card.money
+                me['attack'] += card.attack
+                me['active'].append(card)
 
         elif action == "C" or action == "play_that_card":
-            if 0 <= card_index < len(self.pO['hand']):
-                card = self.pO['hand'].pop(card_index)
-                logging.info(f"Played: {card.to_dict()}")
-                self.pO['money'] += card.money
-                self.pO['attack'] += card.attack
-                self.pO['active'].append(card)
+            if 0 <= card_index < len(me['hand']):
+                card = me['hand'].pop(card_index)
+                entry = f'C {card_index}'
+                self._touch(side, 'hand', 'active', 'money', 'attack')
+                game_log.event('card_played', card=card)
+                me['money'] += card.money
+                me['attack'] += card.attack
+                me['active'].append(card)
             else:
-                logging.info(f"Invalid card index: {card_index}")
+                game_log.event('invalid_card_index', card_index=card_index)
                 raise InvalidCardIndexError(f"Invalid card index: {card_index}")
 
         elif action == "B" or action == "buy_card":
+            entry = f'B {card_index}'
             if card_index == len(self.central['active']):  # Buying from the supplement
                 if(len(self.central['supplement']) > 0):
-                    if self.pO['money'] >= self.central['supplement'][0].cost:
-                        self.pO['money'] -= self.central['supplement'][0].cost
-                        self.pO['discard'].append(self.central['supplement'].pop())
-                        logging.info("Supplement Bought")
+                    if me['money'] >= self.central['supplement'][0].cost:
+                        me['money'] -= self.central['supplement'][0].cost
+                        me['discard'].append(self.central['supplement'].pop())
+                        self._touch(side, 'money', 'discard')
+                        self._touch('central', 'supplement')
+                        game_log.event('supplement_bought', player=who)
                     else:
-                        logging.info(f"Insufficient money to buy the supplement card. This card costs {self.central['supplement'][0].cost} but you only have {self.pO['money']}")
-                        raise InsufficientMoneyError(f"Insufficient money to buy the supplement card. This card costs {self.central['supplement'][0].cost} but you only have {self.pO['money']}")
+                        game_log.event('insufficient_money', card=self.central['supplement'][0], money=me['money'])
+                        raise InsufficientMoneyError(f"Insufficient money to buy the supplement card. This card costs {self.central['supplement'][0].cost} but you only have {me['money']}")
                 else:
-                    logging.info("No supplements left")
+                    game_log.event('no_supplements_left')
                     raise InsufficientSupplementError("No supplements left")
             elif 0 <= card_index < len(self.central['active']):
                 card_to_buy = self.central['active'][card_index]
-                if self.pO['money'] >= card_to_buy.cost:
-                    self.pO['money'] -= card_to_buy.cost
-                    self.pO['discard'].append(self.central['active'].pop(card_index))
+                if me['money'] >= card_to_buy.cost:
+                    me['money'] -= card_to_buy.cost
+                    me['discard'].append(self.central['active'].pop(card_index))
+                    self._touch(side, 'money', 'discard')
+                    self._touch('central', 'active', 'deck', 'activeSize')
                     
                     # Refill the central active cards if there are cards left in the central deck
                     if self.central['deck']:
                         self.central['active'].append(self.central['deck'].pop())
                     else:
                         self.central['activeSize'] -= 1
-                    logging.info(f"Card bought Name {card_to_buy.name} costing {card_to_buy.cost} with attack {card_to_buy.attack} and money {card_to_buy.money}")
+                    game_log.event('card_bought', player=who, card=card_to_buy)
                 else:
-                    logging.info (f"Insufficient money to buy {card_to_buy.name}")
-                    raise InsufficientMoneyError(f"Insufficient money to buy {card_to_buy.name}. This card costs {card_to_buy.cost} but you only have {self.pO['money']}")
+                    game_log.event('insufficient_money', card=card_to_buy, money=me['money'])
+                    raise InsufficientMoneyError(f"Insufficient money to buy {card_to_buy.name}. This card costs {card_to_buy.cost} but you only have {me['money']}")
             else:
-                logging.info (f"Invalid card index: {card_index}")
+                game_log.event('invalid_card_index', card_index=card_index)
                 raise InvalidCardIndexError(f"Invalid card index: {card_index}")
 
         elif action == "A" or action == "attack":
-            self.pC['health'] -= self.pO['attack']
-            self.pO['attack'] = 0
+            entry = 'A'
+            self._touch(foe_side, 'health')
+            self._touch(side, 'attack')
+            foe['health'] -= me['attack']
+            me['attack'] = 0
 
         elif action == "E" or action == "end_turn":
+            self._touch(side, 'deck', 'hand', 'active', 'discard')
             # Move all cards from the player's hand to the discard pile
-            while self.pO['hand']:
-                self.pO['discard'].append(self.pO['hand'].pop())
+            while me['hand']:
+                me['discard'].append(me['hand'].pop())
             
             # Move all active cards to the discard pile
-            while self.pO['active']:
-                self.pO['discard'].append(self.pO['active'].pop())
+            while me['active']:
+                me['discard'].append(me['active'].pop())
             
             # Draw new cards up to the player's hand size
-            for _ in range(self.pO['handsize']):
-                if not self.pO['deck']:
-                    random.shuffle(self.pO['discard'])
-                    self.pO['deck'], self.pO['discard'] = self.pO['discard'], self.pO['deck']
-                self.pO['hand'].append(self.pO['deck'].pop())
-                
-            logging.info("Available Cards")
-            for card in self.central['active']:
-                logging.info(f"Name {card.name} costing {card.cost} with attack {card.attack} and money {card.money}")
-            logging.info("Supplement")
-            for card in self.central['supplement']:
-                logging.info(f"Name {card.name} costing {card.cost} with attack {card.attack} and money {card.money}")
-                
-            logging.info(f"Player Health: {self.pO['health']}")
-            logging.info(f"Computer Health: {self.pC['health']}")
-        
-            # Computer's turn
-            money = 0
-            attack = 0
-            while self.pC['hand']:
-                card = self.pC['hand'].pop()
-                self.pC['active'].append(card)
-                money += card.money
-                attack += card.attack
-            
-            logging.info(f"  Computer player values attack {attack}, money {money}")
-            logging.info(f"  Computer attacking with strength {attack}")
-            self.pO['health'] -= attack
-            attack = 0
-            
-            logging.info(f"Player Health: {self.pO['health']}")
-            logging.info(f"Computer Health: {self.pC['health']}")
-            logging.info(f"  Computer player values attack {attack}, money {money}")
-            logging.info(f"Computer buying")
-            
-            # Computer buying logic
-            if money > 0:
-                logging.info(f"Starting Money {money}")
-                while True:
-                    templist = []
-                    if(len(self.central['supplement']) > 0):
-                        if self.central['supplement'][0].cost <= money:
-                            templist.append(("S", self.central['supplement'][0]))
-                    for intindex in range(len(self.central['active'])):
-                        if self.central['active'][intindex].cost <= money:
-                            templist.append((intindex, self.central['active'][intindex]))
-
-                    if templist:
-                        highestIndex = 0
-                        for intindex in range(len(templist)):
-                            if templist[intindex][1].cost > templist[highestIndex][1].cost:
-                                highestIndex = intindex
-                            elif templist[intindex][1].cost == templist[highestIndex][1].cost:
-                                if self.aggressive:
-                                    if templist[intindex][1].attack > templist[highestIndex][1].attack:
-                                        highestIndex = intindex
-                                else:
-                                    if templist[intindex][1].money > templist[highestIndex][1].money:
-                                        highestIndex = intindex
-
-                        source = templist[highestIndex][0]
-                        if isinstance(source, int):
-                            if money >= self.central['active'][source].cost:
-                                money -= self.central['active'][source].cost
-                                card = self.central['active'].pop(source)                               
-                                logging.info(f"Card bought Name {card.name} costing {card.cost} with attack {card.attack} and money {card.money}")
-                                self.pC['discard'].append(card)
-                                if self.central['deck']:
-                                    card = self.central['deck'].pop()
-                                    self.central['active'].append(card)
-                                else:
-                                    # This assumes that 'activeSize' is a property that keeps track of the number of active cards
-                                    self.central['activeSize'] -= 1
-                            else:
-                                logging.info("Error Occurred")
-                        else:  # Supplement
-                            if money >= self.central['supplement'][0].cost:
-                                money -= self.central['supplement'][0].cost
-                                card = self.central['supplement'].pop()
-                                self.pC['discard'].append(card)
-                                logging.info(f"Supplement Bought: {card.to_dict()}")
-                            else:
-                                logging.info("Error Occurred")
-                    else:
-                        break
-                    if money == 0:
-                        break     
+            for _ in range(me['handsize']):
+                if not me['deck']:
+                    self.rng.shuffle(me['discard'])
+                    me['deck'], me['discard'] = me['discard'], me['deck']
+                me['hand'].append(me['deck'].pop())
+
+            self._log_board()
+
+            if self.opponent is HUMAN:
+                # The other player takes the next turn through the API.
+                self.turn = foe_side
+                game_log.event('turn_passed', turn=foe_side)
+                entry = 'E'
             else:
-                logging.info("No Money to buy anything")
-                
-            # Computer ending its turn
-            while self.pC['hand']:
-                self.pC['discard'].append(self.pC['hand'].pop())
-            while self.pC['active']:
-                self.pC['discard'].append(self.pC['active'].pop())
-            for _ in range(self.pC['handsize']):
-                if not self.pC['deck']:
-                    random.shuffle(self.pC['discard'])
-                    self.pC['deck'], self.pC['discard'] = self.pC['discard'], self.pC['deck']
-                self.pC['hand'].append(self.pC['deck'].pop())
-            logging.info ("Computer turn ending")
-            
-            logging.info("Available Cards")
-            for card in self.central['active']:
-                logging.info(f"Name {card.name} costing {card.cost} with attack {card.attack} and money {card.money}")
-            logging.info("Supplement")
-            for card in self.central['supplement']:
-                logging.info(f"Name {card.name} costing {card.cost} with attack {card.attack} and money {card.money}")
-                
-            logging.info(f"Player Health: {self.pO['health']}")
-            logging.info(f"Computer Health: {self.pC['health']}")
-        
+                entry = ' '.join(['E', *map(str, self._computer_turn())])
+
         elif action not in ["P", "play_all", "C", "play_that_card", "B", "buy_card", "A", "attack", "E", "end_turn"]:
             raise ValueError(f"Invalid action: {action}")
-    
-        logging.info("Your Hand")
-        for card in self.pO['hand']:
-            logging.info(f"Name {card.name} costing {card.cost} with attack {card.attack} and money {card.money}")
-                
-        logging.info("Your Active Cards")
-        for card in self.pO['active']:
-            logging.info(f"Name {card.name} costing {card.cost} with attack {card.attack} and money {card.money}")
-        logging.info("Your Values")
-        logging.info(f"Money {self.pO['money']}, Attack {self.pO['attack']}")
+
+        self.log.append(entry)
+        self.version += 1
+        self._log_player()
+
+    def apply(self, entry):
+        """
+        Replays an entry of an action log.
+
+        An entry is the one-letter code of a turn action, followed by its card index or,
+        for an end_turn against the computer, by the purchases the computer made; or JOIN.
+        The computer makes the logged purchases again rather than asking its policy, whose
+        decisions may depend on timing, but its policy still draws the random numbers it
+        drew then (see `Policy.redraw_in_game`), so the game shuffles as it did.
+
+        Args:
+            entry (str): The entry, e.g. 'P', 'B 5' or 'E 0 5'.
+        """
+        code, *indexes = entry.split()
+        if code == JOIN:
+            self.join()
+        elif code == 'E':
+            self._script = [int(index) for index in indexes]
+            try:
+                self.play_turn(code, player=self.turn)
+            finally:
+                del self._script
+        else:
+            self.play_turn(code, int(indexes[0]) if indexes else None, self.turn)
+
+    def _computer_turn(self):
+        """
+        Plays the computer's turn after the player ended theirs: the computer plays its
+        hand, attacks, buys as its opponent policy decides and draws a new hand.
+
+        Returns:
+            list: The purchases of the computer, as returned by `_computer_buy`.
+        """
+        self._touch('pO', 'health')
+        self._touch('pC', 'deck', 'hand', 'active', 'discard')
+        self._touch('central', 'deck', 'active', 'supplement', 'activeSize')
+        deadline = self.opponent.turn_deadline()
+        money = 0
+        attack = 0
+        while self.pC['hand']:
+            card = self.pC['hand'].pop()
+            self.pC['active'].append(card)
+            money += card.money
+            attack += card.attack
+        
+        self.pO['health'] -= attack
+        if game_log.enabled:
+            game_log.event('computer_attack', attack=attack, money=money)
+            game_log.event('health', player=self.pO['health'], computer=self.pC['health'])
+        attack = 0
+
+        # Computer buying logic
+        if money > 0:
+            game_log.event('computer_buying', money=money)
+            with metrics.time('computer_buy'):
+                bought = self._computer_buy(money, deadline)
+        else:
+            game_log.event('computer_no_money')
+            bought = []
             
-        logging.info(f"Player Health: {self.pO['health']}")
-        logging.info(f"Computer Health: {self.pC['health']}")
-                
-    def get_status(self):
+        # Computer ending its turn
+        while self.pC['hand']:
+            self.pC['discard'].append(self.pC['hand'].pop())
+        while self.pC['active']:
+            self.pC['discard'].append(self.pC['active'].pop())
+        for _ in range(self.pC['handsize']):
+            if not self.pC['deck']:
+                self.rng.shuffle(self.pC['discard'])
+                self.pC['deck'], self.pC['discard'] = self.pC['discard'], self.pC['deck']
+            self.pC['hand'].append(self.pC['deck'].pop())
+        game_log.event('computer_turn_ended')
+        self._log_board()
+        return bought
+
+    def _computer_buy(self, money, deadline=None):
+        """
+        Buys cards for the computer, one at a time as its opponent policy decides, until it
+        cannot or will not buy anymore.
+
+        The policy is shown the market and the supplement as lists of catalog card IDs,
+        built once and kept in step with the central piles after each purchase; the market
+        through the policy's `market_view`, e.g. the `MarketIndex` of the greedy policies.
+        While a log is replayed, the purchases are taken from the log instead.
+
+        Policies only know the cards of the catalog. If the game holds cards from outside
+        it, e.g. restored from an old session, the computer buys as the game always did
+        before policies instead (see `_choose_by_fields`).
+
+        Args:
+            money (int): Money the computer has to spend this turn.
+            deadline (float, optional): The policy's `turn_deadline`, shared by every
+                purchase of the turn. Defaults to None.
+
+        Returns:
+            list: The index of each card bought, in the convention of the policies.
+        """
+        active, supplement, deck = self.central['active'], self.central['supplement'], self.central['deck']
+        market = [card.card_id for card in active]
+        supplement_ids = [card.card_id for card in supplement]
+        choose, redraw = self.opponent.choose_in_game, self.opponent.redraw_in_game
+        if self._in_catalog():
+            market = self.opponent.market_view(market)
+        else:
+            choose, redraw = self._choose_by_fields, None
+        script = self._script
+        bought = []
+        while money > 0:
+            if script is None:
+                choice = choose(self, market, supplement_ids, money, deadline)
+            else:
+                if redraw is not None:
+                    redraw(self, market, supplement_ids, money)
+                choice = script[len(bought)] if len(bought) < len(script) else None
+            if choice is None:
+                break
+            bought.append(choice)
+            if choice == len(market):
+                supplement_ids.pop()
+                card = supplement.pop()
+                money -= card.cost
+                self.pC['discard'].append(card)
+                game_log.event('supplement_bought', player='computer', card=card)
+            else:
+                market.pop(choice)
+                card = active.pop(choice)
+                money -= card.cost
+                game_log.event('card_bought', player='computer', card=card)
+                self.pC['discard'].append(card)
+                if deck:
+                    active.append(deck.pop())
+                    market.append(active[-1].card_id)
+                else:
+                    # This assumes that 'activeSize' is a property that keeps track of the number of active cards
+                    self.central['activeSize'] -= 1
+        return bought
+
+    def _in_catalog(self):
+        """
+        Tells whether every card of the game is a catalog card, with an ID.
+        """
+        piles = (self.central['deck'], self.central['active'], self.central['supplement'],
+                 *(side[field] for side in (self.pO, self.pC) for field in ('deck', 'hand', 'active', 'discard')))
+        return all(card.card_id is not None for pile in piles for card in pile)
+
+    @staticmethod
+    def _choose_by_fields(game, market, supplement, money, deadline=None):
+        """
+        Picks the computer's next card from the Card objects of the central piles, for
+        games holding cards outside the catalog: the most expensive affordable card, ties
+        broken on attack against the aggressive opponent and on money otherwise, the
+        supplement first.
+
+        Args:
+            game (Game): The game, while the computer is buying.
+            market (list): Ignored; the central active cards are read from the game.
+            supplement (list): Ignored; the supplement is read from the game.
+            money (int): Money the computer has left this turn.
+            deadline (float, optional): Ignored; the decision is immediate.
+
+        Returns:
+            int: The index of the card to buy, as for `Policy.choose`, or None.
+        """
+        tie_break = 'attack' if game.aggressive else 'money'
+        active, supplement = game.central['active'], game.central['supplement']
+        best = best_rank = None
+        if supplement and supplement[0].cost <= money:
+            best, best_rank = len(active), (supplement[0].cost, getattr(supplement[0], tie_break))
+        for index, card in enumerate(active):
+            rank = (card.cost, getattr(card, tie_break))
+            if card.cost <= money and (best is None or rank > best_rank):
+                best, best_rank = index, rank
+        return best
+
+    def _log_board(self):
+        """
+        Records the central cards and both players' health as a game event.
+        """
+        if game_log.enabled:
+            game_log.event('board', available=self.central['active'], supplement=self.central['supplement'],
+                           player_health=self.pO['health'], computer_health=self.pC['health'])
+
+    def _log_player(self):
+        """
+        Records the player's hand, active cards and values as a game event.
+        """
+        if game_log.enabled:
+            game_log.event('player', hand=self.pO['hand'], active=self.pO['active'],
+                           money=self.pO['money'], attack=self.pO['attack'], health=self.pO['health'])
+
+    def get_status(self, seat=None):
         """
         Retrieves the current status of the game.
 
+        Args:
+            seat (str, optional): In a player-versus-player game, the side the status is for,
+                'pO' or 'pC'. It then shows that side as the player and the other side as
+                the opponent, whose hand is hidden, and only offers actions on its turn.
+                Defaults to None, the status of a game against the computer.
+
         Returns:
             dict: Current game status including player, computer, and central deck states.
         """
+        central = {
+            'available_cards': [{'card_index': index, **card.to_dict()} for index, card in enumerate(self.central['active'])],
+            'supplement_card': [{'card_index': index + len(self.central['active']), **card.to_dict()} for index, card in enumerate(self.central['supplement'])]
+        }
+        if seat is None:
+            return {
+                'player': self._player_status(self.pO),
+                'computer': self._player_status(self.pC),
+                'central': central,
+                'next_action': NEXT_ACTIONS
+            }
+        me, foe = (self.pO, self.pC) if seat == 'pO' else (self.pC, self.pO)
+        opponent = self._player_status(foe)
+        opponent['hand'] = len(foe['hand'])
         return {
-            'player': {
-                'health': self.pO['health'],
-                'hand': [{'card_index': index, **card.to_dict()} for index, card in enumerate(self.pO['hand'])],
-                'active': [card.to_dict() for card in self.pO['active']],
-                'values': {
-                    'money': self.pO['money'],
-                    'attack': self.pO['attack']
-                }                
-            },
-            'computer': {
-                'health': self.pC['health'],
-                'hand': [{'card_index': index, **card.to_dict()} for index, card in enumerate(self.pC['hand'])],
-                'active': [card.to_dict() for card in self.pC['active']],
-                'values': {
-                    'money': self.pC['money'],
-                    'attack': self.pC['attack']
-                }       
-            },
-            'central': {
-                'available_cards': [{'card_index': index, **card.to_dict()} for index, card in enumerate(self.central['active'])],
-                'supplement_card': [{'card_index': index + len(self.central['active']), **card.to_dict()} for index, card in enumerate(self.central['supplement'])]
-            },
-            'next_action': [{"endpoint": "/play_turn", "action": "play_all"}, {"endpoint": "/play_turn", "action": "play_that_card", "card_index": '[0-n]'}, {"endpoint": "/play_turn", "action": "buy_card", "card_index": '[0-n]'}, {"endpoint": "/play_turn", "action": "attack"}, {"endpoint": "/play_turn", "action": "end_turn"}]
+            'player': self._player_status(me),
+            'opponent': opponent,
+            'central': central,
+            'turn': 'waiting' if self.turn is None else 'yours' if self.turn == seat else 'opponent',
+            'next_action': NEXT_ACTIONS if self.turn == seat else []
         }
-        
-    def get_state(self):
+
+    @staticmethod
+    def _player_status(player):
+        """
+        Builds the status of one player: health, hand, active cards and values.
+        """
+        return {
+            'health': player['health'],
+            'hand': [{'card_index': index, **card.to_dict()} for index, card in enumerate(player['hand'])],
+            'active': [card.to_dict() for card in player['active']],
+            'values': {
+                'money': player['money'],
+                'attack': player['attack']
+            }
+        }
+
+    def get_state(self, include_rng=False):
         """
         Retrieves the complete state of the game.
 
+        Piles are stored as lists of catalog card IDs (see `encode_pile`), which keeps
+        the session payload small and cheap to restore. The seed and the action log are
+        not stored: see `get_record`.
+
+        Args:
+            include_rng (bool, optional): Also store the state of the game's random number
+                generator, so a restored game shuffles exactly like this one. Defaults to False.
+
         Returns:
             dict: Complete game state including player, computer, and central deck states.
         """
         state = {
+            'version': self.version,
             'aggressive': self.aggressive,
             'central': {
-                'deck': [card.to_dict() for card in self.central['deck']],
-                'active': [card.to_dict() for card in self.central['active']],
-                'supplement': [card.to_dict() for card in self.central['supplement']]
+                'deck': encode_pile(self.central['deck']),
+                'active': encode_pile(self.central['active']),
+                'activeSize': self.central['activeSize'],
+                'supplement': encode_pile(self.central['supplement'])
             },
             'pO': {
                 'health': self.pO['health'],
-                'deck': [card.to_dict() for card in self.pO['deck']],
-                'hand': [card.to_dict() for card in self.pO['hand']],
-                'active': [card.to_dict() for card in self.pO['active']],
-                'discard': [card.to_dict() for card in self.pO['discard']],
+                'deck': encode_pile(self.pO['deck']),
+                'hand': encode_pile(self.pO['hand']),
+                'active': encode_pile(self.pO['active']),
+                'discard': encode_pile(self.pO['discard']),
                 'money': self.pO['money'],
                 'attack': self.pO['attack']
             },
             'pC': {
                 'health': self.pC['health'],
-                'deck': [card.to_dict() for card in self.pC['deck']],
-                'hand': [card.to_dict() for card in self.pC['hand']],
-                'active': [card.to_dict() for card in self.pC['active']],
-                'discard': [card.to_dict() for card in self.pC['discard']],
+                'deck': encode_pile(self.pC['deck']),
+                'hand': encode_pile(self.pC['hand']),
+                'active': encode_pile(self.pC['active']),
+                'discard': encode_pile(self.pC['discard']),
                 'money': self.pC['money'],
                 'attack': self.pC['attack']
             }
         }
+        if self.opponent is not AGGRESSIVE and self.opponent is not ACQUISITIVE:
+            # The flag is enough for the original two opponents, which keeps their
+            # states in the binary format; others are stored by name.
+            state['opponent'] = self.opponent.name
+        if self.pvp:
+            state['turn'] = self.turn
+        if include_rng:
+            version, internal, gauss = self.rng.getstate()
+            state['rng'] = [version, list(internal), gauss]
         return state
 
+    def get_record(self, since=None, checkpoint=False):
+        """
+        Retrieves the game as its seed and action log, from which `from_record` rebuilds it.
+
+        A record holds no piles: it grows by a few bytes per action played, and replaying
+        it reproduces the game exactly. Only games that can be replayed have one: games
+        restored from a state do not know the seed and actions that led to it.
+
+        Replaying a long game takes longer the further it went, so a record may also carry
+        a checkpoint: the state of the game, random number generator included, at the
+        version the record was taken. `from_record` starts from it rather than from the
+        seed, and still replays the log before it to rebuild earlier versions.
+
+        Args:
+            since (int, optional): A version of the game. If given, only the log entries
+                played since are returned, with the version (and the turn), as a delta of
+                the record at that version (see `apply_delta`). Defaults to None.
+            checkpoint (bool, optional): Include a checkpoint in the full record. Defaults to False.
+
+        Returns:
+            dict: The record, or its delta.
+
+        Raises:
+            ValueError: If the game cannot be replayed (see `replayable`).
+        """
+        if not self.replayable:
+            raise ValueError("The game was restored from a state and cannot be replayed.")
+        if since is None:
+            record = {'version': self.version, 'seed': self.seed, 'opponent': self.opponent.name,
+                      'log': self.log[:]}
+            if checkpoint:
+                record['checkpoint'] = self.get_state(include_rng=True)
+        else:
+            record = {'version': self.version, 'log': self.log[since:]}
+        if self.pvp:
+            record['turn'] = self.turn
+        return record
+
+    def get_delta(self):
+        """
+        Retrieves the part of the game state that changed since the game was created or restored.
+
+        The delta has the same layout as `get_state()` but only contains the changed fields
+        (plus the version), so applying it to the previous state with `apply_delta` yields
+        the current state.
+
+        Returns:
+            dict: The changed fields of the game state.
+        """
+        delta = {'version': self.version}
+        if self.pvp:
+            delta['turn'] = self.turn
+        for section, field in self.dirty:
+            value = getattr(self, section)[field]
+            delta.setdefault(section, {})[field] = encode_pile(value) if field in self.PILE_FIELDS else value
+        return delta
+
     def set_state(self, state):
         """
         Sets the game state based on the provided state.
@@ -411,23 +796,36 @@ class Game:
         Args:
             state (dict): The state to set the game to.
         """
-        self.aggressive = state['aggressive']
-        self.central['deck'] = [Card(**card_data) for card_data in state['central']['deck']]
-        self.central['active'] = [Card(**card_data) for card_data in state['central']['active']]
-        self.central['supplement'] = [Card(**card_data) for card_data in state['central']['supplement']]
-        
+        self.version = state.get('version', 0)
+        if state.get('opponent') == HUMAN.name:
+            self.opponent = HUMAN
+        elif state.get('opponent') is not None:
+            self.opponent = get_policy(state['opponent'])
+        else:
+            self.opponent = AGGRESSIVE if state['aggressive'] else ACQUISITIVE
+        self.turn = state.get('turn', 'pO')
+        self.central['deck'] = decode_pile(state['central']['deck'])
+        self.central['active'] = decode_pile(state['central']['active'])
+        self.central['activeSize'] = state['central'].get('activeSize', 5)
+        self.central['supplement'] = decode_pile(state['central']['supplement'])
+
         self.pO['health'] = state['pO']['health']
-        self.pO['deck'] = [Card(**card_data) for card_data in state['pO']['deck']]
-        self.pO['hand'] = [Card(**card_data) for card_data in state['pO']['hand']]
-        self.pO['active'] = [Card(**card_data) for card_data in state['pO']['active']]
-        self.pO['discard'] = [Card(**card_data) for card_data in state['pO']['discard']]
+        self.pO['deck'] = decode_pile(state['pO']['deck'])
+        self.pO['hand'] = decode_pile(state['pO']['hand'])
+        self.pO['active'] = decode_pile(state['pO']['active'])
+        self.pO['discard'] = decode_pile(state['pO']['discard'])
         self.pO['money'] = state['pO']['money']
         self.pO['attack'] = state['pO']['attack']
-        
+
         self.pC['health'] = state['pC']['health']
-        self.pC['deck'] = [Card(**card_data) for card_data in state['pC']['deck']]
-        self.pC['hand'] = [Card(**card_data) for card_data in state['pC']['hand']]
-        self.pC['active'] = [Card(**card_data) for card_data in state['pC']['active']]
-        self.pC['discard'] = [Card(**card_data) for card_data in state['pC']['discard']]
+        self.pC['deck'] = decode_pile(state['pC']['deck'])
+        self.pC['hand'] = decode_pile(state['pC']['hand'])
+        self.pC['active'] = decode_pile(state['pC']['active'])
+        self.pC['discard'] = decode_pile(state['pC']['discard'])
         self.pC['money'] = state['pC']['money']
         self.pC['attack'] = state['pC']['attack']
+
+        if state.get('rng') is not None:
+            version, internal, gauss = state['rng']
+            self._rng = random.Random()
+            self._rng.setstate((version, tuple(internal), gauss))
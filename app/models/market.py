@@ -0,0 +1,94 @@
+from bisect import bisect_left, bisect_right, insort
+
+# Sorts after any real preference with the same cost.
+_HIGHEST = float('inf')
+
+
+class MarketIndex:
+    """
+    The market as catalog card IDs, ordered by a buyer's preference for repeated purchase
+    decisions.
+
+    The index wraps the list of market card IDs a policy is shown and keeps it in sync:
+    cards are bought with `pop` and refilled with `append`, and both update the index
+    incrementally, so finding the preferred affordable card is a binary search instead
+    of a scan of the market. It reads like the list it wraps (`len`, indexing,
+    iteration), so policies that do not use the index see no difference.
+
+    A card is preferred by its rank, then by how early it entered the market. Because
+    cards are only ever appended, arrival order is the market order, and a card's
+    position in the list is found by a binary search on the arrival numbers.
+
+    Attributes:
+        market (list): The market card IDs, in market order.
+        rank (tuple): Preference key of each card, indexed by catalog ID; its first
+            element is the card's cost.
+    """
+
+    def __init__(self, market, rank):
+        """
+        Indexes the cards currently in the market.
+
+        Args:
+            market (list): Catalog IDs of the central active cards; modified in place by
+                `pop` and `append`.
+            rank (tuple): Preference key of each card, indexed by catalog ID, e.g.
+                `GreedyPolicy.rank`.
+        """
+        self.market = market
+        self.rank = rank
+        self._arrivals = list(range(len(market)))
+        self._ranked = sorted(rank[card_id] + (-arrival,) for arrival, card_id in enumerate(market))
+        self._next_arrival = len(market)
+
+    def __len__(self):
+        return len(self.market)
+
+    def __getitem__(self, position):
+        return self.market[position]
+
+    def __iter__(self):
+        return iter(self.market)
+
+    def best(self, money):
+        """
+        Finds the preferred card the buyer can afford.
+
+        Args:
+            money (int): Money available to spend.
+
+        Returns:
+            int: Position of the card in the market, or None if nothing is affordable.
+        """
+        ranked = bisect_right(self._ranked, (money, _HIGHEST))
+        if not ranked:
+            return None
+        return bisect_left(self._arrivals, -self._ranked[ranked - 1][-1])
+
+    def pop(self, position):
+        """
+        Removes the card at a market position.
+
+        Args:
+            position (int): Position of the card in the market.
+
+        Returns:
+            int: Catalog ID of the removed card.
+        """
+        card_id = self.market.pop(position)
+        arrival = self._arrivals.pop(position)
+        del self._ranked[bisect_left(self._ranked, self.rank[card_id] + (-arrival,))]
+        return card_id
+
+    def append(self, card_id):
+        """
+        Adds a card at the end of the market.
+
+        Args:
+            card_id (int): Catalog ID of the card entering the market.
+        """
+        arrival = self._next_arrival
+        self._next_arrival += 1
+        self.market.append(card_id)
+        self._arrivals.append(arrival)
+        insort(self._ranked, self.rank[card_id] + (-arrival,))
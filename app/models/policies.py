@@ -0,0 +1,239 @@
+# Policies look card stats up by catalog ID, so they never touch Card objects.
+from app.models.catalog import ATTACK, COST, MONEY
+from app.models.market import MarketIndex
+
+
+class Policy:
+    """
+    Base class for buying policies: the computer opponents of `Game` and the simulators.
+
+    A policy decides, one purchase at a time, which card to buy. The market is a list of
+    catalog card IDs and the supplement a list of IDs as well; the policy returns the
+    index of the card to buy using the same convention as `Game.play_turn('buy_card')`:
+    an index into the market, or `len(market)` for the supplement.
+
+    The lists are a read-only view kept up to date by the caller between purchases, and
+    card stats are looked up in the COST, ATTACK and MONEY tuples, so a decision needs no
+    Card objects and, for the greedy policies, no allocations at all. Policies must not
+    modify the lists; they are shared by every decision of a turn.
+
+    Attributes:
+        name (str): Name of the policy, used on the command line and in reports.
+    """
+
+    name = None
+
+    def choose(self, market, supplement, money, rng):
+        """
+        Picks the next card to buy.
+
+        Args:
+            market (list): Catalog IDs of the central active cards.
+            supplement (list): Catalog IDs of the remaining supplement cards.
+            money (int): Money available to spend.
+            rng (random.Random): Random number generator of the game.
+
+        Returns:
+            int: The index of the card to buy, or None to stop buying.
+        """
+        raise NotImplementedError
+
+    def market_view(self, market):
+        """
+        Returns the market a `Game` shows this policy for the purchases of a turn.
+
+        The game keeps the view in step with the central piles with its `pop` and
+        `append`. Policies that can use a `MarketIndex` return one over the list.
+
+        Args:
+            market (list): Catalog IDs of the central active cards.
+
+        Returns:
+            list: The market itself, or a view of it with the same `pop` and `append`.
+        """
+        return market
+
+    def turn_deadline(self):
+        """
+        Returns the time by which the computer opponent of a `Game` must have decided all
+        the purchases of the turn it is starting.
+
+        Returns:
+            float: A `time.perf_counter()` value, or None for policies that decide at once.
+        """
+        return None
+
+    def choose_in_game(self, game, market, supplement, money, deadline=None):
+        """
+        Picks the next card for the computer opponent of a `Game` to buy.
+
+        Policies that look ahead override this to read the rest of the game, which they
+        must not modify; the others decide from the market alone, with `choose`.
+
+        Args:
+            game (Game): The game, while the computer is buying.
+            market (list): Catalog IDs of the central active cards.
+            supplement (list): Catalog IDs of the remaining supplement cards.
+            money (int): Money the computer has left this turn.
+            deadline (float, optional): The `turn_deadline` of the turn. Defaults to None.
+
+        Returns:
+            int: The index of the card to buy, or None to stop buying.
+        """
+        return self.choose(market, supplement, money, game.rng)
+
+    def redraw_in_game(self, game, market, supplement, money):
+        """
+        Draws from the game's random number generator what `choose_in_game` would, when
+        `Game.apply` replays a logged purchase instead of deciding it again.
+
+        By default the decision is made again and ignored, which is cheap for policies
+        that decide from the market alone; policies whose decisions are costly override it.
+
+        Args:
+            game (Game): The game, while the computer is buying.
+            market (list): Catalog IDs of the central active cards.
+            supplement (list): Catalog IDs of the remaining supplement cards.
+            money (int): Money the computer has left this turn.
+        """
+        self.choose_in_game(game, market, supplement, money)
+
+
+class GreedyPolicy(Policy):
+    """
+    Buys the most expensive affordable card, breaking ties on a secondary stat.
+
+    The supplement is considered first, then the market in order, and a candidate only
+    replaces the current choice if it ranks strictly higher.
+
+    In a `Game`, the market is shown as a `MarketIndex` on `rank`, kept up to date
+    between purchases, so a decision is a binary search rather than a scan of the market.
+
+    Attributes:
+        rank (tuple): Preference key of each card, indexed by catalog ID.
+    """
+
+    def __init__(self, name, tie_break):
+        """
+        Initializes the policy.
+
+        Args:
+            name (str): Name of the policy.
+            tie_break (tuple): Secondary stat per catalog ID, e.g. ATTACK or MONEY.
+        """
+        self.name = name
+        self.rank = tuple(zip(COST, tie_break))
+
+    def choose(self, market, supplement, money, rng):
+        rank = self.rank
+        best = None
+        best_rank = None
+        if supplement and COST[supplement[0]] <= money:
+            best = len(market)
+            best_rank = rank[supplement[0]]
+        for index, card_id in enumerate(market):
+            if COST[card_id] <= money and (best is None or rank[card_id] > best_rank):
+                best = index
+                best_rank = rank[card_id]
+        return best
+
+    def market_view(self, market):
+        return MarketIndex(market, self.rank)
+
+    def choose_in_game(self, game, market, supplement, money, deadline=None):
+        if not isinstance(market, MarketIndex) or market.rank is not self.rank:
+            return self.choose(market, supplement, money, game.rng)
+        best = market.best(money)
+        if supplement and COST[supplement[0]] <= money and \
+                (best is None or self.rank[supplement[0]] >= self.rank[market[best]]):
+            return len(market)
+        return best
+
+
+class RandomPolicy(Policy):
+    """
+    Buys a uniformly random affordable card until nothing is affordable.
+    """
+
+    name = 'random'
+
+    def choose(self, market, supplement, money, rng):
+        options = [index for index, card_id in enumerate(market) if COST[card_id] <= money]
+        if supplement and COST[supplement[0]] <= money:
+            options.append(len(market))
+        return rng.choice(options) if options else None
+
+
+class HumanOpponent(Policy):
+    """
+    Stands for the second player of a player-versus-player game, played by another client.
+
+    It never buys on its own: the second player takes turns through the API like the
+    first. It is not registered, so it cannot be picked as a computer opponent or by the
+    simulators.
+    """
+
+    name = 'human'
+
+    def choose(self, market, supplement, money, rng):
+        return None
+
+
+AGGRESSIVE = GreedyPolicy('aggressive', ATTACK)
+ACQUISITIVE = GreedyPolicy('acquisitive', MONEY)
+
+POLICIES = {
+    'aggressive': AGGRESSIVE,
+    'acquisitive': ACQUISITIVE,
+    'random': RandomPolicy(),
+}
+HUMAN = HumanOpponent()
+ALIASES = {
+    'A': 'aggressive',
+    'Q': 'acquisitive',
+    'R': 'random',
+}
+
+
+def register_policy(policy):
+    """
+    Makes a policy available by name as a computer opponent, to the simulator and to its command line.
+
+    Args:
+        policy (Policy): The policy to register.
+    """
+    POLICIES[policy.name] = policy
+
+
+def get_policy(name):
+    """
+    Looks up a registered policy by name or one-letter alias.
+
+    Args:
+        name (str): Policy name, e.g. 'aggressive' or 'A'.
+
+    Returns:
+        Policy: The registered policy.
+
+    Raises:
+        ValueError: If no policy has that name.
+    """
+    policy = POLICIES.get(ALIASES.get(name, name))
+    if policy is None:
+        raise ValueError(f"Unknown policy: {name}. Available policies: {', '.join(sorted(POLICIES))}")
+    return policy
+
+
+def opponent_policy(opponent_type):
+    """
+    Looks up the policy of the computer opponent for an opponent type sent to /start.
+
+    Args:
+        opponent_type (str): Policy name or one-letter alias, e.g. 'A' or 'random'.
+
+    Returns:
+        Policy: The registered policy, or the acquisitive policy for unknown types, which
+        have always been given the acquisitive opponent.
+    """
+    return POLICIES.get(ALIASES.get(opponent_type, opponent_type), ACQUISITIVE)
+
@@ -1,17 +1,227 @@
-import logging
+import time
 
-from flask import Blueprint, jsonify, session
+from flask import (Blueprint, Response, current_app, g, jsonify, request, session,
+                   stream_with_context)
 from flask_restful import Api, Resource, reqparse
 
-from app.models.game import Game
-from app.utils.exceptions import (InsufficientMoneyError,
-                                  InsufficientSupplementError,
-                                  InvalidCardIndexError)
+from app.models.policies import HUMAN
+from app.services import game_service
+from app.services.game_events import (KEEPALIVE, end_event, notifier,
+                                      parse_last_event_id, status_event)
+from app.services.game_service import (BATCH_RESPONSES, GAME_CHANGED,
+                                       GAME_NOT_FOUND, GAME_NOT_REPLAYABLE,
+                                       GAME_NOT_STARTED)
+from app.utils.exceptions import NotYourTurnError, StaleStateError
+from app.utils.metrics import REQUEST_METRIC, metrics
+from app.utils.profiling import PROFILE_ID_HEADER, profiler
 
 game_blueprint = Blueprint('game', __name__)
 api = Api(game_blueprint)
 
-logging.basicConfig(level=logging.INFO)
+
+@game_blueprint.before_request
+def _start_request_timer():
+    if metrics.enabled:
+        g.request_started = time.perf_counter()
+
+
+@game_blueprint.after_request
+def _record_request_time(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unknown'
+        metrics.observe(metrics.histogram(REQUEST_METRIC, method=request.method, endpoint=endpoint),
+                        time.perf_counter() - started)
+        metrics.maybe_flush()
+    return response
+
+
+@game_blueprint.before_request
+def _start_profiler():
+    if profiler.enabled and request.url_rule and profiler.should_profile(request.url_rule.rule, request.headers):
+        g.profile = profiler.start()
+
+
+@game_blueprint.after_request
+def _write_profile(response):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        body = request.get_json(silent=True)
+        action = body.get('action', '') if isinstance(body, dict) else ''
+        label = '-'.join(part for part in (request.url_rule.rule.strip('/'), action) if part)
+        response.headers[PROFILE_ID_HEADER] = profiler.finish(profile, label)
+    return response
+
+
+@game_blueprint.route('/metrics')
+def metrics_endpoint():
+    """
+    Serves the request and phase timing histograms in the Prometheus text format.
+
+    Returns:
+        Response: The metrics page, or 404 if metrics are disabled.
+    """
+    if not metrics.enabled:
+        return {"error": "Metrics are disabled."}, 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@game_blueprint.route('/leaderboard')
+def leaderboard():
+    """
+    Serves the leaderboard of the finished games: the player's results against each
+    opponent and the fastest wins, rebuilt at most every LEADERBOARD_REFRESH_INTERVAL seconds.
+
+    Returns:
+        Response: The leaderboard, or 404 if the game history is disabled.
+    """
+    history = current_app.extensions['game_history']
+    if history is None:
+        return {"error": "The game history is disabled."}, 404
+    return Response(history.leaderboard(), mimetype='application/json')
+
+
+def _game_store():
+    """
+    Returns the game state store of the current application.
+    """
+    return current_app.extensions['game_store']
+
+
+def _game_registry():
+    """
+    Returns the game registry of the current application.
+    """
+    return current_app.extensions['game_registry']
+
+
+def _matchmaker():
+    """
+    Returns the matchmaker of the current application.
+    """
+    return current_app.extensions['matchmaker']
+
+
+def _status_cache():
+    """
+    Returns the rendered status cache of the current application.
+    """
+    return current_app.extensions['status_cache']
+
+
+def _status_response(rendered):
+    """
+    Returns a JSON response of a rendered status, without encoding it again.
+    """
+    return Response(rendered.json, mimetype='application/json')
+
+
+def _session_games():
+    """
+    Returns the IDs of the games of the current session, oldest first.
+    """
+    return session.get('games', [])
+
+
+def _seat(game_id):
+    """
+    Returns the side the current session plays in a game: 'pO' or 'pC' in a
+    player-versus-player game, None in a game against the computer.
+    """
+    return session.get('seats', {}).get(game_id)
+
+
+def _addressed_game(game_id=None):
+    """
+    Resolves the game a request is about.
+
+    Requests to /games/<game_id>/... address one of the session's games; the other
+    endpoints address the session's current game, the one started by /start.
+
+    Args:
+        game_id (str, optional): The game ID from the URL. Defaults to None.
+
+    Returns:
+        tuple: The game ID, or None, and the error response to send if there is no such game.
+    """
+    if game_id is None:
+        game_id = session.get('game_id')
+        return game_id, None if game_id is not None else ({"error": GAME_NOT_STARTED}, 400)
+    if game_id != session.get('game_id') and game_id not in _session_games():
+        return None, ({"error": GAME_NOT_FOUND}, 404)
+    return game_id, None
+
+
+def _missing_game(addressed):
+    """
+    Returns the error response for a game that no longer exists in the store.
+
+    Args:
+        addressed (str): The game ID from the URL, or None for the current game.
+    """
+    if addressed is None:
+        return {"error": GAME_NOT_STARTED}, 400
+    return {"error": GAME_NOT_FOUND}, 404
+
+
+def _load_state(game_id, use_cache=True):
+    """
+    Loads the state of a game, without restoring the game.
+
+    Args:
+        game_id (str): The ID of the game.
+        use_cache (bool, optional): Whether the store may answer from its in-process cache. Defaults to True.
+
+    Returns:
+        dict: The state, or None if there is no such game.
+    """
+    with metrics.time('session_load'):
+        return _game_store().load(game_id, use_cache=use_cache)
+
+
+def _new_game(opponent_type):
+    """
+    Starts a game and adds it to the games of the current session.
+
+    When the session already holds MAX_SESSION_GAMES games, the oldest one is deleted.
+
+    Args:
+        opponent_type (str or Policy): The opponent type.
+
+    Returns:
+        tuple: The ID of the game and the game.
+    """
+    game_instance = game_service.new_game(opponent_type)
+    game_id = _game_registry().create(game_instance)
+    _add_session_game(game_id)
+    return game_id, game_instance
+
+
+def _add_session_game(game_id):
+    """
+    Adds a game to the games of the current session, deleting the oldest one beyond MAX_SESSION_GAMES.
+
+    Args:
+        game_id (str): The ID of the game.
+    """
+    games, dropped = game_service.add_session_game(_session_games(), game_id,
+                                                   current_app.config.get('MAX_SESSION_GAMES', 10))
+    for old_id in dropped:
+        _delete_game(old_id)
+    session['games'] = games
+
+
+def _delete_game(game_id):
+    """
+    Deletes a game from the store and the caches, and removes it from the current session.
+
+    Args:
+        game_id (str): The ID of the game.
+    """
+    _game_registry().delete(game_id)
+    game_service.forget_status(_status_cache(), game_id)
+    game_service.forget_session_game(session, game_id)
+
 
 class StartGame(Resource):
     """
@@ -22,6 +232,8 @@ class StartGame(Resource):
         """
         Starts a new game based on the provided opponent type.
 
+        The new game replaces the session's current game, which is deleted.
+
         Returns:
             dict: Response indicating success and the current game status.
         """
@@ -29,124 +241,385 @@ class StartGame(Resource):
         parser.add_argument('opponent_type', type=str, default="A")
         args = parser.parse_args()
 
-        game_instance = Game(args['opponent_type'])
-        game_instance.start()
+        previous_id = session.get('game_id')
+        if previous_id is not None:
+            _delete_game(previous_id)
+        game_id, game_instance = _new_game(args['opponent_type'])
+        session['game_id'] = game_id
 
-        session['game_state'] = game_instance.get_state()
-        session.modified = True
+        return game_service.start_body(game_instance)
+
+class Games(Resource):
+    """
+    Resource for the lobby: the games held by the session.
+    """
+
+    def get(self):
+        """
+        Lists the games of the session, dropping those that have expired.
+
+        Returns:
+            dict: The ID, version and status of each game, oldest first.
+        """
+        cache = _status_cache()
+        entries = []
+        for game_id in _session_games():
+            state = _load_state(game_id)
+            if state is None:
+                game_service.forget_session_game(session, game_id)
+                continue
+            seat = _seat(game_id)
+            entries.append(game_service.lobby_entry(game_id, game_service.cached_status(cache, game_id, state, seat),
+                                                    game_id == session.get('game_id'), seat))
+        return {'games': entries}
+
+    def post(self):
+        """
+        Starts a new game next to the session's other games.
+
+        The session's current game is left unchanged; the new game is played through
+        /games/<game_id>/play_turn.
+
+        Returns:
+            tuple: Response with the ID and the status of the new game, and 201.
+        """
+        parser = reqparse.RequestParser()
+        parser.add_argument('opponent_type', type=str, default="A")
+        args = parser.parse_args()
+
+        game_id, game_instance = _new_game(args['opponent_type'])
+        body = game_service.start_body(game_instance)
+        body['game_id'] = game_id
+        return body, 201
+
+class SessionGame(Resource):
+    """
+    Resource for one of the session's games.
+    """
+
+    def delete(self, game_id):
+        """
+        Deletes a game of the session.
+
+        Returns:
+            dict: Response indicating success.
+        """
+        game_id, error = _addressed_game(game_id)
+        if error is not None:
+            return error
+        _delete_game(game_id)
+        return {'success': True}
+
+class Match(Resource):
+    """
+    Resource for matchmaking: finding an opponent for a player-versus-player game.
+    """
+
+    def post(self):
+        """
+        Joins the game of the player who has waited longest or, if nobody is waiting,
+        waits for an opponent.
+
+        A waiting player gets a game of their own, in which they play first once a second
+        player joins; its status is 'waiting' until then. Calling /match again while waiting
+        keeps the player in the queue (see MATCH_MAX_WAIT) and tells whether they were
+        matched meanwhile. Matches are played through /games/<game_id>/play_turn, each
+        player only on their turn.
+
+        Returns:
+            tuple: Response with the game ID, the player's seat ('first' or 'second') and
+            the game status, and 200 once the game has two players or 202 while waiting.
+        """
+        cache = _status_cache()
+        waiting_id, state, game_instance = session.get('waiting'), None, None
+        if waiting_id is not None:
+            state = _load_state(waiting_id, use_cache=False)
+            if state is None:
+                game_service.forget_session_game(session, waiting_id)
+                waiting_id = None
+            elif state.get('turn') is not None:
+                # Joined by an opponent since the last call.
+                session.pop('waiting')
+                return game_service.match_body(waiting_id, 'pO',
+                                               game_service.cached_status(cache, waiting_id, state, 'pO'))
+        if waiting_id is None:
+            waiting_id, game_instance = _new_game(HUMAN)
+            game_service.take_seat(session, waiting_id, 'pO')
+            session['waiting'] = waiting_id
+
+        game_id, joined = _matchmaker().pair(waiting_id)
+        if game_id is None:
+            if game_instance is None:
+                rendered = game_service.cached_status(cache, waiting_id, state, 'pO')
+            else:
+                rendered = game_service.render_status(cache, waiting_id, game_instance, 'pO')
+            return game_service.match_body(waiting_id, 'pO', rendered)
+
+        _delete_game(waiting_id)
+        _add_session_game(game_id)
+        game_service.take_seat(session, game_id, 'pC')
+        return game_service.match_body(game_id, 'pC', game_service.render_status(cache, game_id, joined, 'pC'))
 
-        return {
-            'success': True,
-            'current_status': game_instance.get_status()
-        }
 
 class PlayTurn(Resource):
     """
     Resource for playing a turn in the game.
     """
 
-    def post(self):
+    def post(self, game_id=None):
         """
         Executes a turn based on the provided action and card index.
 
+        Args:
+            game_id (str, optional): The game, for /games/<game_id>/play_turn. Defaults to
+                the session's current game.
+
         Returns:
             dict: Response indicating the game status after the turn.
         """
-        if 'game_state' not in session:
-            return {"error": "Game not started. Please start a game first."}, 400
+        addressed = game_id
+        game_id, error = _addressed_game(game_id)
+        if error is not None:
+            return error
 
         parser = reqparse.RequestParser()
         parser.add_argument('action', type=str, required=True)
         parser.add_argument('card_index', type=int)
         args = parser.parse_args()
 
-        game_instance = Game()
-        game_instance.set_state(session['game_state'])
-
+        seat = _seat(game_id)
         try:
-            game_instance.play_turn(args['action'], args['card_index'])
-            session['game_state'] = game_instance.get_state()
-            session.modified = True
+            game_instance, _ = _game_registry().update(
+                game_id, lambda game: game_service.play_action(game, args['action'], args['card_index'], seat))
+        except NotYourTurnError as e:
+            return game_service.error_body(e), 403
+        except StaleStateError:
+            return {"error": GAME_CHANGED}, 409
+        except Exception as e:  # Invalid actions and cards, and storage errors
+            return game_service.error_body(e), 400
+        if game_instance is None:
+            return _missing_game(addressed)
 
-            return self._get_game_status(game_instance)
-        except ValueError as e:  # Catch invalid actions
-            return {"success": False, "error": str(e)}, 400
-        except (InvalidCardIndexError, InsufficientMoneyError, InsufficientSupplementError) as e:
-            return {"success": False, "error": str(e)}, 400
-        except Exception as e:
-            return {"error": str(e)}, 400
+        return self._get_game_status(game_id, game_instance, seat)
 
-    def _get_game_status(self, game_instance):
+    def _get_game_status(self, game_id, game_instance, seat=None):
         """
         Retrieves the current game status.
 
+        The status is cached for the game's version, so the polls and event streams
+        that follow the turn are served without rebuilding it.
+
         Args:
+            game_id (str): The ID of the game.
             game_instance (Game): The current game instance.
+            seat (str, optional): The side the session plays in a player-versus-player game.
 
         Returns:
-            dict: Response indicating the current game status.
+            Response: Response indicating the current game status.
         """
         # This function checks the game status and returns the appropriate response
-        if 'game_state' not in session:
-            return jsonify(error="Game not started. Please start a game first."), 400
-
-        game_instance = Game()
-        game_instance.set_state(session['game_state'])  # Set the game state from the session
-
-        game_status, message, current_status = '', '', game_instance.get_status();
-        # Check game end conditions after the turn is played
-        if game_instance.pO['health'] <= 0:
-            logging.info("Computer wins")
-            game_status = 'ended'
-            message = 'Computer wins'
-        elif game_instance.pC['health'] <= 0:
-            logging.info('Player wins')
-            game_status = 'ended'
-            message = 'Player wins'
-        elif game_instance.central['activeSize'] == 0:
-            logging.info("No more cards available")
-            if game_instance.pO['health'] > game_instance.pC['health']:
-                logging.info("Player wins on Health")
-                game_status = 'ended'
-                message = 'Player wins on Health'
-            elif game_instance.pC['health'] > game_instance.pO['health']:
-                logging.info("Computer wins")
-                game_status = 'ended'
-                message = 'Computer wins'
-            else:
-                logging.info("Draw")
-                game_status = 'ended'
-                message = 'The game ends in a draw'
-        else:   
-            game_status = 'running'
-            message = 'The game is still ongoing' 
-            
-        return jsonify({
-            'game_status': game_status,
-            'message': message,
-            'current_status': current_status if game_status == "running" else game_status
-        })
+        if game_instance is None:
+            return jsonify(error=GAME_NOT_STARTED), 400
+
+        return _status_response(game_service.render_status(_status_cache(), game_id, game_instance, seat))
+
+class PlayTurns(Resource):
+    """
+    Resource for playing a sequence of turn actions in one request.
+    """
+
+    def post(self, game_id=None):
+        """
+        Applies an ordered list of actions to the game, loading and saving it once.
+
+        Each action is either an action name or an object with an `action` and an optional
+        `card_index`. Actions are applied in order until one fails or the game ends. The
+        actions applied before a failing one are kept and saved, exactly as if they had
+        been sent one by one to /play_turn; the response is then a 400 naming the failed
+        step. With `response` set to 'steps', the status after each applied action is
+        returned as well.
+
+        Args:
+            game_id (str, optional): The game, for /games/<game_id>/play_turns. Defaults to
+                the session's current game.
+
+        Returns:
+            dict: Response indicating the game status after the actions.
+        """
+        addressed = game_id
+        game_id, error = _addressed_game(game_id)
+        if error is not None:
+            return error
+
+        parser = reqparse.RequestParser()
+        parser.add_argument('actions', type=list, location='json', required=True)
+        parser.add_argument('response', type=str, default='final', choices=BATCH_RESPONSES, location='json')
+        args = parser.parse_args()
+
+        try:
+            steps = game_service.parse_steps(args['actions'])
+        except ValueError as e:
+            return {"success": False, "error": str(e)}, 400
+
+        report_steps = args['response'] == 'steps'
+        seat = _seat(game_id)
+
+        def play(game):
+            game.check_turn(seat)
+            return game.version, game_service.play_actions(game, steps, report_steps, seat)
+
+        try:
+            game_instance, outcome = _game_registry().update(game_id, play)
+        except NotYourTurnError as e:
+            return game_service.error_body(e), 403
+        except StaleStateError:
+            return {"error": GAME_CHANGED}, 409
+        except Exception as e:
+            return {"error": str(e)}, 400
+        if game_instance is None:
+            return _missing_game(addressed)
+
+        previous_version, (results, error, failed_step) = outcome
+        return game_service.batch_body(game_instance, previous_version, results, error, failed_step, report_steps,
+                                       seat)
 
 class GameStatus(Resource):
     """
     Resource for retrieving the current game status.
     """
 
-    def get(self):
+    def get(self, game_id=None):
         """
         Retrieves the current game status.
 
+        Args:
+            game_id (str, optional): The game, for /games/<game_id>/status. Defaults to
+                the session's current game.
+
         Returns:
             dict: Response indicating the current game status.
         """
-        if 'game_state' not in session:
-            return {"error": "Game not started. Please start a game first."}, 400
+        addressed = game_id
+        game_id, error = _addressed_game(game_id)
+        if error is not None:
+            return error
+        state = _load_state(game_id)
+        if state is None:
+            return _missing_game(addressed)
+
+        # The status only changes with the version, so an unchanged poll is answered
+        # without restoring the game, and a changed one from the status cache when
+        # another request already built the status of this version.
+        seat = _seat(game_id)
+        etag = game_service.status_etag(game_id, state.get('version', 0), seat)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = _status_response(game_service.cached_status(_status_cache(), game_id, state, seat))
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+
+@game_blueprint.route('/events')
+@game_blueprint.route('/games/<game_id>/events')
+def game_events(game_id=None):
+    """
+    Streams the status of the current game (or of one of the session's games) as server-sent events.
 
-        game_instance = Game()
-        game_instance.set_state(session['game_state'])
+    The current status is sent first (unless the client reconnects with the Last-Event-ID
+    of the current version), then a new status each time the version changes. The stream
+    is closed after EVENTS_MAX_DURATION seconds so that it does not hold a sync worker
+    past its timeout; EventSource clients reconnect on their own.
 
-        return PlayTurn()._get_game_status(game_instance)  # Reuse the game status function
+    Args:
+        game_id (str, optional): The game, for /games/<game_id>/events. Defaults to the
+            session's current game.
+
+    Returns:
+        Response: The event stream, or 400 if there is no game.
+    """
+    addressed = game_id
+    game_id, error = _addressed_game(game_id)
+    if error is not None:
+        return error
+    state = _load_state(game_id)
+    if state is None:
+        return _missing_game(addressed)
+    config = current_app.config
+    sent = parse_last_event_id(request.headers.get('Last-Event-ID'))
+    seat = _seat(game_id)
+
+    def stream(state, sent):
+        store = _game_store()
+        cache = _status_cache()
+        deadline = time.monotonic() + config['EVENTS_MAX_DURATION']
+        last_write = time.monotonic()
+        with notifier.subscribe(game_id) as changed:
+            while True:
+                if state is None:
+                    yield end_event(GAME_NOT_STARTED)
+                    return
+                now = time.monotonic()
+                if state.get('version', 0) != sent:
+                    sent = state.get('version', 0)
+                    last_write = now
+                    yield status_event(game_service.cached_status(cache, game_id, state, seat))
+                elif now - last_write >= config['EVENTS_KEEPALIVE']:
+                    last_write = now
+                    yield KEEPALIVE
+                if now >= deadline:
+                    return
+                changed.wait(min(config['EVENTS_POLL_INTERVAL'], deadline - now))
+                changed.clear()
+                state = store.load(game_id)
+
+    response = Response(stream_with_context(stream(state, sent)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@game_blueprint.route('/replay/<game_id>')
+def game_replay(game_id):
+    """
+    Replays one of the session's games from its action log, streaming the status after
+    each action as newline-delimited JSON.
+
+    The replay starts at the version given by the `start` query parameter (default 0)
+    and runs to the game's current version, one line per version; see
+    `game_service.replay_lines`. Only games stored as an action log (STATE_FORMAT 'log')
+    can be replayed.
+
+    Args:
+        game_id (str): The game.
+
+    Returns:
+        Response: The NDJSON stream, 404 if there is no such game, 409 if the game cannot
+        be replayed or 400 for an invalid start.
+    """
+    game_id, error = _addressed_game(game_id)
+    if error is not None:
+        return error
+    record = _load_state(game_id)
+    if record is None:
+        return {"error": GAME_NOT_FOUND}, 404
+    if 'central' in record:
+        return {"error": GAME_NOT_REPLAYABLE}, 409
+    try:
+        start = game_service.parse_replay_start(request.args.get('start'), record)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    response = Response(stream_with_context(game_service.replay_lines(record, start, _seat(game_id))),
+                        mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 api.add_resource(StartGame, '/start')
-api.add_resource(PlayTurn, '/play_turn')
-api.add_resource(GameStatus, '/status')
\ No newline at end of file
+api.add_resource(PlayTurn, '/play_turn', '/games/<game_id>/play_turn')
+api.add_resource(PlayTurns, '/play_turns', '/games/<game_id>/play_turns')
+api.add_resource(GameStatus, '/status', '/games/<game_id>/status')
+api.add_resource(Games, '/games')
+api.add_resource(SessionGame, '/games/<game_id>')
+api.add_resource(Match, '/match')
@@ -0,0 +1,116 @@
+import json
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+KEEPALIVE = b': keepalive\n\n'
+
+
+def status_event(rendered):
+    """
+    Formats a status update as a server-sent event.
+
+    The event ID is the state version, so a reconnecting EventSource sends it back in
+    the Last-Event-ID header and is only sent the status again if it changed meanwhile.
+
+    Args:
+        rendered (RenderedStatus): The status response, as returned by `game_service.cached_status`.
+
+    Returns:
+        bytes: The encoded event.
+    """
+    return b'id: %d\nevent: status\ndata: %s\n\n' % (rendered.version, rendered.json)
+
+
+def end_event(message):
+    """
+    Formats the event sent before closing a stream whose game no longer exists.
+
+    Args:
+        message (str): The reason.
+
+    Returns:
+        bytes: The encoded event.
+    """
+    return f'event: end\ndata: {json.dumps({"error": message})}\n\n'.encode('utf-8')
+
+
+def parse_last_event_id(value):
+    """
+    Returns the state version a reconnecting client last received, or None.
+
+    Args:
+        value (str): The Last-Event-ID header, or None.
+    """
+    if value and value.isdigit():
+        return int(value)
+    return None
+
+
+class GameNotifier:
+    """
+    Wakes up the event streams of a game when this process saves a new version of it.
+
+    Only saves made in the same process are seen; streams also re-check the store every
+    few seconds to pick up moves handled by other workers.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, game_id):
+        """
+        Wakes up every stream waiting for a change of a game.
+
+        Args:
+            game_id (str): The ID of the game that was saved or deleted.
+        """
+        with self._lock:
+            callbacks = list(self._subscribers.get(game_id, ()))
+        for callback in callbacks:
+            callback()
+
+    def _add(self, game_id, callback):
+        with self._lock:
+            self._subscribers[game_id].add(callback)
+
+    def _remove(self, game_id, callback):
+        with self._lock:
+            subscribers = self._subscribers.get(game_id)
+            if subscribers is not None:
+                subscribers.discard(callback)
+                if not subscribers:
+                    del self._subscribers[game_id]
+
+    @contextmanager
+    def subscribe(self, game_id):
+        """
+        Subscribes the current thread to the changes of a game.
+
+        Clear the yielded event before reading the game, then wait on it: a save made in
+        between sets it, so no change is missed.
+
+        Args:
+            game_id (str): The ID of the game.
+
+        Yields:
+            threading.Event: Set whenever the game is saved.
+        """
+        event = threading.Event()
+        callback = event.set
+        self._add(game_id, callback)
+        try:
+            yield event
+        finally:
+            self._remove(game_id, callback)
+
+    def subscriber_count(self, game_id):
+        """
+        Returns the number of streams subscribed to a game.
+        """
+        with self._lock:
+            return len(self._subscribers.get(game_id, ()))
+
+
+notifier = GameNotifier()
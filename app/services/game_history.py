@@ -0,0 +1,134 @@
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger('flaskgame.history')
+
+
+class GameHistory:
+    """
+    Records finished games in a `HistoryStore` and serves the leaderboard built from it.
+
+    Requests never wait for the database: `record` only appends the game to a pending
+    batch. A writer thread, started with the first game recorded, inserts the batch in
+    one transaction every `flush_interval` seconds, or as soon as it holds `batch_size`
+    games.
+
+    The leaderboard is built from the store's summary queries at most once every
+    `refresh_interval` seconds and kept encoded, so a request for it reads nothing and
+    encodes nothing while it is fresh.
+
+    Attributes:
+        store (HistoryStore): The history store.
+        batch_size (int): Number of pending games that triggers a write.
+        flush_interval (float): Seconds between two writes of the pending games.
+        refresh_interval (float): Seconds the leaderboard is served before it is rebuilt.
+        limit (int): Number of fastest wins on the leaderboard.
+    """
+
+    def __init__(self, store, batch_size=500, flush_interval=1.0, refresh_interval=10.0, limit=10):
+        """
+        Initializes the history.
+
+        Args:
+            store (HistoryStore): The history store.
+            batch_size (int, optional): Number of pending games that triggers a write. Defaults to 500.
+            flush_interval (float, optional): Seconds between two writes. Defaults to 1.
+            refresh_interval (float, optional): Seconds between two rebuilds of the leaderboard.
+                Defaults to 10.
+            limit (int, optional): Number of fastest wins on the leaderboard. Defaults to 10.
+        """
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self.limit = limit
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._writer = None
+        self._closed = False
+        self._leaderboard = None
+        self._refreshed_at = None
+
+    def record(self, row):
+        """
+        Queues a finished game for the next write.
+
+        Args:
+            row (tuple): The HISTORY_COLUMNS values of the game, from `game_service.history_row`.
+        """
+        with self._lock:
+            self._pending.append(row)
+            full = len(self._pending) >= self.batch_size
+            if self._writer is None and not self._closed:
+                self._writer = threading.Thread(target=self._run, name='game-history-writer', daemon=True)
+                self._writer.start()
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """
+        Writes the pending games to the store.
+
+        Returns:
+            int: Number of games inserted; games already stored are skipped.
+        """
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return 0
+        return self.store.insert(rows)
+
+    def refresh_due(self):
+        """
+        Tells whether the leaderboard is missing or older than the refresh interval.
+        """
+        return self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_interval
+
+    def refresh(self):
+        """
+        Rebuilds the leaderboard from the store.
+        """
+        opponents = self.store.opponent_summary()
+        for entry in opponents:
+            entry['win_rate'] = round(entry['player_wins'] / entry['games'], 4)
+        body = {'opponents': opponents, 'fastest_wins': self.store.fastest_wins(self.limit),
+                'refreshed_at': time.time()}
+        self._leaderboard = json.dumps(body, separators=(',', ':')).encode('utf-8')
+        self._refreshed_at = time.monotonic()
+
+    def leaderboard(self):
+        """
+        Returns the leaderboard, rebuilding it first if it is due.
+
+        Returns:
+            bytes: The leaderboard as JSON: the games, wins, draws and win rate of the
+            player against each opponent, the fastest wins, and when it was built.
+        """
+        if self.refresh_due():
+            self.refresh()
+        return self._leaderboard
+
+    def close(self):
+        """
+        Stops the writer thread, writes the pending games and closes the store.
+        """
+        with self._lock:
+            self._closed = True
+            writer = self._writer
+        self._wake.set()
+        if writer is not None:
+            writer.join()
+        self.flush()
+        self.store.close()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:  # Keep recording the next games if one write fails
+                logger.exception("Could not write finished games to the history")
@@ -0,0 +1,292 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from app.models.game import Game
+from app.services import game_service
+from app.services.game_events import notifier
+from app.utils.exceptions import StaleStateError
+from app.utils.metrics import metrics
+
+
+class GameRegistry:
+    """
+    Per-worker registry of the games being played, keyed by game ID.
+
+    Every change to a game is made under a lock, so concurrent requests on one game are
+    applied one after the other within a worker. Rather than a lock per game, which would
+    have to be created and freed as games come and go, game IDs are hashed onto a fixed
+    table of `lock_shards` locks; two games sharing a lock only wait for each other.
+
+    Across workers, saves are conditional on the version a game was loaded at (see
+    `GameStateStore.save`), so of two workers changing a game at once only the first one
+    saves it and the other gets `StaleStateError`.
+
+    The games this worker last changed are kept in memory, so the next move on a game
+    is applied without reading the store. If another worker changed the game meanwhile,
+    its conditional save fails; the game is then read from the store and the move
+    applied again. A move that fails or changes nothing on a kept game saves nothing,
+    so its outcome is only trusted once the stored version is checked to still be the
+    kept game's; otherwise the game is read again as well. Games unused for `idle_timeout` seconds are dropped in bulk by `sweep`,
+    which also purges expired games from the store.
+
+    Games are stored in one of the STATE_FORMATS: 'piles', the full state of the game
+    (see `Game.get_state`), with deltas of the piles and values each move changed; or
+    'log', the seed and action log of the game (see `Game.get_record`), with the entries
+    each move added. A log is smaller and replays the game exactly, e.g. to debug it. Its
+    full snapshots, one every snapshot interval of the store, carry a checkpoint of the
+    game, so restoring a game only replays the moves since the latest one. Games whose
+    log does not go back to their start, e.g. saved before the format was switched, keep
+    being stored as piles.
+
+    With a `GameHistory`, each game that a move ends is recorded in it, for the leaderboard.
+
+    Attributes:
+        store (CachedStore): The game state store.
+        maxsize (int): Maximum number of games kept in memory.
+        idle_timeout (float): Seconds after its last change at which a game is dropped from memory.
+        sweep_interval (float): Seconds between two sweeps.
+        state_format (str): 'piles' or 'log'.
+        history (GameHistory): Where finished games are recorded, or None.
+    """
+
+    STATE_FORMATS = ('piles', 'log')
+
+    def __init__(self, store, lock_shards=64, maxsize=1024, idle_timeout=300, sweep_interval=60,
+                 state_format='piles', history=None):
+        """
+        Initializes the registry.
+
+        Args:
+            store (CachedStore): The game state store.
+            lock_shards (int, optional): Number of locks games are spread over. Defaults to 64.
+            maxsize (int, optional): Maximum number of games kept in memory. Defaults to 1024.
+            idle_timeout (float, optional): Seconds after which an unused game is dropped
+                from memory. Defaults to 300.
+            sweep_interval (float, optional): Seconds between two sweeps. Defaults to 60.
+            state_format (str, optional): Format games are stored in, 'piles' or 'log'.
+                Defaults to 'piles'.
+            history (GameHistory, optional): Where finished games are recorded. Defaults to None.
+
+        Raises:
+            ValueError: If `state_format` is not one of STATE_FORMATS.
+        """
+        if state_format not in self.STATE_FORMATS:
+            raise ValueError(f"Unknown state format: {state_format}. Available formats: "
+                             f"{', '.join(self.STATE_FORMATS)}")
+        self.store = store
+        self.state_format = state_format
+        self.history = history
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self._locks = [threading.Lock() for _ in range(lock_shards)]
+        self._games = OrderedDict()
+        self._games_lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def lock(self, game_id):
+        """
+        Returns the lock guarding changes to a game within this worker.
+
+        Args:
+            game_id (str): The ID of the game.
+
+        Returns:
+            threading.Lock: The lock of the game's shard.
+        """
+        return self._locks[hash(game_id) % len(self._locks)]
+
+    def create(self, game):
+        """
+        Saves a new game under a new ID.
+
+        Args:
+            game (Game): The game.
+
+        Returns:
+            str: The ID of the game.
+        """
+        game_id = uuid.uuid4().hex
+        with metrics.time('session_save'):
+            self.store.save(game_id, self._state(game))
+        game.dirty.clear()
+        self._keep(game_id, game)
+        return game_id
+
+    def update(self, game_id, mutate):
+        """
+        Applies a change to a game and saves it, holding the game's lock.
+
+        Args:
+            game_id (str): The ID of the game.
+            mutate (callable): Called with the Game to change it in place; returns a result
+                for the caller. It is called again if the game kept in memory turns out to
+                be out of date, and must leave the game unchanged when it raises.
+
+        Returns:
+            tuple: The game and the result of `mutate`, or (None, None) if the game does not exist.
+
+        Raises:
+            StaleStateError: If another worker changed the game while it was being changed here.
+        """
+        with self.lock(game_id):
+            game = self._take(game_id)
+            while True:
+                fresh = game is None
+                if fresh:
+                    with metrics.time('session_load'):
+                        state = self.store.load(game_id, use_cache=False)
+                    if state is None:
+                        return None, None
+                    game = self._restore(state)
+                previous_version = game.version
+                try:
+                    result = self._mutate(game_id, game, mutate)
+                except Exception:
+                    if fresh or self._current(game_id, previous_version):
+                        raise
+                    game = None
+                    continue
+                if game.version == previous_version:
+                    if not fresh and not self._current(game_id, previous_version):
+                        game = None
+                        continue
+                    self._keep(game_id, game)
+                    return game, result
+                try:
+                    with metrics.time('session_save'):
+                        if self.store.snapshot_due(game.version, previous_version) or \
+                                fresh and self._records(game) != ('central' not in state):
+                            self.store.save(game_id, self._state(game), expected_version=previous_version)
+                        else:
+                            self.store.save_delta(game_id, self._delta(game, previous_version), previous_version,
+                                                  expected_version=previous_version)
+                except StaleStateError:
+                    if fresh:
+                        raise
+                    game = None
+                    continue
+                self._saved(game_id, game)
+                break
+        self.maybe_sweep()
+        return game, result
+
+    def delete(self, game_id):
+        """
+        Removes a game from memory and from the store.
+
+        Args:
+            game_id (str): The ID of the game.
+        """
+        with self.lock(game_id):
+            self._forget(game_id)
+            self.store.delete(game_id)
+        notifier.publish(game_id)
+
+    def maybe_sweep(self):
+        """
+        Runs `sweep` if `sweep_interval` seconds have passed since the last one.
+        """
+        if time.monotonic() < self._next_sweep:
+            return
+        with self._games_lock:
+            if time.monotonic() < self._next_sweep:
+                return
+            self._next_sweep = time.monotonic() + self.sweep_interval
+        self.sweep()
+
+    def sweep(self):
+        """
+        Drops the games idle for `idle_timeout` seconds from memory, and the expired games
+        from the store and its cache.
+
+        Games are kept in order of last use, so the idle ones are found without looking
+        at the others.
+
+        Returns:
+            int: The number of games removed from the store.
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._games_lock:
+            while self._games:
+                game_id, (used, _) = next(iter(self._games.items()))
+                if used > cutoff:
+                    break
+                del self._games[game_id]
+        return self.store.purge_expired()
+
+    def __len__(self):
+        return len(self._games)
+
+    def _records(self, game):
+        """
+        Tells whether a game is stored as its record rather than as its state.
+
+        A game read from the store in the other format is saved in full at its next move,
+        so deltas are always applied to a snapshot of their own format.
+        """
+        return self.state_format == 'log' and game.replayable
+
+    def _state(self, game):
+        return game.get_record(checkpoint=game.version > 0) if self._records(game) else game.get_state()
+
+    def _delta(self, game, previous_version):
+        return game.get_record(since=previous_version) if self._records(game) else game.get_delta()
+
+    @staticmethod
+    def _restore(state):
+        with metrics.time('set_state'):
+            return Game.from_state(state)
+
+    def _mutate(self, game_id, game, mutate):
+        version = game.version
+        try:
+            return mutate(game)
+        except BaseException:
+            # A failed action leaves the game as it was, so it can be kept.
+            if game.version == version:
+                self._keep(game_id, game)
+            raise
+
+    def _current(self, game_id, version):
+        """
+        Tells whether the stored game is still at the version of the game kept in memory,
+        dropping the kept game if it is not.
+        """
+        with metrics.time('session_load'):
+            current = self.store.version(game_id) == version
+        if not current:
+            self._forget(game_id)
+        return current
+
+    def _saved(self, game_id, game):
+        game.dirty.clear()
+        self._keep(game_id, game)
+        notifier.publish(game_id)
+        if self.history is not None:
+            row = game_service.history_row(game_id, game)
+            if row is not None:
+                self.history.record(row)
+
+    def _take(self, game_id):
+        """
+        Removes a game from memory and returns it, or None if it is not kept or idle.
+        """
+        with self._games_lock:
+            entry = self._games.pop(game_id, None)
+        if entry is None or entry[0] <= time.monotonic() - self.idle_timeout:
+            return None
+        return entry[1]
+
+    def _keep(self, game_id, game):
+        with self._games_lock:
+            self._games[game_id] = (time.monotonic(), game)
+            self._games.move_to_end(game_id)
+            while len(self._games) > self.maxsize:
+                self._games.popitem(last=False)
+
+    def _forget(self, game_id):
+        with self._games_lock:
+            self._games.pop(game_id, None)
@@ -0,0 +1,526 @@
+import json
+import time
+
+from app.models.catalog import STARTER_DECK
+from app.models.game import Game
+from app.utils.exceptions import (InsufficientMoneyError,
+                                  InsufficientSupplementError,
+                                  InvalidCardIndexError, NotYourTurnError)
+from app.utils.game_logger import game_log
+from app.utils.metrics import metrics
+
+GAME_NOT_STARTED = "Game not started. Please start a game first."
+GAME_NOT_FOUND = "Game not found. It may have ended or expired."
+GAME_CHANGED = "The game was changed by another request. Reload it and try again."
+GAME_NOT_REPLAYABLE = "This game is not stored as an action log and cannot be replayed."
+# Most actions accepted by one /play_turns request.
+MAX_BATCH_ACTIONS = 50
+BATCH_RESPONSES = ('final', 'steps')
+INDEXED_ACTIONS = ('C', 'play_that_card', 'B', 'buy_card')
+TURN_ERRORS = (ValueError, InvalidCardIndexError, InsufficientMoneyError, InsufficientSupplementError,
+               NotYourTurnError)
+# Names of the sides of a player-versus-player game in responses.
+SEAT_NAMES = {'pO': 'first', 'pC': 'second'}
+STARTER_DECK_SIZE = sum(copies for _, copies in STARTER_DECK)
+
+
+def new_game(opponent_type):
+    """
+    Creates and starts a game.
+
+    Args:
+        opponent_type (str or Policy): The opponent type, as sent to /start, or HUMAN for a
+            player-versus-player game waiting for its second player.
+
+    Returns:
+        Game: The started game.
+    """
+    game_instance = Game(opponent_type)
+    game_instance.start()
+    return game_instance
+
+
+def add_session_game(games, game_id, limit):
+    """
+    Adds a game to the games of a session, keeping at most `limit` of them.
+
+    Args:
+        games (list): IDs of the session's games, oldest first.
+        game_id (str): The ID of the new game.
+        limit (int): Most games a session can hold.
+
+    Returns:
+        tuple: The new list of game IDs and the IDs of the oldest games dropped from it.
+    """
+    games = [*games, game_id]
+    return games[-limit:], games[:-limit]
+
+
+def take_seat(session, game_id, seat):
+    """
+    Records the side a session plays in a player-versus-player game.
+
+    Args:
+        session (dict): The session.
+        game_id (str): The ID of the game.
+        seat (str): 'pO' or 'pC'.
+    """
+    session['seats'] = {**session.get('seats', {}), game_id: seat}
+
+
+def forget_session_game(session, game_id):
+    """
+    Removes a game from a session: from its games, its seats, and as its current or waiting game.
+
+    Keys are replaced rather than changed in place, so Flask notices the change.
+
+    Args:
+        session (dict): The session.
+        game_id (str): The ID of the game.
+    """
+    if game_id in session.get('games', []):
+        session['games'] = [other for other in session['games'] if other != game_id]
+    if game_id in session.get('seats', {}):
+        session['seats'] = {other: seat for other, seat in session['seats'].items() if other != game_id}
+    for key in ('game_id', 'waiting'):
+        if session.get(key) == game_id:
+            session.pop(key)
+
+
+def lobby_entry(game_id, rendered, current=False, seat=None):
+    """
+    Builds the description of one game in the response of GET /games.
+
+    Args:
+        game_id (str): The ID of the game.
+        rendered (RenderedStatus): The status of the game.
+        current (bool, optional): Whether it is the session's current game. Defaults to False.
+        seat (str, optional): The side the session plays in a player-versus-player game. Defaults to None.
+
+    Returns:
+        dict: The game ID, version, status and message, and the seat in a player-versus-player game.
+    """
+    entry = {
+        'game_id': game_id,
+        'version': rendered.version,
+        'game_status': rendered.body['game_status'],
+        'message': rendered.body['message'],
+        'current': current
+    }
+    if seat is not None:
+        entry['seat'] = SEAT_NAMES[seat]
+    return entry
+
+
+def start_body(game_instance):
+    """
+    Builds the response of /start.
+
+    Args:
+        game_instance (Game): The new game.
+
+    Returns:
+        dict: Response indicating success and the current game status.
+    """
+    with metrics.time('get_status'):
+        current_status = game_instance.get_status()
+    return {
+        'success': True,
+        'current_status': current_status
+    }
+
+
+def play_action(game_instance, action, card_index=None, seat=None):
+    """
+    Plays one turn action.
+
+    Args:
+        game_instance (Game): The game.
+        action (str): The action.
+        card_index (int, optional): Index of the card to play or buy. Defaults to None.
+        seat (str, optional): The side the client plays in a player-versus-player game.
+            Defaults to None.
+
+    Raises:
+        ValueError, InvalidCardIndexError, InsufficientMoneyError, InsufficientSupplementError,
+        NotYourTurnError: If the action cannot be played. The game is left unchanged.
+    """
+    with metrics.time('play_turn'):
+        game_instance.play_turn(action, card_index, seat)
+
+
+def error_body(error):
+    """
+    Builds the 400 response of a failed turn.
+
+    Args:
+        error (Exception): The error raised while playing or saving the turn.
+
+    Returns:
+        dict: The error response.
+    """
+    if isinstance(error, TURN_ERRORS):
+        return {"success": False, "error": str(error)}
+    return {"error": str(error)}
+
+
+def parse_steps(actions):
+    """
+    Validates the actions of a /play_turns request.
+
+    Args:
+        actions (list): Action names, or objects with an `action` and an optional `card_index`.
+
+    Returns:
+        list: (action, card_index) pairs.
+
+    Raises:
+        ValueError: If the list is empty, too long, or an action is malformed.
+    """
+    if not actions:
+        raise ValueError("No actions given.")
+    if len(actions) > MAX_BATCH_ACTIONS:
+        raise ValueError(f"At most {MAX_BATCH_ACTIONS} actions can be played in one request.")
+    steps = []
+    for index, step in enumerate(actions):
+        if isinstance(step, str):
+            step = {'action': step}
+        if not isinstance(step, dict) or not isinstance(step.get('action'), str):
+            raise ValueError(f"Step {index} must be an action name or an object with an 'action'.")
+        card_index = step.get('card_index')
+        if card_index is None and step['action'] in INDEXED_ACTIONS:
+            raise ValueError(f"Step {index} ({step['action']}) needs a card_index.")
+        if card_index is not None and (isinstance(card_index, bool) or not isinstance(card_index, int)):
+            raise ValueError(f"Step {index} has an invalid card_index: {card_index!r}")
+        steps.append((step['action'], card_index))
+    return steps
+
+
+def play_actions(game_instance, steps, report_steps=False, seat=None):
+    """
+    Plays a sequence of actions until one fails or the game ends.
+
+    Args:
+        game_instance (Game): The game.
+        steps (list): (action, card_index) pairs from `parse_steps`.
+        report_steps (bool, optional): Whether to record the status after each action. Defaults to False.
+        seat (str, optional): The side the client plays in a player-versus-player game.
+            Defaults to None.
+
+    Returns:
+        tuple: The per-step results (empty unless `report_steps`), the error message of the
+        failed step or None, and the index of the failed step or None.
+    """
+    results = []
+    for index, (action, card_index) in enumerate(steps):
+        try:
+            play_action(game_instance, action, card_index, seat)
+        except TURN_ERRORS as e:
+            return results, str(e), index
+        if report_steps:
+            with metrics.time('get_status'):
+                results.append({'action': action, 'card_index': card_index,
+                                'current_status': game_instance.get_status(seat)})
+        if game_outcome(game_instance)[0] == 'ended':
+            break
+    return results, None, None
+
+
+def batch_body(game_instance, previous_version, results, error, failed_step, report_steps=False, seat=None):
+    """
+    Builds the response of /play_turns.
+
+    Args:
+        game_instance (Game): The game, after `play_actions`.
+        previous_version (int): Version of the game before the actions.
+        results (list): Per-step results returned by `play_actions`.
+        error (str): Error message of the failed step, or None.
+        failed_step (int): Index of the failed step, or None.
+        report_steps (bool, optional): Whether to include the per-step results. Defaults to False.
+        seat (str, optional): The side the client plays in a player-versus-player game.
+            Defaults to None.
+
+    Returns:
+        tuple: The response body and its HTTP status code.
+    """
+    body = status_body(game_instance, seat)
+    body['steps_applied'] = game_instance.version - previous_version
+    if report_steps:
+        body['steps'] = results
+    if error is not None:
+        body.update(success=False, error=error, failed_step=failed_step)
+        return body, 400
+    return body, 200
+
+
+def status_key(game_id, seat=None):
+    """
+    Returns the key of the status of a game as seen from one side.
+
+    The players of a player-versus-player game see different statuses, so each one is
+    cached, and tagged, under a key of its own.
+
+    Args:
+        game_id (str): The ID of the game.
+        seat (str, optional): The side, in a player-versus-player game. Defaults to None.
+
+    Returns:
+        str: The key.
+    """
+    return game_id if seat is None else f'{game_id}.{seat}'
+
+
+def forget_status(cache, game_id):
+    """
+    Drops the cached statuses of a game, as seen from every side.
+
+    Args:
+        cache (StatusCache): The status cache of the application.
+        game_id (str): The ID of the game.
+    """
+    for seat in (None, *SEAT_NAMES):
+        cache.forget(status_key(game_id, seat))
+
+
+def status_etag(game_id, version, seat=None):
+    """
+    Returns the entity tag of the status of a game at a version.
+
+    The status is a function of the game state, which only changes with its version,
+    so the tag can be computed without restoring the game.
+
+    Args:
+        game_id (str): The ID of the game.
+        version (int): The state version.
+        seat (str, optional): The side, in a player-versus-player game. Defaults to None.
+
+    Returns:
+        str: The (unquoted) entity tag.
+    """
+    return f'{status_key(game_id, seat)}-{version}'
+
+
+def render_status(cache, game_id, game_instance, seat=None):
+    """
+    Builds the status response of a game and caches it for the game's version.
+
+    Args:
+        cache (StatusCache): The status cache of the application.
+        game_id (str): The ID of the game.
+        game_instance (Game): The game, as just played or restored.
+        seat (str, optional): The side, in a player-versus-player game. Defaults to None.
+
+    Returns:
+        RenderedStatus: The status response and its JSON encoding.
+    """
+    return cache.put(status_key(game_id, seat), game_instance.version, status_body(game_instance, seat))
+
+
+def cached_status(cache, game_id, state, seat=None):
+    """
+    Returns the status response of a stored game, restoring the game only on a cache miss.
+
+    Args:
+        cache (StatusCache): The status cache of the application.
+        game_id (str): The ID of the game.
+        state (dict): The game state, as loaded from the store.
+        seat (str, optional): The side, in a player-versus-player game. Defaults to None.
+
+    Returns:
+        RenderedStatus: The status response and its JSON encoding.
+    """
+    rendered = cache.get(status_key(game_id, seat), state.get('version', 0))
+    if rendered is None:
+        with metrics.time('set_state'):
+            game_instance = Game.from_state(state)
+        rendered = render_status(cache, game_id, game_instance, seat)
+    return rendered
+
+
+def match_body(game_id, seat, rendered):
+    """
+    Builds the response of /match.
+
+    Args:
+        game_id (str): The ID of the player-versus-player game.
+        seat (str): The side the client plays, 'pO' or 'pC'.
+        rendered (RenderedStatus): The status of the game for that side.
+
+    Returns:
+        tuple: The response body, and 200 once the game has two players or 202 while it waits.
+    """
+    body = {'success': True, 'game_id': game_id, 'seat': SEAT_NAMES[seat], **rendered.body}
+    return body, 202 if body['game_status'] == 'waiting' else 200
+
+
+def parse_replay_start(value, record):
+    """
+    Validates the start version of a /replay request.
+
+    Args:
+        value (str): The `start` query parameter, or None.
+        record (dict): The record of the game, as returned by `Game.get_record()`.
+
+    Returns:
+        int: The version to start the replay at; 0 without a `start` parameter.
+
+    Raises:
+        ValueError: If the value is not a version of the game.
+    """
+    if value is None:
+        return 0
+    try:
+        start = int(value)
+    except ValueError:
+        start = -1
+    if not 0 <= start <= len(record['log']):
+        raise ValueError(f"start must be a version between 0 and {len(record['log'])}.")
+    return start
+
+
+def replay_lines(record, start=0, seat=None):
+    """
+    Replays a game and yields its status after each action, one JSON line at a time.
+
+    The game is rebuilt at `start` from the record's checkpoint when it is not later,
+    otherwise from the seed (see `Game.from_record`); the logged actions are then applied
+    to that one game, so only the current position is held, whatever the game's length.
+    The first line is the position at `start`, with no action.
+
+    Args:
+        record (dict): The record of the game, as returned by `Game.get_record()`.
+        start (int, optional): The version to start at, from `parse_replay_start`. Defaults to 0.
+        seat (str, optional): The side the statuses are for, in a player-versus-player game.
+            Defaults to None.
+
+    Yields:
+        bytes: The version, the log entry that led to it, the game status, message and
+        current status, as a newline-terminated JSON object.
+    """
+    game_instance = Game.from_record(record, version=start)
+    entries = iter(record['log'][start:])
+    entry = None
+    while True:
+        game_status, message = game_outcome(game_instance, seat)
+        line = {'version': game_instance.version, 'action': entry, 'game_status': game_status,
+                'message': message, 'current_status': game_instance.get_status(seat)}
+        yield json.dumps(line, separators=(',', ':')).encode('utf-8') + b'\n'
+        entry = next(entries, None)
+        if entry is None:
+            return
+        game_instance.apply(entry)
+
+
+def status_body(game_instance, seat=None):
+    """
+    Builds the status response of a game, logging its end if it is over.
+
+    Args:
+        game_instance (Game): The game.
+        seat (str, optional): The side the status is for, in a player-versus-player game.
+            Defaults to None.
+
+    Returns:
+        dict: The game status, message and current status.
+    """
+    with metrics.time('get_status'):
+        current_status = game_instance.get_status(seat)
+    # Check game end conditions after the turn is played
+    game_status, message = game_outcome(game_instance, seat)
+
+    if game_status == 'ended':
+        game_log.event('game_ended', message=message,
+                       player_health=game_instance.pO['health'], computer_health=game_instance.pC['health'])
+
+    return {
+        'game_status': game_status,
+        'message': message,
+        'current_status': current_status if game_status != "ended" else game_status
+    }
+
+
+def game_outcome(game_instance, seat=None):
+    """
+    Tells whether a game is still running and, if not, who won.
+
+    Args:
+        game_instance (Game): The game.
+        seat (str, optional): The side the message is for, in a player-versus-player game.
+            Defaults to None.
+
+    Returns:
+        tuple: The game status ('running' or 'ended', or 'waiting' for a player-versus-player
+        game without its second player) and a message describing it.
+    """
+    if game_instance.pvp:
+        return _pvp_outcome(game_instance, seat or 'pO')
+    if game_instance.pO['health'] <= 0:
+        return 'ended', 'Computer wins'
+    if game_instance.pC['health'] <= 0:
+        return 'ended', 'Player wins'
+    if game_instance.central['activeSize'] == 0:
+        if game_instance.pO['health'] > game_instance.pC['health']:
+            return 'ended', 'Player wins on Health'
+        if game_instance.pC['health'] > game_instance.pO['health']:
+            return 'ended', 'Computer wins'
+        return 'ended', 'The game ends in a draw'
+    return 'running', 'The game is still ongoing'
+
+
+def _pvp_outcome(game_instance, seat):
+    """
+    Tells whether a player-versus-player game is still running and, if not, who won,
+    from the point of view of one side.
+    """
+    if game_instance.turn is None:
+        return 'waiting', 'Waiting for an opponent to join.'
+    me, foe = (game_instance.pO, game_instance.pC) if seat == 'pO' else (game_instance.pC, game_instance.pO)
+    if me['health'] <= 0:
+        return 'ended', 'Your opponent wins'
+    if foe['health'] <= 0:
+        return 'ended', 'You win'
+    if game_instance.central['activeSize'] == 0:
+        if me['health'] > foe['health']:
+            return 'ended', 'You win on Health'
+        if foe['health'] > me['health']:
+            return 'ended', 'Your opponent wins on Health'
+        return 'ended', 'The game ends in a draw'
+    if game_instance.turn == seat:
+        return 'running', 'It is your turn'
+    return 'running', "It is your opponent's turn"
+
+
+def history_row(game_id, game_instance):
+    """
+    Builds the history record of a game if it has ended, for `GameHistory.record`.
+
+    The winner is 'player' (the first player), 'opponent' (the computer or the second
+    player) or 'draw'. Cards bought are counted from each side's cards, so they are known
+    for every game; turns, the end_turn actions of both sides, only if the game's action
+    log goes back to its start.
+
+    Args:
+        game_id (str): The ID of the game.
+        game_instance (Game): The game.
+
+    Returns:
+        tuple: The HISTORY_COLUMNS values of the game, or None if it has not ended.
+    """
+    if game_outcome(game_instance, 'pO')[0] != 'ended':
+        return None
+    player, opponent = game_instance.pO, game_instance.pC
+    if player['health'] <= 0:
+        winner = 'opponent'
+    elif opponent['health'] <= 0 or player['health'] > opponent['health']:
+        winner = 'player'
+    else:
+        winner = 'opponent' if opponent['health'] > player['health'] else 'draw'
+    log = game_instance.log
+    turns = sum(entry[0] == 'E' for entry in log) if len(log) == game_instance.version else None
+    return (game_id, game_instance.opponent.name, winner, turns, player['health'], opponent['health'],
+            _cards_bought(player), _cards_bought(opponent), time.time())
+
+
+def _cards_bought(player):
+    return len(player['deck']) + len(player['hand']) + len(player['active']) + len(player['discard']) - \
+        STARTER_DECK_SIZE
@@ -0,0 +1,68 @@
+from app.models.game import Game
+from app.utils.exceptions import StaleStateError
+
+# Name of the queue of the players looking for a player-versus-player game.
+PVP_QUEUE = 'pvp'
+
+
+class Matchmaker:
+    """
+    Pairs the players looking for a player-versus-player game.
+
+    A player looking for an opponent first gets a game of their own, waiting for its
+    second player. The ID of that game is the player's ticket in a matchmaking queue
+    kept by the game state store, so players reaching different workers are paired as
+    well. The next player takes the oldest ticket in constant time (see
+    `GameStateStore.pair`) and joins that game as its second player; their own waiting
+    game is then dropped.
+
+    A match is an ordinary game in the store, changed through the `GameRegistry` like
+    any other: the moves of both players load and save the same record, and a waiting
+    player holds no thread, at most an event stream. Joining is a conditional save, so
+    of two players taking the same ticket only one joins and the other takes the next.
+
+    Tickets expire after `max_wait` seconds; a player still waiting asks again to stay
+    in the queue.
+
+    Attributes:
+        registry (GameRegistry): The game registry.
+        max_wait (float): Seconds a ticket stays in the queue.
+        queue (str): Name of the queue.
+    """
+
+    def __init__(self, registry, max_wait=60, queue=PVP_QUEUE):
+        """
+        Initializes the matchmaker.
+
+        Args:
+            registry (GameRegistry): The game registry.
+            max_wait (float, optional): Seconds a ticket stays in the queue. Defaults to 60.
+            queue (str, optional): Name of the queue. Defaults to PVP_QUEUE.
+        """
+        self.registry = registry
+        self.max_wait = max_wait
+        self.queue = queue
+
+    def pair(self, game_id):
+        """
+        Joins the oldest waiting game as its second player or, if no other player is
+        waiting, queues the caller's own waiting game.
+
+        Args:
+            game_id (str): The caller's waiting game.
+
+        Returns:
+            tuple: The ID of the game joined and the game, or (None, None) if `game_id`
+            was queued.
+        """
+        while True:
+            other_id = self.registry.store.pair(self.queue, game_id, self.max_wait)
+            if other_id is None:
+                return None, None
+            try:
+                game, _ = self.registry.update(other_id, Game.join)
+            except (ValueError, StaleStateError):
+                # Joined by another player meanwhile: take the next ticket.
+                continue
+            if game is not None:
+                return other_id, game
@@ -0,0 +1,101 @@
+import json
+import threading
+from collections import OrderedDict
+
+
+class RenderedStatus:
+    """
+    The status response of a game at one version, built once and shared by every reader.
+
+    Attributes:
+        version (int): The state version the status was built from.
+        body (dict): The status response. It is shared and must not be modified.
+        json (bytes): The response body, encoded once.
+    """
+
+    __slots__ = ('version', 'body', 'json')
+
+    def __init__(self, version, body):
+        self.version = version
+        self.body = body
+        self.json = json.dumps(body, separators=(',', ':')).encode('utf-8')
+
+
+class StatusCache:
+    """
+    Bounded, per-process LRU cache of the rendered status of each game.
+
+    The status is a function of the game state, and the state only changes with its
+    version, so the status built for a version can be served to every later read of
+    that version: repeated /status polls and /events streams of a game then neither
+    restore the game nor serialize its status again. Only the latest version of each
+    game is kept; a read of any other version is a miss.
+
+    Attributes:
+        maxsize (int): Maximum number of cached games.
+    """
+
+    def __init__(self, maxsize=1024):
+        """
+        Initializes the cache.
+
+        Args:
+            maxsize (int, optional): Maximum number of cached games. Defaults to 1024.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, game_id, version):
+        """
+        Returns the rendered status of a game at a version.
+
+        Args:
+            game_id (str): The ID of the game.
+            version (int): The state version.
+
+        Returns:
+            RenderedStatus: The cached status, or None if it was not rendered for this version.
+        """
+        with self._lock:
+            rendered = self._entries.get(game_id)
+            if rendered is not None and rendered.version == version:
+                self._entries.move_to_end(game_id)
+                self.hits += 1
+                return rendered
+            self.misses += 1
+        return None
+
+    def put(self, game_id, version, body):
+        """
+        Caches the status of a game at a version, replacing that of any older version.
+
+        Args:
+            game_id (str): The ID of the game.
+            version (int): The state version the status was built from.
+            body (dict): The status response, as built by `game_service.status_body`.
+
+        Returns:
+            RenderedStatus: The cached status.
+        """
+        rendered = RenderedStatus(version, body)
+        with self._lock:
+            current = self._entries.get(game_id)
+            if current is None or current.version <= version:
+                self._entries[game_id] = rendered
+                self._entries.move_to_end(game_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return rendered
+
+    def forget(self, game_id):
+        """
+        Drops the cached status of a game.
+
+        Args:
+            game_id (str): The ID of the game.
+        """
+        with self._lock:
+            self._entries.pop(game_id, None)
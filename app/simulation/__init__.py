@@ -0,0 +1,7 @@
+from app.models.policies import ALIASES, register_policy
+from app.simulation.lookahead import EXPERT
+
+# The expert opponent is built on the simulation engine, so the models cannot import it;
+# it is registered here, when the app factory or the simulators first import this package.
+register_policy(EXPERT)
+ALIASES['X'] = 'expert'
@@ -0,0 +1,374 @@
+import random
+from collections import Counter
+
+from app.models.catalog import ATTACK, CARDS, CENTRAL_DECK, COST, MONEY, STARTER_DECK, SUPPLEMENT_DECK
+
+PLAYER_WINS = 0
+COMPUTER_WINS = 1
+DRAW = 2
+
+OUTCOMES = ('player', 'computer', 'draw')
+
+HAND_SIZE = 5
+STARTING_HEALTH = 30
+
+
+def _deck_ids(composition):
+    return [card_id for card_id, copies in composition for _ in range(copies)]
+
+
+_CENTRAL_IDS = _deck_ids(CENTRAL_DECK)
+_SUPPLEMENT_IDS = _deck_ids(SUPPLEMENT_DECK)
+_STARTER_IDS = _deck_ids(STARTER_DECK)
+
+
+def _draw(deck, discard, hand, shuffle):
+    """
+    Draws a full hand, reshuffling the discard pile into the deck when it runs out.
+
+    Returns:
+        tuple: The (possibly swapped) deck and discard piles.
+    """
+    for _ in range(HAND_SIZE):
+        if not deck:
+            shuffle(discard)
+            deck, discard = discard, deck
+        hand.append(deck.pop())
+    return deck, discard
+
+
+def play_game(player_policy, computer_policy, rng, max_rounds=1000, purchases=None):
+    """
+    Plays one complete game between two buying policies without Flask, logging or dicts.
+
+    The rules, and the order in which they consume random numbers, are the same as
+    `Game` driven through the API by a player who, every round, plays all cards,
+    attacks, buys according to `player_policy` and ends the turn. Like `Game`, the
+    player's unspent money carries over to the next round. The game ends when a
+    player's health drops to zero or the central market is empty, checked after the
+    same actions as the `/play_turn` status check.
+
+    Args:
+        player_policy (Policy): Buying policy of the player.
+        computer_policy (Policy): Buying policy of the computer.
+        rng (random.Random): Random number generator; it alone determines the game.
+        max_rounds (int, optional): Rounds after which the game is declared a draw. Defaults to 1000.
+        purchases (list, optional): Two lists of per-card purchase counts (player, computer),
+            indexed by catalog ID, to add this game's purchases to. Defaults to None.
+
+    Returns:
+        tuple: The outcome (PLAYER_WINS, COMPUTER_WINS or DRAW) and the number of rounds played.
+    """
+    return play_rounds(deal(rng), player_policy, computer_policy, rng, max_rounds, purchases)
+
+
+class Table:
+    """
+    The piles and values of a game at the start of a round, as catalog card IDs.
+
+    Attributes:
+        central (list): The central deck.
+        market (list): The central active cards.
+        supplement (list): The supplement cards.
+        p_deck, p_hand, p_discard (list): The player's piles.
+        c_deck, c_hand, c_discard (list): The computer's piles.
+        p_health, c_health (int): Health of the player and of the computer.
+        p_money (int): The player's unspent money.
+    """
+
+    __slots__ = ('central', 'market', 'supplement', 'p_deck', 'p_hand', 'p_discard',
+                 'c_deck', 'c_hand', 'c_discard', 'p_health', 'c_health', 'p_money')
+
+    def __init__(self, central, market, supplement, p_deck, p_hand, p_discard, c_deck, c_hand, c_discard,
+                 p_health=STARTING_HEALTH, c_health=STARTING_HEALTH, p_money=0):
+        self.central = central
+        self.market = market
+        self.supplement = supplement
+        self.p_deck = p_deck
+        self.p_hand = p_hand
+        self.p_discard = p_discard
+        self.c_deck = c_deck
+        self.c_hand = c_hand
+        self.c_discard = c_discard
+        self.p_health = p_health
+        self.c_health = c_health
+        self.p_money = p_money
+
+
+def deal(rng):
+    """
+    Deals a new game, shuffling like `Game` does.
+
+    Args:
+        rng (random.Random): Random number generator of the game.
+
+    Returns:
+        Table: The table before the first round.
+    """
+    shuffle = rng.shuffle
+    central = list(_CENTRAL_IDS)
+    shuffle(central)
+    market = [central.pop() for _ in range(HAND_SIZE)]
+    supplement = list(_SUPPLEMENT_IDS)
+
+    p_deck = list(_STARTER_IDS)
+    c_deck = list(_STARTER_IDS)
+    shuffle(p_deck)
+    shuffle(c_deck)
+    p_hand = [p_deck.pop() for _ in range(HAND_SIZE)]
+    c_hand = [c_deck.pop() for _ in range(HAND_SIZE)]
+    return Table(central, market, supplement, p_deck, p_hand, [], c_deck, c_hand, [])
+
+
+def play_rounds(table, player_policy, computer_policy, rng, max_rounds=1000, purchases=None):
+    """
+    Plays a game from the start of a round until it ends; see `play_game`.
+
+    Args:
+        table (Table): The game at the start of a round. Its piles are used, and modified, in place.
+        player_policy (Policy): Buying policy of the player.
+        computer_policy (Policy): Buying policy of the computer.
+        rng (random.Random): Random number generator of the game.
+        max_rounds (int, optional): Rounds after which the game is declared a draw. Defaults to 1000.
+        purchases (list, optional): Per-card purchase counts to add to; see `play_game`. Defaults to None.
+
+    Returns:
+        tuple: The outcome (PLAYER_WINS, COMPUTER_WINS or DRAW) and the number of rounds played.
+    """
+    shuffle = rng.shuffle
+    p_choose = player_policy.choose
+    c_choose = computer_policy.choose
+
+    central, market, supplement = table.central, table.market, table.supplement
+    p_deck, p_hand, p_discard = table.p_deck, table.p_hand, table.p_discard
+    c_deck, c_hand, c_discard = table.c_deck, table.c_hand, table.c_discard
+    p_health, c_health, p_money = table.p_health, table.c_health, table.p_money
+
+    for rounds in range(1, max_rounds + 1):
+        # Player: play all cards (popped from the end of the hand) and attack.
+        p_hand.reverse()
+        p_active = p_hand
+        p_hand = []
+        attack = 0
+        for card_id in p_active:
+            p_money += MONEY[card_id]
+            attack += ATTACK[card_id]
+        c_health -= attack
+        if c_health <= 0:
+            return PLAYER_WINS, rounds
+
+        # Player: buy cards one at a time.
+        while True:
+            choice = p_choose(market, supplement, p_money, rng)
+            if choice is None:
+                break
+            if choice == len(market):
+                card_id = supplement.pop()
+            else:
+                card_id = market.pop(choice)
+                if central:
+                    market.append(central.pop())
+            p_money -= COST[card_id]
+            p_discard.append(card_id)
+            if purchases is not None:
+                purchases[0][card_id] += 1
+            if not market:
+                return _outcome_on_health(p_health, c_health), rounds
+
+        # Player: end the turn.
+        p_active.reverse()
+        p_discard.extend(p_active)
+        p_deck, p_discard = _draw(p_deck, p_discard, p_hand, shuffle)
+
+        # Computer: play all cards, attack and buy.
+        c_hand.reverse()
+        c_active = c_hand
+        c_hand = []
+        money = 0
+        attack = 0
+        for card_id in c_active:
+            money += MONEY[card_id]
+            attack += ATTACK[card_id]
+        p_health -= attack
+
+        while money > 0:
+            choice = c_choose(market, supplement, money, rng)
+            if choice is None:
+                break
+            if choice == len(market):
+                card_id = supplement.pop()
+            else:
+                card_id = market.pop(choice)
+                if central:
+                    market.append(central.pop())
+            money -= COST[card_id]
+            c_discard.append(card_id)
+            if purchases is not None:
+                purchases[1][card_id] += 1
+
+        # Computer: end the turn.
+        c_active.reverse()
+        c_discard.extend(c_active)
+        c_deck, c_discard = _draw(c_deck, c_discard, c_hand, shuffle)
+
+        if p_health <= 0:
+            return COMPUTER_WINS, rounds
+        if c_health <= 0:
+            return PLAYER_WINS, rounds
+        if not market:
+            return _outcome_on_health(p_health, c_health), rounds
+
+    return DRAW, max_rounds
+
+
+def _outcome_on_health(p_health, c_health):
+    if p_health > c_health:
+        return PLAYER_WINS
+    if c_health > p_health:
+        return COMPUTER_WINS
+    return DRAW
+
+
+class SimulationResult:
+    """
+    Aggregated results of a batch of simulated games.
+
+    Results only hold counters, so results computed in different processes can be
+    combined with `merge` and sent between processes cheaply.
+
+    Attributes:
+        wins (list): Number of games per outcome, indexed by PLAYER_WINS, COMPUTER_WINS and DRAW.
+        lengths (Counter): Number of games per game length in rounds.
+        purchases (list): Two lists (player, computer) of purchase counts indexed by catalog ID.
+    """
+
+    def __init__(self):
+        self.wins = [0, 0, 0]
+        self.lengths = Counter()
+        self.purchases = [[0] * len(CARDS), [0] * len(CARDS)]
+
+    @property
+    def games(self):
+        """
+        int: Number of games played.
+        """
+        return sum(self.wins)
+
+    def record(self, outcome, rounds):
+        """
+        Adds one game to the results.
+
+        Args:
+            outcome (int): PLAYER_WINS, COMPUTER_WINS or DRAW.
+            rounds (int): Number of rounds the game lasted.
+        """
+        self.wins[outcome] += 1
+        self.lengths[rounds] += 1
+
+    def merge(self, other):
+        """
+        Adds the results of another batch to these results.
+
+        Args:
+            other (SimulationResult): The results to add.
+
+        Returns:
+            SimulationResult: These results, for chaining.
+        """
+        for outcome, count in enumerate(other.wins):
+            self.wins[outcome] += count
+        self.lengths.update(other.lengths)
+        for mine, theirs in zip(self.purchases, other.purchases):
+            for card_id, count in enumerate(theirs):
+                mine[card_id] += count
+        return self
+
+    def purchase_frequencies(self):
+        """
+        Returns how often each card was bought per game, by side.
+
+        Returns:
+            dict: For 'player' and 'computer', the average number of purchases per game by card name.
+        """
+        games = self.games or 1
+        return {
+            side: {CARDS[card_id].name: count / games for card_id, count in enumerate(counts) if count}
+            for side, counts in zip(OUTCOMES, self.purchases)
+        }
+
+    def win_rates(self):
+        """
+        Returns the share of games per outcome.
+
+        Returns:
+            dict: Win rate per outcome name.
+        """
+        games = self.games or 1
+        return {name: count / games for name, count in zip(OUTCOMES, self.wins)}
+
+    def length_percentile(self, percentile):
+        """
+        Returns a percentile of the game length distribution.
+
+        Args:
+            percentile (float): The percentile, between 0 and 100.
+
+        Returns:
+            int: The game length in rounds, or None if no games were played.
+        """
+        if not self.lengths:
+            return None
+        threshold = percentile / 100 * self.games
+        seen = 0
+        for rounds in sorted(self.lengths):
+            seen += self.lengths[rounds]
+            if seen >= threshold:
+                return rounds
+        return max(self.lengths)
+
+    def to_dict(self):
+        """
+        Converts the results to a JSON-serializable summary.
+
+        Returns:
+            dict: Game count, wins, win rates, game length statistics and purchase frequencies.
+        """
+        games = self.games
+        return {
+            'games': games,
+            'wins': dict(zip(OUTCOMES, self.wins)),
+            'win_rates': self.win_rates(),
+            'rounds': {
+                'mean': sum(rounds * count for rounds, count in self.lengths.items()) / games if games else None,
+                'min': min(self.lengths) if self.lengths else None,
+                'p50': self.length_percentile(50),
+                'p95': self.length_percentile(95),
+                'max': max(self.lengths) if self.lengths else None,
+                'histogram': {str(rounds): self.lengths[rounds] for rounds in sorted(self.lengths)}
+            },
+            'purchases_per_game': self.purchase_frequencies()
+        }
+
+
+def simulate(games, player_policy, computer_policy, seed=None, max_rounds=1000):
+    """
+    Plays a batch of games between two policies with a single seeded random number generator.
+
+    Args:
+        games (int): Number of games to play.
+        player_policy (Policy): Buying policy of the player.
+        computer_policy (Policy): Buying policy of the computer.
+        seed (int, optional): Seed of the random number generator. Defaults to None (unseeded).
+        max_rounds (int, optional): Rounds after which a game is declared a draw. Defaults to 1000.
+
+    Returns:
+        SimulationResult: The aggregated results.
+    """
+    rng = random.Random(seed)
+    result = SimulationResult()
+    record = result.record
+    purchases = result.purchases
+    for _ in range(games):
+        outcome, rounds = play_game(player_policy, computer_policy, rng, max_rounds, purchases)
+        record(outcome, rounds)
+    return result
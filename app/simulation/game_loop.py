@@ -0,0 +1,68 @@
+from collections import Counter
+
+from app.models.game import Game
+from app.simulation.engine import COMPUTER_WINS, DRAW, PLAYER_WINS, _outcome_on_health
+
+
+def _central_ids(game):
+    central = game.central
+    return Counter(card.card_id for pile in (central['deck'], central['active'], central['supplement']) for card in pile)
+
+
+def play_game_loop(player_policy, computer_policy, seed, max_rounds=1000, purchases=None):
+    """
+    Plays one complete game headlessly through `Game.play_turn`, the code path the API uses.
+
+    This is much slower than `engine.play_game`, but exercises the real game model. The
+    player plays all cards, attacks, buys according to `player_policy` and ends the turn
+    every round; the computer is `Game`'s own opponent, playing `computer_policy`. With the
+    same random number generator both functions play exactly the same game.
+
+    Args:
+        player_policy (Policy): Buying policy of the player.
+        computer_policy (Policy): Buying policy of the computer; it must be registered.
+        seed (int): Seed of the game's random number generator.
+        max_rounds (int, optional): Rounds after which the game is declared a draw. Defaults to 1000.
+        purchases (list, optional): Two lists of per-card purchase counts (player, computer),
+            indexed by catalog ID, to add this game's purchases to. Defaults to None.
+
+    Returns:
+        tuple: The outcome (PLAYER_WINS, COMPUTER_WINS or DRAW) and the number of rounds played.
+    """
+    game = Game(opponent_type=computer_policy.name, seed=seed)
+    game.start()
+    rng = game.rng
+    pO, pC, central = game.pO, game.pC, game.central
+
+    for rounds in range(1, max_rounds + 1):
+        game.play_turn('P')
+        game.play_turn('A')
+        if pC['health'] <= 0:
+            return PLAYER_WINS, rounds
+
+        while True:
+            market = [card.card_id for card in central['active']]
+            supplement = [card.card_id for card in central['supplement']]
+            choice = player_policy.choose(market, supplement, pO['money'], rng)
+            if choice is None:
+                break
+            game.play_turn('B', choice)
+            if purchases is not None:
+                purchases[0][pO['discard'][-1].card_id] += 1
+            if not central['active']:
+                return _outcome_on_health(pO['health'], pC['health']), rounds
+
+        before = _central_ids(game) if purchases is not None else None
+        game.play_turn('E')
+        if purchases is not None:
+            for card_id, count in (before - _central_ids(game)).items():
+                purchases[1][card_id] += count
+
+        if pO['health'] <= 0:
+            return COMPUTER_WINS, rounds
+        if pC['health'] <= 0:
+            return PLAYER_WINS, rounds
+        if not central['active']:
+            return _outcome_on_health(pO['health'], pC['health']), rounds
+
+    return DRAW, max_rounds
@@ -0,0 +1,222 @@
+import random
+import time
+
+from app.models.catalog import COST
+from app.models.policies import AGGRESSIVE, Policy
+from app.simulation.engine import COMPUTER_WINS, DRAW, HAND_SIZE, Table, _draw, _outcome_on_health, play_rounds
+
+# Score of a rollout for the computer, by outcome.
+SCORES = {COMPUTER_WINS: 1.0, DRAW: 0.5}
+
+
+class Position:
+    """
+    What the computer knows while buying in `Game.play_turn('end_turn')`, as catalog card IDs.
+
+    The computer has played its hand and attacked; it sees the market, the supplement,
+    both players' discard piles and its own active cards. The order of the central deck
+    and the cards in both draw decks (and the player's new hand) are hidden, so they are
+    only kept as piles to be shuffled by every rollout.
+
+    This is the snapshot of a `Game` that lookahead is built on, in place of copying the
+    game: it is taken once per decision from the game's piles as plain lists of catalog
+    IDs, without the `get_state`/`set_state` round trip through dicts and `Card` objects,
+    and every rollout copies only the lists it plays with. It leaves the game untouched.
+
+    Attributes:
+        unseen_central (list): The central deck, in no particular order.
+        supplement (list): The supplement cards.
+        p_unseen (list): The player's deck and hand.
+        p_discard (list): The player's discard pile.
+        c_deck (list): The computer's deck.
+        c_played (list): The computer's discard pile and active cards.
+        p_health, c_health (int): Health of the player and of the computer.
+        p_money (int): The player's unspent money.
+    """
+
+    __slots__ = ('unseen_central', 'supplement', 'p_unseen', 'p_discard', 'c_deck', 'c_played',
+                 'p_health', 'c_health', 'p_money')
+
+    def __init__(self, game, supplement):
+        central, player, computer = game.central, game.pO, game.pC
+        self.unseen_central = [card.card_id for card in central['deck']]
+        self.supplement = supplement
+        self.p_unseen = [card.card_id for pile in (player['deck'], player['hand']) for card in pile]
+        self.p_discard = [card.card_id for card in player['discard']]
+        self.c_deck = [card.card_id for card in computer['deck']]
+        self.c_played = [card.card_id for pile in (computer['discard'], computer['active']) for card in pile]
+        self.p_health = player['health']
+        self.c_health = computer['health']
+        self.p_money = player['money']
+
+
+def rollout(position, market, money, choice, rng, policy, max_rounds=100):
+    """
+    Plays out the rest of a game after the computer's next purchase, with random hidden cards.
+
+    The computer makes `choice`, finishes its turn buying with `policy`, and both sides
+    then play the following rounds with `policy`, as in `engine.play_game`.
+
+    Args:
+        position (Position): The position the computer is buying in.
+        market (list): Catalog IDs of the central active cards.
+        money (int): Money the computer has left this turn.
+        choice (int): Index of the card to buy (`len(market)` for the supplement), or None to stop buying.
+        rng (random.Random): Random number generator of the rollouts.
+        policy (Policy): Buying policy of both players after `choice`.
+        max_rounds (int, optional): Rounds after which the rollout is declared a draw. Defaults to 100.
+
+    Returns:
+        float: 1 if the computer wins, 0.5 for a draw and 0 if it loses.
+    """
+    shuffle = rng.shuffle
+    central = position.unseen_central[:]
+    shuffle(central)
+    p_deck = position.p_unseen[:]
+    shuffle(p_deck)
+    p_hand = [p_deck.pop() for _ in range(HAND_SIZE)]
+    c_deck = position.c_deck[:]
+    shuffle(c_deck)
+    market = market[:]
+    supplement = position.supplement[:]
+    c_discard = position.c_played[:]
+
+    while choice is not None:
+        if choice == len(market):
+            card_id = supplement.pop()
+        else:
+            card_id = market.pop(choice)
+            if central:
+                market.append(central.pop())
+        money -= COST[card_id]
+        c_discard.append(card_id)
+        if money <= 0:
+            break
+        choice = policy.choose(market, supplement, money, rng)
+
+    c_hand = []
+    c_deck, c_discard = _draw(c_deck, c_discard, c_hand, shuffle)
+    if position.p_health <= 0:
+        return 1.0
+    if position.c_health <= 0:
+        return 0.0
+    if not market:
+        return SCORES.get(_outcome_on_health(position.p_health, position.c_health), 0.0)
+
+    table = Table(central, market, supplement, p_deck, p_hand, position.p_discard[:], c_deck, c_hand, c_discard,
+                  position.p_health, position.c_health, position.p_money)
+    return SCORES.get(play_rounds(table, policy, policy, rng, max_rounds)[0], 0.0)
+
+
+class ExpertPolicy(Policy):
+    """
+    Computer opponent that evaluates its purchases by Monte Carlo rollouts.
+
+    For every purchase, each affordable card and stopping are tried by playing the rest
+    of the game many times with random hidden cards, both players then buying like
+    `rollout_policy` (see `rollout`).
+    Rollouts are dealt to the candidates in turn until `max_rollouts` were played or
+    the decision's share of the turn's time is spent, and the candidate that won most
+    often is chosen.
+
+    A turn takes at most `budget` seconds however many cards are bought: all its
+    purchases share one deadline (see `turn_deadline`), and each takes at most half the
+    time left, so the later purchases still get rollouts. A purchase left with no time
+    at all is decided like `fallback`.
+
+    Rollouts work on card IDs like the simulation engine, rather than on copies of the
+    `Game`, so a rollout takes tens of microseconds. Their random numbers come from a
+    generator seeded with one draw from the game's own, so a seeded game always makes
+    the same draws; the decisions may still depend on how many rollouts fit in the budget.
+
+    A decision draws a single number from the game's generator whatever the rollouts do,
+    so a logged game is replayed without playing them again (see `redraw_in_game`).
+
+    Outside a `Game`, in the simulators, there is no game to look ahead in and it buys
+    like `fallback`.
+
+    Attributes:
+        budget (float): Seconds spent on the purchases of a turn.
+        max_rollouts (int): Most rollouts played for one decision.
+        fallback (Policy): Policy used when there is no game to look ahead in.
+        rollout_policy (Policy): Policy both players buy with during rollouts.
+    """
+
+    name = 'expert'
+
+    def __init__(self, budget=0.02, max_rollouts=1000, fallback=AGGRESSIVE, rollout_policy=AGGRESSIVE):
+        """
+        Initializes the policy.
+
+        Args:
+            budget (float, optional): Seconds spent on the purchases of a turn. Defaults to 0.02.
+            max_rollouts (int, optional): Most rollouts played for one decision. Defaults to 1000.
+            fallback (Policy, optional): Policy used without a game. Defaults to AGGRESSIVE.
+            rollout_policy (Policy, optional): Policy both players buy with during rollouts.
+                Defaults to AGGRESSIVE, which judged purchases better than random rollouts.
+        """
+        self.budget = budget
+        self.max_rollouts = max_rollouts
+        self.fallback = fallback
+        self.rollout_policy = rollout_policy
+
+    def choose(self, market, supplement, money, rng):
+        return self.fallback.choose(market, supplement, money, rng)
+
+    def turn_deadline(self):
+        return time.perf_counter() + self.budget
+
+    def choose_in_game(self, game, market, supplement, money, deadline=None):
+        candidates = self._candidates(market, supplement, money)
+        if not candidates:
+            return None
+        rng = random.Random(game.rng.getrandbits(64))
+        now = time.perf_counter()
+        if deadline is None:
+            deadline = now + self.budget
+        elif now >= deadline:
+            return self.fallback.choose(market, supplement, money, rng)
+        else:
+            deadline = now + (deadline - now) / 2
+        candidates.append(None)
+
+        position = Position(game, supplement)
+        policy = self.rollout_policy
+        scores = [0.0] * len(candidates)
+        played = 0
+        # Whole rounds over the candidates, so they all get the same number of rollouts.
+        while played + len(candidates) <= max(self.max_rollouts, len(candidates)):
+            for index, choice in enumerate(candidates):
+                scores[index] += rollout(position, market, money, choice, rng, policy)
+            played += len(candidates)
+            if time.perf_counter() >= deadline:
+                break
+        return candidates[scores.index(max(scores))]
+
+    def redraw_in_game(self, game, market, supplement, money):
+        if self._candidates(market, supplement, money):
+            game.rng.getrandbits(64)
+
+    @staticmethod
+    def _candidates(market, supplement, money):
+        """
+        Returns the indexes of the affordable purchases.
+        """
+        candidates = [index for index, card_id in enumerate(market) if COST[card_id] <= money]
+        if supplement and COST[supplement[0]] <= money:
+            candidates.append(len(market))
+        return candidates
+
+
+EXPERT = ExpertPolicy()
+
+
+def configure_expert(config):
+    """
+    Applies the expert opponent settings of the application configuration.
+
+    Args:
+        config (dict): The application configuration.
+    """
+    EXPERT.budget = config.get('EXPERT_DECISION_BUDGET_MS', 20) / 1000
+    EXPERT.max_rollouts = config.get('EXPERT_MAX_ROLLOUTS', 1000)
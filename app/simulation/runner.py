@@ -0,0 +1,114 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from app.simulation.engine import SimulationResult, play_game
+from app.simulation.game_loop import play_game_loop
+from app.models.policies import get_policy
+
+ENGINES = ('fast', 'game')
+
+# Chunks per worker; more chunks balance uneven game lengths better at the cost of more messages.
+CHUNKS_PER_WORKER = 4
+
+
+def game_seed(seed, index):
+    """
+    Derives the seed of one game of a batch.
+
+    Every game gets its own seed derived from the batch seed and the game's index, so a
+    game is played identically whichever worker plays it, and the batch results do not
+    depend on the number of workers. Distinct (seed, index) pairs give distinct seeds:
+    the batch seed's sign is kept in the lowest bit above the index.
+
+    Args:
+        seed (int): Seed of the batch.
+        index (int): Index of the game in the batch, below 2**32.
+
+    Returns:
+        int: Seed of the game.
+    """
+    return (((abs(seed) << 1) | (seed < 0)) << 32) | index
+
+
+def run_chunk(player, computer, seed, start, stop, engine='fast', max_rounds=1000):
+    """
+    Plays the games with indices [start, stop) of a batch and aggregates their results.
+
+    Policies are passed by name so the arguments can be sent to a worker process.
+
+    Args:
+        player (str): Name of the player's policy.
+        computer (str): Name of the computer's policy.
+        seed (int): Seed of the batch.
+        start (int): Index of the first game.
+        stop (int): Index after the last game.
+        engine (str, optional): 'fast' for `engine.play_game` or 'game' for the `Game` loop. Defaults to 'fast'.
+        max_rounds (int, optional): Rounds after which a game is declared a draw. Defaults to 1000.
+
+    Returns:
+        SimulationResult: The aggregated results of the chunk.
+    """
+    player_policy, computer_policy = get_policy(player), get_policy(computer)
+    result = SimulationResult()
+    record = result.record
+    purchases = result.purchases
+    if engine == 'game':
+        for index in range(start, stop):
+            record(*play_game_loop(player_policy, computer_policy, game_seed(seed, index), max_rounds, purchases))
+    else:
+        for index in range(start, stop):
+            rng = random.Random(game_seed(seed, index))
+            record(*play_game(player_policy, computer_policy, rng, max_rounds, purchases))
+    return result
+
+
+def run_parallel(games, player, computer, seed=None, workers=None, engine='fast', max_rounds=1000):
+    """
+    Plays a batch of games split over a pool of worker processes.
+
+    The batch is split into contiguous chunks of game indices; each worker returns only
+    the aggregated results of its chunk, which are merged here. Results for a given seed
+    are the same for any number of workers, and from one run to the next, except with the
+    expert opponent on the 'game' engine: it plays rollouts until a wall-clock deadline,
+    so its purchases depend on the machine's speed and load.
+
+    Policies are looked up by name in every worker, so policies added with
+    `register_policy` are only available if they are registered at import time.
+
+    Args:
+        games (int): Number of games to play.
+        player (str): Name of the player's policy.
+        computer (str): Name of the computer's policy.
+        seed (int, optional): Seed of the batch. Defaults to None (a random seed).
+        workers (int, optional): Number of worker processes; 1 plays in this process. Defaults to the CPU count.
+        engine (str, optional): 'fast' or 'game'. Defaults to 'fast'.
+        max_rounds (int, optional): Rounds after which a game is declared a draw. Defaults to 1000.
+
+    Returns:
+        SimulationResult: The aggregated results.
+
+    Raises:
+        ValueError: If a policy or the engine is unknown.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}. Available engines: {', '.join(ENGINES)}")
+    player, computer = get_policy(player).name, get_policy(computer).name
+    if seed is None:
+        seed = random.getrandbits(32)
+    workers = max(1, min(workers or os.cpu_count() or 1, games or 1))
+
+    if workers == 1:
+        return run_chunk(player, computer, seed, 0, games, engine, max_rounds)
+
+    chunks = workers * CHUNKS_PER_WORKER
+    bounds = [games * i // chunks for i in range(chunks + 1)]
+    result = SimulationResult()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(run_chunk, player, computer, seed, start, stop, engine, max_rounds)
+            for start, stop in zip(bounds, bounds[1:]) if start < stop
+        ]
+        for future in futures:
+            result.merge(future.result())
+    return result
@@ -0,0 +1,399 @@
+from collections import Counter
+
+import numpy as np
+
+from app.models.catalog import CARDS, CENTRAL_DECK, STARTER_DECK, SUPPLEMENT_DECK
+from app.simulation.engine import COMPUTER_WINS, DRAW, HAND_SIZE, PLAYER_WINS, STARTING_HEALTH, SimulationResult
+
+PLAYER = 0
+COMPUTER = 1
+
+# Secondary stat each greedy policy breaks cost ties on.
+TIE_BREAKS = {
+    'aggressive': 'attack',
+    'acquisitive': 'money',
+}
+STATS = ('cost', 'attack', 'money')
+
+# Integer type of card counts, stats and health; small types keep the arrays cache friendly.
+COUNT = np.int32
+
+
+class CardStats:
+    """
+    Cost, attack and money of every catalog card as arrays indexed by catalog ID.
+
+    Attributes:
+        cost (numpy.ndarray): Cost per card.
+        attack (numpy.ndarray): Attack per card.
+        money (numpy.ndarray): Money per card.
+    """
+
+    def __init__(self, cost, attack, money):
+        self.cost = np.asarray(cost, dtype=COUNT)
+        self.attack = np.asarray(attack, dtype=COUNT)
+        self.money = np.asarray(money, dtype=COUNT)
+
+    @classmethod
+    def from_catalog(cls):
+        """
+        Returns the stats of the cards as the game deals them.
+
+        Returns:
+            CardStats: The catalog's card stats.
+        """
+        return cls([card.cost for card in CARDS], [card.attack for card in CARDS], [card.money for card in CARDS])
+
+    def replace(self, card, **stats):
+        """
+        Returns a copy with some stats of one card changed.
+
+        Args:
+            card (int or str): Catalog ID or name of the card.
+            **stats: New values, e.g. `attack=5`.
+
+        Returns:
+            CardStats: The modified copy.
+
+        Raises:
+            ValueError: If the card or a stat is unknown.
+        """
+        card_id = card_id_of(card)
+        arrays = {name: getattr(self, name).copy() for name in STATS}
+        for name, value in stats.items():
+            if name not in arrays:
+                raise ValueError(f"Unknown card stat: {name}. Available stats: {', '.join(STATS)}")
+            arrays[name][card_id] = value
+        return CardStats(**arrays)
+
+
+def card_id_of(card):
+    """
+    Looks up a catalog card by ID or case-insensitive name.
+
+    Args:
+        card (int or str): Catalog ID or name of the card.
+
+    Returns:
+        int: The catalog ID.
+
+    Raises:
+        ValueError: If there is no such card.
+    """
+    if isinstance(card, int) and 0 <= card < len(CARDS):
+        return card
+    for entry in CARDS:
+        if entry.name.lower() == str(card).lower():
+            return entry.card_id
+    raise ValueError(f"Unknown card: {card}")
+
+
+def _counts(composition):
+    counts = np.zeros(len(CARDS), dtype=COUNT)
+    for card_id, copies in composition:
+        counts[card_id] += copies
+    return counts
+
+
+class VectorizedGames:
+    """
+    A batch of games between two greedy policies, held as NumPy arrays.
+
+    Every pile is a (cards, games) array of card counts instead of an ordered list, and
+    a card drawn from a pile is sampled from its counts, which deals cards with the same
+    probabilities as shuffling the pile. Keeping one row per card makes every step a
+    handful of operations on contiguous rows of all games. All games advance together
+    one phase at a time, following the same rules as `engine.play_game`; finished games
+    are dropped from the index of live games.
+
+    The one difference is that a full tie between two market cards (same cost and same
+    tie-break stat) goes to the card with the lower catalog ID rather than the one that
+    entered the market first. With the catalog's stats such cards are identical, so the
+    outcomes have exactly the same distribution.
+
+    Attributes:
+        games (int): Number of games in the batch.
+        stats (CardStats): Card stats the games are played with.
+        outcome (numpy.ndarray): Outcome per game, -1 while it is running.
+        rounds (numpy.ndarray): Rounds played per game.
+        purchases (numpy.ndarray): (2, cards) purchase counts of the player and the computer.
+    """
+
+    def __init__(self, games, player='aggressive', computer='acquisitive', stats=None, seed=None):
+        """
+        Deals the initial cards of every game.
+
+        Args:
+            games (int): Number of games to play.
+            player (str, optional): Greedy policy of the player. Defaults to 'aggressive'.
+            computer (str, optional): Greedy policy of the computer. Defaults to 'acquisitive'.
+            stats (CardStats, optional): Card stats to play with. Defaults to the catalog's.
+            seed (int, optional): Seed of the random number generator. Defaults to None (unseeded).
+
+        Raises:
+            ValueError: If a policy is not a greedy policy.
+        """
+        self.games = games
+        self.stats = stats or CardStats.from_catalog()
+        self.rng = np.random.default_rng(seed)
+        self.keys = [self._buy_key(player), self._buy_key(computer)]
+
+        cards = len(CARDS)
+        self.central = np.repeat(_counts(CENTRAL_DECK)[:, None], games, axis=1)
+        self.market = np.zeros((cards, games), dtype=COUNT)
+        self.supplement = np.repeat(_counts(SUPPLEMENT_DECK)[:, None], games, axis=1)
+        self.deck = np.repeat(_counts(STARTER_DECK)[None, :, None], 2, axis=0).repeat(games, axis=2)
+        self.hand = np.zeros((2, cards, games), dtype=COUNT)
+        self.discard = np.zeros((2, cards, games), dtype=COUNT)
+        self.health = np.full((2, games), STARTING_HEALTH, dtype=COUNT)
+        self.money = np.zeros(games, dtype=COUNT)
+        self.outcome = np.full(games, -1, dtype=COUNT)
+        self.rounds = np.zeros(games, dtype=COUNT)
+        self.purchases = np.zeros((2, cards), dtype=np.int64)
+
+        everyone = np.arange(games)
+        for _ in range(HAND_SIZE):
+            self._draw_central(everyone)
+        self._draw_hand(PLAYER, everyone)
+        self._draw_hand(COMPUTER, everyone)
+
+    def _buy_key(self, policy):
+        """
+        Returns the preference of a greedy policy for every buying option.
+
+        The options are the supplement cards followed by the market cards, in catalog
+        order. Keys are unique and ordered by cost, then the tie-break stat, then the
+        earlier option, so the best option of a game is simply its maximum key.
+        """
+        stat = TIE_BREAKS.get(policy)
+        if stat is None:
+            raise ValueError(f"The vectorized engine only plays greedy policies: {', '.join(TIE_BREAKS)}")
+        secondary = getattr(self.stats, stat).astype(np.int64)
+        secondary -= secondary.min()
+        rank = self.stats.cost.astype(np.int64) * (secondary.max() + 1) + secondary
+        options = 2 * len(CARDS)
+        return np.concatenate([rank, rank]) * options + np.arange(options - 1, -1, -1)
+
+    def _sample(self, piles, sizes=None):
+        """
+        Removes one random card from every column of a (cards, columns) array of non-empty piles.
+
+        Returns:
+            numpy.ndarray: The catalog ID drawn from each column.
+        """
+        if sizes is None:
+            sizes = piles.sum(axis=0)
+        # Scaling uniform floats is much faster than integers() with an array bound.
+        picks = (self.rng.random(piles.shape[1]) * sizes).astype(COUNT)
+        seen = np.zeros(piles.shape[1], dtype=COUNT)
+        card_ids = np.zeros(piles.shape[1], dtype=np.intp)
+        for row in piles:
+            seen += row
+            card_ids += seen <= picks
+        piles[card_ids, np.arange(piles.shape[1])] -= 1
+        return card_ids
+
+    def _draw_central(self, rows):
+        central = self.central[:, rows]
+        card_ids = self._sample(central)
+        self.central[:, rows] = central
+        self.market[card_ids, rows] += 1
+
+    def _draw_hand(self, side, rows):
+        # Work on copies of the games' piles, so the batch arrays are only indexed once.
+        deck, discard = self.deck[side][:, rows], self.discard[side][:, rows]
+        hand = np.zeros_like(deck)
+        columns = np.arange(rows.size)
+        sizes = deck.sum(axis=0)
+        for _ in range(HAND_SIZE):
+            empty = sizes == 0
+            if empty.any():
+                deck[:, empty] = discard[:, empty]
+                discard[:, empty] = 0
+                sizes[empty] = deck[:, empty].sum(axis=0)
+            hand[self._sample(deck, sizes), columns] += 1
+            sizes -= 1
+        self.deck[side][:, rows] = deck
+        self.discard[side][:, rows] = discard
+        self.hand[side][:, rows] = hand
+
+    def _play_all(self, side, rows):
+        """
+        Plays the whole hand of one side in every game in rows.
+
+        Returns:
+            tuple: Money and attack of the played cards per game.
+        """
+        hand = self.hand[side][:, rows]
+        self.discard[side][:, rows] += hand
+        self.hand[side][:, rows] = 0
+        return self.stats.money @ hand, self.stats.attack @ hand
+
+    def _buy(self, side, rows, money):
+        """
+        Lets one side buy greedily in every game in rows until nothing is affordable.
+
+        Each pass buys at most one card per game, so games that can still buy are
+        repeated until none can. When the player empties the market the game ends.
+
+        Args:
+            side (int): PLAYER or COMPUTER.
+            rows (numpy.ndarray): Games in which the side buys.
+            money (numpy.ndarray): Money per game, indexed like the batch; updated in place.
+
+        Returns:
+            numpy.ndarray: The games in rows that are still running.
+        """
+        cost = self.stats.cost
+        key = self.keys[side][:, None]
+        cards = len(CARDS)
+        options = 2 * cards
+        running = rows
+        buying = rows if side == PLAYER else rows[money[rows] > 0]
+        while buying.size:
+            affordable = cost[:, None] <= money[buying]
+            candidates = np.concatenate([(self.supplement[:, buying] > 0) & affordable,
+                                         (self.market[:, buying] > 0) & affordable])
+            best = np.where(candidates, key, -1).max(axis=0)
+            buys = best >= 0
+            buying, best = buying[buys], best[buys]
+            if not buying.size:
+                break
+
+            choice = options - 1 - best % options
+            card_ids = choice % cards
+            from_supplement = choice < cards
+            self.supplement[card_ids[from_supplement], buying[from_supplement]] -= 1
+            bought = buying[~from_supplement]
+            self.market[card_ids[~from_supplement], bought] -= 1
+            refill = bought[self.central[:, bought].any(axis=0)]
+            if refill.size:
+                self._draw_central(refill)
+
+            money[buying] -= cost[card_ids]
+            self.discard[side][card_ids, buying] += 1
+            self.purchases[side] += np.bincount(card_ids, minlength=cards)
+
+            if side == PLAYER:
+                emptied = buying[~self.market[:, buying].any(axis=0)]
+                if emptied.size:
+                    self._finish_on_health(emptied)
+                    running = running[self.outcome[running] < 0]
+                    buying = buying[self.outcome[buying] < 0]
+            else:
+                buying = buying[money[buying] > 0]
+        return running
+
+    def _finish(self, rows, outcome):
+        self.outcome[rows] = outcome
+
+    def _finish_on_health(self, rows):
+        player, computer = self.health[PLAYER, rows], self.health[COMPUTER, rows]
+        self.outcome[rows] = np.where(player > computer, PLAYER_WINS, np.where(computer > player, COMPUTER_WINS, DRAW))
+
+    def play(self, max_rounds=1000):
+        """
+        Plays every game to the end.
+
+        Args:
+            max_rounds (int, optional): Rounds after which a game is declared a draw. Defaults to 1000.
+
+        Returns:
+            SimulationResult: The aggregated results.
+        """
+        alive = np.flatnonzero(self.outcome < 0)
+        computer_money = np.zeros(self.games, dtype=COUNT)
+        for round_number in range(1, max_rounds + 1):
+            if not alive.size:
+                break
+            self.rounds[alive] = round_number
+
+            # Player: play all cards, attack, buy and end the turn.
+            money, attack = self._play_all(PLAYER, alive)
+            self.money[alive] += money
+            self.health[COMPUTER, alive] -= attack
+            won = self.health[COMPUTER, alive] <= 0
+            self._finish(alive[won], PLAYER_WINS)
+            alive = self._buy(PLAYER, alive[~won], self.money)
+            self._draw_hand(PLAYER, alive)
+
+            # Computer: play all cards, attack, buy and end the turn.
+            computer_money[alive], attack = self._play_all(COMPUTER, alive)
+            self.health[PLAYER, alive] -= attack
+            self._buy(COMPUTER, alive, computer_money)
+            self._draw_hand(COMPUTER, alive)
+
+            lost = self.health[PLAYER, alive] <= 0
+            self._finish(alive[lost], COMPUTER_WINS)
+            alive = alive[~lost]
+            won = self.health[COMPUTER, alive] <= 0
+            self._finish(alive[won], PLAYER_WINS)
+            alive = alive[~won]
+            emptied = ~self.market[:, alive].any(axis=0)
+            self._finish_on_health(alive[emptied])
+            alive = alive[~emptied]
+
+        self._finish(alive, DRAW)
+        return self.result()
+
+    def result(self):
+        """
+        Aggregates the finished games.
+
+        Returns:
+            SimulationResult: Wins, game lengths and purchases of the finished games.
+        """
+        result = SimulationResult()
+        finished = self.outcome >= 0
+        result.wins = np.bincount(self.outcome[finished], minlength=3).tolist()
+        lengths, counts = np.unique(self.rounds[finished], return_counts=True)
+        result.lengths = Counter(dict(zip(lengths.tolist(), counts.tolist())))
+        result.purchases = self.purchases.tolist()
+        return result
+
+
+def simulate_vectorized(games, player='aggressive', computer='acquisitive', seed=None, max_rounds=1000, stats=None):
+    """
+    Plays a batch of games between two greedy policies with the vectorized engine.
+
+    Args:
+        games (int): Number of games to play.
+        player (str, optional): Greedy policy of the player. Defaults to 'aggressive'.
+        computer (str, optional): Greedy policy of the computer. Defaults to 'acquisitive'.
+        seed (int, optional): Seed of the random number generator. Defaults to None (unseeded).
+        max_rounds (int, optional): Rounds after which a game is declared a draw. Defaults to 1000.
+        stats (CardStats, optional): Card stats to play with. Defaults to the catalog's.
+
+    Returns:
+        SimulationResult: The aggregated results.
+    """
+    return VectorizedGames(games, player, computer, stats, seed).play(max_rounds)
+
+
+def sweep(card, stat, values, games, player='aggressive', computer='acquisitive', seed=None, max_rounds=1000,
+          stats=None):
+    """
+    Simulates a batch of games for each value of one card stat.
+
+    Every batch uses the same seed, so differences between values are not blurred by
+    different deals.
+
+    Args:
+        card (int or str): Catalog ID or name of the card to change.
+        stat (str): 'cost', 'attack' or 'money'.
+        values (iterable): Values of the stat to try.
+        games (int): Number of games per value.
+        player (str, optional): Greedy policy of the player. Defaults to 'aggressive'.
+        computer (str, optional): Greedy policy of the computer. Defaults to 'acquisitive'.
+        seed (int, optional): Seed of every batch. Defaults to None (unseeded).
+        max_rounds (int, optional): Rounds after which a game is declared a draw. Defaults to 1000.
+        stats (CardStats, optional): Stats of the other cards. Defaults to the catalog's.
+
+    Returns:
+        list: (value, SimulationResult) pairs in the order of values.
+    """
+    base = stats or CardStats.from_catalog()
+    return [
+        (value, simulate_vectorized(games, player, computer, seed, max_rounds, base.replace(card, **{stat: value})))
+        for value in values
+    ]
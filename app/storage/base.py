@@ -0,0 +1,399 @@
+import base64
+import json
+import time
+
+from app.storage import codec
+from app.utils.exceptions import StaleStateError
+
+
+def encode_state(state):
+    """
+    Serializes a game state, or a delta of one, for storage.
+
+    Args:
+        state (dict): The state returned by `Game.get_state()` or `Game.get_delta()`.
+
+    Returns:
+        bytes: The serialized state.
+    """
+    return json.dumps(state, separators=(',', ':')).encode('utf-8')
+
+
+def decode_state(data):
+    """
+    Deserializes a game state written by `encode_state`.
+
+    Args:
+        data (bytes): The serialized state.
+
+    Returns:
+        dict: The game state.
+    """
+    return json.loads(data)
+
+
+def encode_snapshot(state):
+    """
+    Serializes a full game state in the compact binary format of `codec`.
+
+    States the binary format cannot represent (unknown fields, cards outside the
+    catalog) are written as JSON instead, which `decode_snapshot` reads as well. So are
+    records from `Game.get_record()`, but their checkpoint is encoded in the binary
+    format (as base64 text), which keeps its random number generator state small.
+
+    Args:
+        state (dict): The state returned by `Game.get_state()`, or a record.
+
+    Returns:
+        bytes: The serialized state.
+    """
+    if isinstance(state.get('checkpoint'), dict):
+        checkpoint = base64.b64encode(encode_snapshot(state['checkpoint'])).decode('ascii')
+        return encode_state({**state, 'checkpoint': checkpoint})
+    try:
+        return codec.encode(state)
+    except ValueError:
+        return encode_state(state)
+
+
+def decode_snapshot(data):
+    """
+    Deserializes a game state written by `encode_snapshot`, or as JSON by older versions.
+
+    Args:
+        data (bytes): The serialized state.
+
+    Returns:
+        dict: The game state.
+    """
+    if codec.is_encoded(data):
+        return codec.decode(data)
+    state = decode_state(data)
+    if isinstance(state.get('checkpoint'), str):
+        state['checkpoint'] = decode_snapshot(base64.b64decode(state['checkpoint']))
+    return state
+
+
+def stored_version(snapshot, deltas):
+    """
+    Returns the version of a stored game without rebuilding its state.
+
+    Args:
+        snapshot (bytes): The snapshot, as written by `encode_snapshot`.
+        deltas (list): The deltas, each as written by `encode_state`, in write order.
+
+    Returns:
+        int: The version `restore_state` would return.
+    """
+    version = codec.read_version(snapshot) if codec.is_encoded(snapshot) else \
+        decode_state(snapshot).get('version', 0)
+    for data in deltas:
+        version = max(version, decode_state(data).get('version', 0))
+    return version
+
+
+def check_version(game_id, version, expected_version):
+    """
+    Raises `StaleStateError` unless a stored game is at the version a write expects.
+
+    Args:
+        game_id (str): The ID of the game.
+        version (int): The stored version, or None if the game does not exist.
+        expected_version (int): The version the write was made from, or None to skip the check.
+
+    Raises:
+        StaleStateError: If the versions differ or the game no longer exists.
+    """
+    if expected_version is not None and version != expected_version:
+        raise StaleStateError(f"Game {game_id} is at version {version}, not {expected_version}.")
+
+
+def restore_state(snapshot, deltas):
+    """
+    Rebuilds a game state from a stored snapshot and the deltas written after it.
+
+    Deltas that are not newer than the snapshot are skipped, so a delta racing with a
+    newer snapshot cannot roll the game back.
+
+    Args:
+        snapshot (bytes): The snapshot, as written by `encode_snapshot`.
+        deltas (list): The deltas, each as written by `encode_state`, in write order.
+
+    Returns:
+        dict: The game state.
+    """
+    state = decode_snapshot(snapshot)
+    for data in deltas:
+        delta = decode_state(data)
+        if delta.get('version', 0) > state.get('version', 0):
+            state = apply_delta(state, delta)
+    return state
+
+
+def apply_delta(state, delta):
+    """
+    Applies a delta from `Game.get_delta()` to a game state, or a delta from
+    `Game.get_record(since)` to a record.
+
+    The input state is not modified: changed sections are copied before they are updated.
+    The action log of a record only grows, so a delta holds the entries added to it.
+
+    Args:
+        state (dict): The game state, or record.
+        delta (dict): The delta to apply.
+
+    Returns:
+        dict: The updated game state.
+    """
+    state = dict(state)
+    for key, value in delta.items():
+        if isinstance(value, dict):
+            section = dict(state.get(key, {}))
+            section.update(value)
+            state[key] = section
+        elif key == 'log':
+            state[key] = state.get(key, []) + value
+        else:
+            state[key] = value
+    return state
+
+
+def queue_entry(game_id, queued_at):
+    """
+    Serializes a matchmaking queue entry.
+
+    Args:
+        game_id (str): The ID of the waiting game.
+        queued_at (float): When it was queued, as a UNIX timestamp.
+
+    Returns:
+        bytes: The entry.
+    """
+    return f'{queued_at:.3f} {game_id}'.encode('utf-8')
+
+
+def parse_queue_entry(data):
+    """
+    Deserializes a matchmaking queue entry written by `queue_entry`.
+
+    Returns:
+        tuple: The game ID and when it was queued.
+    """
+    queued_at, _, game_id = data.decode('utf-8').partition(' ')
+    return game_id, float(queued_at)
+
+
+def take_waiting(entries, game_id, stale_before):
+    """
+    Finds the first entry of a matchmaking queue another game can be paired with.
+
+    The entries before it, queued before `stale_before` or belonging to `game_id`
+    itself, are discarded along with the one taken.
+
+    Args:
+        entries (iterable): (game_id, queued_at) pairs, from the head of the queue.
+        game_id (str): The game looking for a partner.
+        stale_before (float): UNIX timestamp before which entries are discarded.
+
+    Returns:
+        tuple: The number of entries to remove from the head of the queue, and the ID
+        of the game taken, or None if there was none among `entries`.
+    """
+    count = 0
+    for waiting, queued_at in entries:
+        count += 1
+        if waiting != game_id and queued_at >= stale_before:
+            return count, waiting
+    return count, None
+
+
+class GameStateStore:
+    """
+    Base class for game state store backends.
+
+    A store keeps, per game ID, a full snapshot of the game state followed by a log of
+    deltas. Small turn actions only append a delta; every `snapshot_interval` versions
+    the caller writes a full snapshot instead, which also discards the log. Deltas whose
+    version is not newer than the snapshot are ignored when loading, so a snapshot racing
+    with an append never rolls a game back.
+
+    Writes can be made conditional on the stored version (compare and swap), so that
+    when two workers load and modify a game at once only the first one saves it: the
+    second write raises `StaleStateError` and leaves the store unchanged.
+
+    Stores also hold the matchmaking queues of player-versus-player games (see `pair`),
+    so players are paired across workers.
+
+    Subclasses only implement raw byte access (`_read`, `_write`, `_append`, `_remove`)
+    and expiry; encoding is handled here so every backend stores the same payload:
+    snapshots in the binary format of `codec` and deltas as JSON.
+
+    Attributes:
+        ttl (int): Seconds after the last write at which a game expires, or None to keep games forever.
+        snapshot_interval (int): Number of versions between full snapshots.
+    """
+
+    def __init__(self, ttl=None, snapshot_interval=20):
+        """
+        Initializes the store.
+
+        Args:
+            ttl (int, optional): Seconds after the last write at which a game expires. Defaults to None.
+            snapshot_interval (int, optional): Number of versions between full snapshots. Defaults to 20.
+        """
+        self.ttl = ttl
+        self.snapshot_interval = snapshot_interval
+
+    def load(self, game_id):
+        """
+        Loads the state of a game, replaying any deltas written since the last snapshot.
+
+        Args:
+            game_id (str): The ID of the game.
+
+        Returns:
+            dict: The game state, or None if the game does not exist or has expired.
+        """
+        record = self._read(game_id)
+        if record is None:
+            return None
+        return restore_state(*record)
+
+    def version(self, game_id):
+        """
+        Returns the version of a stored game without rebuilding its state.
+
+        Args:
+            game_id (str): The ID of the game.
+
+        Returns:
+            int: The version of the game, or None if the game does not exist or has expired.
+        """
+        record = self._read(game_id)
+        if record is None:
+            return None
+        return stored_version(*record)
+
+    def save(self, game_id, state, expected_version=None):
+        """
+        Saves a full snapshot of a game, replacing any previous snapshot and deltas.
+
+        Args:
+            game_id (str): The ID of the game.
+            state (dict): The game state.
+            expected_version (int, optional): Version the stored game must be at for the
+                write to happen. Defaults to None, which writes unconditionally.
+
+        Raises:
+            StaleStateError: If the stored game is not at `expected_version`.
+        """
+        self._write(game_id, encode_snapshot(state), state.get('version', 0), expected_version)
+
+    def save_delta(self, game_id, delta, expected_version=None):
+        """
+        Appends a delta to a game's log.
+
+        Args:
+            game_id (str): The ID of the game.
+            delta (dict): The delta returned by `Game.get_delta()`.
+            expected_version (int, optional): Version the stored game must be at for the
+                write to happen. Defaults to None, which writes unconditionally.
+
+        Raises:
+            StaleStateError: If the stored game is not at `expected_version`.
+        """
+        self._append(game_id, encode_state(delta), delta.get('version', 0), expected_version)
+
+    def snapshot_due(self, version, previous_version=None):
+        """
+        Tells whether a game at the given version should be saved as a full snapshot.
+
+        A snapshot is due whenever the save crosses a multiple of the snapshot interval,
+        so games saved after several actions at once still get one every interval.
+
+        Args:
+            version (int): The version of the game about to be saved.
+            previous_version (int, optional): Version of the game when it was loaded.
+                Defaults to one less than `version`.
+
+        Returns:
+            bool: True if a full snapshot should be written instead of a delta.
+        """
+        if previous_version is None:
+            previous_version = version - 1
+        return version // self.snapshot_interval > previous_version // self.snapshot_interval
+
+    def delete(self, game_id):
+        """
+        Removes a game from the store.
+
+        Args:
+            game_id (str): The ID of the game.
+        """
+        self._remove(game_id)
+
+    def purge_expired(self):
+        """
+        Removes every expired game from the store.
+
+        Returns:
+            int: The number of games removed.
+        """
+        return 0
+
+    def pair(self, queue, game_id, max_wait):
+        """
+        Takes the oldest game waiting in a matchmaking queue or, if none is, queues a game, atomically.
+
+        Entries queued more than `max_wait` seconds ago, and older entries of `game_id`
+        itself, are discarded on the way; every entry is looked at once, so pairing takes
+        constant time on average. Entries are not checked against the store: the caller
+        skips games that have gone or were joined meanwhile.
+
+        Args:
+            queue (str): Name of the queue.
+            game_id (str): The game to queue if no other is waiting.
+            max_wait (float): Seconds after which a queued entry is discarded.
+
+        Returns:
+            str: The ID of the game taken from the queue, or None if `game_id` was queued.
+        """
+        now = time.time()
+        return self._pair(queue, game_id, now, now - max_wait)
+
+    def _read(self, game_id):
+        """
+        Returns the snapshot and the list of logged deltas of a game, or None.
+        """
+        raise NotImplementedError
+
+    def _write(self, game_id, data, version, expected_version):
+        """
+        Replaces the snapshot of a game, now at `version`, and discards its deltas.
+
+        Unless `expected_version` is None, the stored version is checked first with
+        `check_version`, atomically with the write.
+        """
+        raise NotImplementedError
+
+    def _append(self, game_id, data, version, expected_version):
+        """
+        Appends a delta bringing a game to `version` to its log.
+
+        Unless `expected_version` is None, the stored version is checked first with
+        `check_version`, atomically with the write.
+        """
+        raise NotImplementedError
+
+    def _remove(self, game_id):
+        """
+        Removes the snapshot and the deltas of a game.
+        """
+        raise NotImplementedError
+
+    def _pair(self, queue, game_id, now, stale_before):
+        """
+        Removes the head of a queue up to the first entry `take_waiting` takes and returns
+        its game ID or, if there is none, appends an entry of `game_id` queued `now`.
+        """
+        raise NotImplementedError
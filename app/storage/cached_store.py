@@ -0,0 +1,244 @@
+import threading
+import time
+from collections import OrderedDict
+
+from app.storage.base import apply_delta
+from app.utils.exceptions import StaleStateError
+
+
+class CachedStore:
+    """
+    Bounded, per-process LRU cache in front of a game state store.
+
+    Writes go to the cache and straight through to the backend. Reads are served
+    from the cache while the cached entry is younger than `ttl` seconds; older
+    entries are dropped and re-read from the backend.
+
+    Each gunicorn worker has its own cache, so an entry may be up to `ttl` seconds
+    behind a write made by another worker. Callers that are about to modify a game
+    should therefore load it with `use_cache=False`.
+
+    Attributes:
+        backend (GameStateStore): The store behind the cache.
+        maxsize (int): Maximum number of cached games.
+        ttl (float): Seconds for which a cached entry is served.
+    """
+
+    def __init__(self, backend, maxsize=1024, ttl=5):
+        """
+        Initializes the cache.
+
+        Args:
+            backend (GameStateStore): The store behind the cache.
+            maxsize (int, optional): Maximum number of cached games. Defaults to 1024.
+            ttl (float, optional): Seconds for which a cached entry is served. Defaults to 5.
+        """
+        self.backend = backend
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, game_id, use_cache=True):
+        """
+        Loads the state of a game.
+
+        Args:
+            game_id (str): The ID of the game.
+            use_cache (bool, optional): Whether a cached entry may be returned. Defaults to True.
+
+        Returns:
+            dict: The game state, or None if the game does not exist. The returned dict
+            is shared with the cache and must not be modified.
+        """
+        if use_cache:
+            state = self.lookup(game_id)
+            if state is not None:
+                return state
+
+        state = self.backend.load(game_id)
+        self.remember(game_id, state)
+        return state
+
+    def lookup(self, game_id):
+        """
+        Returns the cached state of a game without reading the backend.
+
+        Args:
+            game_id (str): The ID of the game.
+
+        Returns:
+            dict: The cached state, or None if the game is not cached or its entry is
+            older than `ttl`. The returned dict is shared with the cache and must not be modified.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(game_id)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(game_id)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[game_id]
+            self.misses += 1
+        return None
+
+    def remember(self, game_id, state):
+        """
+        Caches a state just read from or written to the backend.
+
+        Args:
+            game_id (str): The ID of the game.
+            state (dict): The game state, or None if the game does not exist.
+        """
+        if state is None:
+            self._evict(game_id)
+        else:
+            self._put(game_id, state)
+
+    def remember_delta(self, game_id, delta, previous_version=None):
+        """
+        Applies a delta just written to the backend to the cached state, if any.
+
+        The cached state is only updated when the delta directly follows it; otherwise
+        the entry is dropped so the next load re-reads the backend.
+
+        Args:
+            game_id (str): The ID of the game.
+            delta (dict): The delta returned by `Game.get_delta()`.
+            previous_version (int, optional): Version of the state the delta was made from.
+                Defaults to one less than the version of the delta.
+        """
+        with self._lock:
+            entry = self._entries.get(game_id)
+        if entry is None:
+            return
+        if previous_version is None:
+            previous_version = delta.get('version', 0) - 1
+        if entry[1].get('version', 0) == previous_version:
+            self._put(game_id, apply_delta(entry[1], delta))
+        else:
+            # The cached state missed writes made by another worker.
+            self._evict(game_id)
+
+    def forget(self, game_id):
+        """
+        Drops the cached state of a game.
+
+        Args:
+            game_id (str): The ID of the game.
+        """
+        self._evict(game_id)
+
+    def version(self, game_id):
+        """
+        Returns the version of a game in the backend, without reading the cache.
+
+        Args:
+            game_id (str): The ID of the game.
+
+        Returns:
+            int: The version of the game, or None if the game does not exist.
+        """
+        return self.backend.version(game_id)
+
+    def save(self, game_id, state, expected_version=None):
+        """
+        Saves the state of a game to the backend and the cache.
+
+        Args:
+            game_id (str): The ID of the game.
+            state (dict): The game state.
+            expected_version (int, optional): Version the stored game must be at for the
+                write to happen. Defaults to None, which writes unconditionally.
+
+        Raises:
+            StaleStateError: If the stored game is not at `expected_version`. The cached
+                state is dropped, since another worker changed the game.
+        """
+        try:
+            self.backend.save(game_id, state, expected_version)
+        except StaleStateError:
+            self._evict(game_id)
+            raise
+        self._put(game_id, state)
+
+    def save_delta(self, game_id, delta, previous_version=None, expected_version=None):
+        """
+        Appends a delta to the backend and applies it to the cached state, if any.
+
+        Args:
+            game_id (str): The ID of the game.
+            delta (dict): The delta returned by `Game.get_delta()`.
+            previous_version (int, optional): Version of the state the delta was made from.
+                Defaults to one less than the version of the delta.
+            expected_version (int, optional): Version the stored game must be at for the
+                write to happen. Defaults to None, which writes unconditionally.
+
+        Raises:
+            StaleStateError: If the stored game is not at `expected_version`. The cached
+                state is dropped, since another worker changed the game.
+        """
+        try:
+            self.backend.save_delta(game_id, delta, expected_version)
+        except StaleStateError:
+            self._evict(game_id)
+            raise
+        self.remember_delta(game_id, delta, previous_version)
+
+    def snapshot_due(self, version, previous_version=None):
+        """
+        Tells whether a game at the given version should be saved as a full snapshot.
+
+        Args:
+            version (int): The version of the game about to be saved.
+            previous_version (int, optional): Version of the game when it was loaded.
+                Defaults to one less than `version`.
+
+        Returns:
+            bool: True if a full snapshot should be written instead of a delta.
+        """
+        return self.backend.snapshot_due(version, previous_version)
+
+    def delete(self, game_id):
+        """
+        Removes a game from the backend and the cache.
+
+        Args:
+            game_id (str): The ID of the game.
+        """
+        self._evict(game_id)
+        self.backend.delete(game_id)
+
+    def purge_expired(self):
+        """
+        Drops expired cache entries and purges expired games from the backend.
+
+        Returns:
+            int: The number of games removed from the backend.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for game_id in [game_id for game_id, entry in self._entries.items() if entry[0] <= now]:
+                del self._entries[game_id]
+        return self.backend.purge_expired()
+
+    def pair(self, queue, game_id, max_wait):
+        """
+        Takes a game waiting in a matchmaking queue of the backend, or queues a game; see
+        `GameStateStore.pair`.
+        """
+        return self.backend.pair(queue, game_id, max_wait)
+
+    def _put(self, game_id, state):
+        with self._lock:
+            self._entries[game_id] = (time.monotonic() + self.ttl, state)
+            self._entries.move_to_end(game_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _evict(self, game_id):
+        with self._lock:
+            self._entries.pop(game_id, None)
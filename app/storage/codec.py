@@ -0,0 +1,146 @@
+import struct
+
+MAGIC = b'FGS'
+FORMAT_VERSION = 1
+
+AGGRESSIVE = 0x01
+HAS_RNG = 0x02
+
+_CENTRAL_PILES = ('deck', 'active', 'supplement')
+_PLAYER_PILES = ('deck', 'hand', 'active', 'discard')
+_PLAYERS = ('pO', 'pC')
+_PILES = len(_CENTRAL_PILES) + len(_PLAYERS) * len(_PLAYER_PILES)
+
+# Every fixed-size field in one struct, so a state is packed and unpacked in one call:
+# magic, format version, flags, game version, central active size, health, money and
+# attack of each player, and the length of every pile.
+_FIXED = struct.Struct(f'<3sBBIh3h3h{_PILES}H')
+# Mersenne Twister state: version, 624 words plus the position, and the cached gauss value.
+_RNG = struct.Struct('<B625I?d')
+
+_KEYS = {'version', 'aggressive', 'central', 'pO', 'pC', 'rng'}
+_CENTRAL_KEYS = {'activeSize', *_CENTRAL_PILES}
+_PLAYER_KEYS = {'health', 'money', 'attack', *_PLAYER_PILES}
+
+
+def is_encoded(data):
+    """
+    Tells whether a stored payload was written by `encode`.
+
+    Args:
+        data (bytes): The stored payload.
+
+    Returns:
+        bool: True for the binary format, False for anything else (e.g. JSON).
+    """
+    return data[:len(MAGIC)] == MAGIC
+
+
+def read_version(data):
+    """
+    Reads the game version of a payload written by `encode` without decoding the piles.
+
+    Args:
+        data (bytes): The encoded state.
+
+    Returns:
+        int: The game version.
+    """
+    return _FIXED.unpack_from(data)[3]
+
+
+def encode(state):
+    """
+    Encodes a game state from `Game.get_state()` in the compact binary format.
+
+    Layout (little endian): a fixed-size block with the magic bytes, the format version,
+    flags (aggressive opponent, RNG state present), the game version, the central active
+    size, each player's health, money and attack, and the length of every pile; then the
+    piles, one byte per catalog card ID, central first; then, if present, the state of
+    the random number generator.
+
+    Args:
+        state (dict): The game state.
+
+    Returns:
+        bytes: The encoded state.
+
+    Raises:
+        ValueError: If the state cannot be represented, e.g. it has unknown fields,
+            cards outside the catalog or values out of range. Callers fall back to JSON.
+    """
+    if not _KEYS.issuperset(state) or 'central' not in state:
+        raise ValueError("State has fields the binary format does not know")
+    central, player, computer = state['central'], state['pO'], state['pC']
+    if not _CENTRAL_KEYS.issuperset(central) or not _PLAYER_KEYS.issuperset(player) or \
+            not _PLAYER_KEYS.issuperset(computer):
+        raise ValueError("State has fields the binary format does not know")
+    rng = state.get('rng')
+    flags = (AGGRESSIVE if state['aggressive'] else 0) | (HAS_RNG if rng is not None else 0)
+    piles = [central['deck'], central['active'], central['supplement'],
+             player['deck'], player['hand'], player['active'], player['discard'],
+             computer['deck'], computer['hand'], computer['active'], computer['discard']]
+    try:
+        parts = [_FIXED.pack(MAGIC, FORMAT_VERSION, flags, state.get('version', 0), central.get('activeSize', 5),
+                             player['health'], player['money'], player['attack'],
+                             computer['health'], computer['money'], computer['attack'],
+                             *map(len, piles))]
+        # bytes() rejects anything that is not an int in range(256), e.g. legacy card dicts.
+        parts.extend(map(bytes, piles))
+        if rng is not None:
+            version, internal, gauss = rng
+            parts.append(_RNG.pack(version, *internal, gauss is not None, gauss or 0.0))
+    except (struct.error, TypeError, ValueError) as e:
+        raise ValueError(f"State cannot be encoded: {e}") from e
+    return b''.join(parts)
+
+
+def decode(data):
+    """
+    Decodes a game state written by `encode`.
+
+    The payload is read in place through a memoryview; only the resulting lists and
+    numbers are allocated.
+
+    Args:
+        data (bytes): The encoded state.
+
+    Returns:
+        dict: The game state, in the layout of `Game.get_state()`.
+
+    Raises:
+        ValueError: If the payload is not in a supported version of the binary format.
+    """
+    view = memoryview(data)
+    try:
+        fixed = _FIXED.unpack_from(view)
+    except struct.error as e:
+        raise ValueError(f"Truncated state: {e}") from e
+    magic, format_version, flags, version, active_size = fixed[:5]
+    if magic != MAGIC or format_version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported state format: {magic!r} version {format_version}")
+
+    piles = []
+    offset = _FIXED.size
+    for length in fixed[11:]:
+        piles.append(view[offset:offset + length].tolist())
+        offset += length
+    if offset > len(view):
+        raise ValueError("Truncated state: piles extend past the end of the payload")
+
+    state = {
+        'version': version,
+        'aggressive': bool(flags & AGGRESSIVE),
+        'central': {'deck': piles[0], 'active': piles[1], 'activeSize': active_size, 'supplement': piles[2]},
+        'pO': {'health': fixed[5], 'deck': piles[3], 'hand': piles[4], 'active': piles[5], 'discard': piles[6],
+               'money': fixed[6], 'attack': fixed[7]},
+        'pC': {'health': fixed[8], 'deck': piles[7], 'hand': piles[8], 'active': piles[9], 'discard': piles[10],
+               'money': fixed[9], 'attack': fixed[10]}
+    }
+    if flags & HAS_RNG:
+        try:
+            values = _RNG.unpack_from(view, offset)
+        except struct.error as e:
+            raise ValueError(f"Truncated state: {e}") from e
+        state['rng'] = [values[0], list(values[1:626]), values[627] if values[626] else None]
+    return state
@@ -0,0 +1,36 @@
+from app.storage.cached_store import CachedStore
+from app.storage.filesystem_store import FilesystemStore
+from app.storage.redis_store import RedisStore, RespConnection
+from app.storage.sqlite_store import SQLiteStore
+
+
+def create_store(config):
+    """
+    Builds the game state store described by the application configuration.
+
+    Args:
+        config (dict): The application configuration. See `Config` for the STATE_* settings.
+
+    Returns:
+        CachedStore: The configured backend wrapped in a per-process LRU cache.
+
+    Raises:
+        ValueError: If STATE_STORE_TYPE names an unknown backend.
+    """
+    store_type = config.get('STATE_STORE_TYPE', 'filesystem')
+    options = {
+        'ttl': config.get('STATE_TTL'),
+        'snapshot_interval': config.get('STATE_SNAPSHOT_INTERVAL', 20)
+    }
+
+    if store_type == 'filesystem':
+        backend = FilesystemStore(config.get('STATE_STORE_DIR', '.flask_state'), **options)
+    elif store_type == 'sqlite':
+        backend = SQLiteStore(config.get('STATE_STORE_SQLITE_PATH', 'flaskgame.db'), **options)
+    elif store_type == 'redis':
+        connection = RespConnection.from_url(config.get('STATE_STORE_REDIS_URL', 'redis://localhost:6379/0'))
+        backend = RedisStore(connection, **options)
+    else:
+        raise ValueError(f"Unknown state store type: {store_type}")
+
+    return CachedStore(backend, maxsize=config.get('STATE_CACHE_SIZE', 1024), ttl=config.get('STATE_CACHE_TTL', 5))
@@ -0,0 +1,165 @@
+import contextlib
+import fcntl
+import os
+import tempfile
+import time
+
+from app.storage.base import (GameStateStore, check_version, parse_queue_entry,
+                               queue_entry, stored_version, take_waiting)
+
+
+class FilesystemStore(GameStateStore):
+    """
+    Stores each game as a snapshot file plus an append-only log file in a directory.
+
+    Snapshots are replaced atomically, so a reader in another worker never sees a
+    partial write, and deltas are appended one per line. Expiry is based on the
+    modification time of the snapshot, which is touched whenever a delta is appended;
+    expired games are removed when they are read and, in bulk, every `purge_interval`
+    writes.
+
+    Writers of a game take an exclusive `flock` on its log file, which is never replaced
+    (a snapshot truncates it), so conditional writes from several workers are serialized.
+    Matchmaking queues are files of one entry per line, locked the same way and rewritten
+    whole, which is fine for the few players waiting at once on a single host.
+
+    Attributes:
+        directory (str): Directory holding the state files.
+        purge_interval (int): Number of writes between bulk purges of expired files.
+    """
+
+    SUFFIX = '.state'
+    LOG_SUFFIX = '.log'
+    QUEUE_SUFFIX = '.queue'
+
+    def __init__(self, directory, ttl=None, snapshot_interval=20, purge_interval=1000):
+        """
+        Initializes the store.
+
+        Args:
+            directory (str): Directory holding the state files. Created if missing.
+            ttl (int, optional): Seconds after the last write at which a game expires. Defaults to None.
+            snapshot_interval (int, optional): Number of versions between full snapshots. Defaults to 20.
+            purge_interval (int, optional): Number of writes between bulk purges. Defaults to 1000.
+        """
+        super().__init__(ttl, snapshot_interval)
+        self.directory = directory
+        self.purge_interval = purge_interval
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, game_id, suffix=SUFFIX):
+        return os.path.join(self.directory, game_id + suffix)
+
+    def _is_expired(self, mtime, now):
+        return self.ttl is not None and mtime < now - self.ttl
+
+    def _read(self, game_id):
+        try:
+            with open(self._path(game_id), 'rb') as file:
+                if self._is_expired(os.fstat(file.fileno()).st_mtime, time.time()):
+                    snapshot = None
+                else:
+                    snapshot = file.read()
+        except FileNotFoundError:
+            return None
+        if snapshot is None:
+            self._remove(game_id)
+            return None
+
+        try:
+            with open(self._path(game_id, self.LOG_SUFFIX), 'rb') as file:
+                deltas = file.read().splitlines()
+        except FileNotFoundError:
+            deltas = []
+        return snapshot, deltas
+
+    @contextlib.contextmanager
+    def _locked_log(self, game_id):
+        """
+        Opens the log of a game for appending, holding an exclusive lock on it.
+        """
+        with open(self._path(game_id, self.LOG_SUFFIX), 'a+b') as log:
+            fcntl.flock(log.fileno(), fcntl.LOCK_EX)
+            yield log
+
+    def _check(self, game_id, log, expected_version):
+        if expected_version is None:
+            return
+        try:
+            with open(self._path(game_id), 'rb') as file:
+                snapshot = file.read()
+        except FileNotFoundError:
+            check_version(game_id, None, expected_version)
+        log.seek(0)
+        check_version(game_id, stored_version(snapshot, log.read().splitlines()), expected_version)
+
+    def _write(self, game_id, data, version, expected_version):
+        with self._locked_log(game_id) as log:
+            self._check(game_id, log, expected_version)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as file:
+                    file.write(data)
+                os.replace(tmp_path, self._path(game_id))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            log.truncate(0)
+        self._count_write()
+
+    def _append(self, game_id, data, version, expected_version):
+        with self._locked_log(game_id) as log:
+            self._check(game_id, log, expected_version)
+            log.write(data + b'\n')
+        try:
+            os.utime(self._path(game_id))
+        except FileNotFoundError:
+            pass
+        self._count_write()
+
+    def _pair(self, queue, game_id, now, stale_before):
+        with open(self._path(queue, self.QUEUE_SUFFIX), 'a+b') as file:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            file.seek(0)
+            lines = file.read().splitlines()
+            count, taken = take_waiting(map(parse_queue_entry, lines), game_id, stale_before)
+            lines = lines[count:]
+            if taken is None:
+                lines.append(queue_entry(game_id, now))
+            file.truncate(0)
+            file.write(b''.join(line + b'\n' for line in lines))
+        return taken
+
+    def _remove(self, game_id):
+        self._unlink(self._path(game_id))
+        self._unlink(self._path(game_id, self.LOG_SUFFIX))
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _count_write(self):
+        self._writes += 1
+        if self.ttl is not None and self._writes % self.purge_interval == 0:
+            self.purge_expired()
+
+    def purge_expired(self):
+        if self.ttl is None:
+            return 0
+        removed = 0
+        now = time.time()
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith((self.SUFFIX, self.LOG_SUFFIX)):
+                    continue
+                try:
+                    if self._is_expired(entry.stat().st_mtime, now):
+                        os.remove(entry.path)
+                        removed += entry.name.endswith(self.SUFFIX)
+                except FileNotFoundError:
+                    pass
+        return removed
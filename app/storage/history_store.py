@@ -0,0 +1,134 @@
+import sqlite3
+import threading
+
+# Columns of a finished game, in the order `HistoryStore.insert` expects them.
+HISTORY_COLUMNS = ('game_id', 'opponent', 'winner', 'turns', 'player_health', 'opponent_health',
+                   'player_bought', 'opponent_bought', 'ended_at')
+
+
+class HistoryStore:
+    """
+    Stores the results of finished games in SQLite, for the leaderboard.
+
+    Each finished game is one row of `game_history`. The leaderboard queries never scan
+    it, so they answer in milliseconds however many games were played:
+
+    - The fastest wins are read from the `game_history_wins` index on (winner, turns,
+      player_health DESC), in index order, up to the number asked for.
+    - The win rates are read from `opponent_summary`, one row per opponent with its game,
+      win and draw counts, which a trigger keeps up to date as games are inserted.
+
+    A game is only counted once: rows whose game ID is already stored are ignored, and so
+    are not counted again by the trigger.
+
+    The database runs in WAL mode so readers in other workers are not blocked by a
+    writer. Each store instance keeps one connection, guarded by a lock.
+
+    Attributes:
+        path (str): Path of the SQLite database file, or ':memory:'.
+    """
+
+    def __init__(self, path):
+        """
+        Initializes the store, creating the tables if needed.
+
+        Args:
+            path (str): Path of the SQLite database file, or ':memory:'.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS game_history ('
+            ' game_id TEXT PRIMARY KEY,'
+            ' opponent TEXT NOT NULL,'
+            ' winner TEXT NOT NULL,'
+            ' turns INTEGER,'
+            ' player_health INTEGER NOT NULL,'
+            ' opponent_health INTEGER NOT NULL,'
+            ' player_bought INTEGER NOT NULL,'
+            ' opponent_bought INTEGER NOT NULL,'
+            ' ended_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS game_history_wins '
+                           'ON game_history (winner, turns, player_health DESC)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS opponent_summary ('
+            ' opponent TEXT PRIMARY KEY,'
+            ' games INTEGER NOT NULL,'
+            ' player_wins INTEGER NOT NULL,'
+            ' opponent_wins INTEGER NOT NULL,'
+            ' draws INTEGER NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE TRIGGER IF NOT EXISTS game_history_summary AFTER INSERT ON game_history BEGIN'
+            ' INSERT OR IGNORE INTO opponent_summary VALUES (NEW.opponent, 0, 0, 0, 0);'
+            ' UPDATE opponent_summary SET games = games + 1,'
+            '  player_wins = player_wins + (NEW.winner = \'player\'),'
+            '  opponent_wins = opponent_wins + (NEW.winner = \'opponent\'),'
+            '  draws = draws + (NEW.winner = \'draw\')'
+            ' WHERE opponent = NEW.opponent;'
+            ' END'
+        )
+
+    def insert(self, rows):
+        """
+        Inserts finished games in one transaction, skipping games already stored.
+
+        Args:
+            rows (list): Tuples of the HISTORY_COLUMNS values of each game.
+
+        Returns:
+            int: Number of games inserted.
+        """
+        with self._lock, self._conn:
+            self._conn.execute('BEGIN')
+            cursor = self._conn.executemany(f'INSERT OR IGNORE INTO game_history ({", ".join(HISTORY_COLUMNS)}) '
+                                            f'VALUES ({", ".join("?" * len(HISTORY_COLUMNS))})', rows)
+        return max(cursor.rowcount, 0)
+
+    def fastest_wins(self, limit):
+        """
+        Returns the games the player won in the fewest turns, most health left first on ties.
+
+        Games whose number of turns is unknown are left out.
+
+        Args:
+            limit (int): Most games returned.
+
+        Returns:
+            list: A dict of the opponent, turns, health left, cards bought and end time of each game.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT opponent, turns, player_health, player_bought, ended_at FROM game_history'
+                ' WHERE winner = \'player\' AND turns IS NOT NULL'
+                ' ORDER BY turns, player_health DESC LIMIT ?', (limit,)
+            ).fetchall()
+        return [{'opponent': opponent, 'turns': turns, 'health': health, 'cards_bought': bought,
+                 'ended_at': ended_at} for opponent, turns, health, bought, ended_at in rows]
+
+    def opponent_summary(self):
+        """
+        Returns the number of games played against each opponent and how they ended.
+
+        Returns:
+            list: A dict of the opponent, games, player wins, opponent wins and draws of
+            each opponent, by opponent name.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT opponent, games, player_wins, opponent_wins, draws FROM opponent_summary ORDER BY opponent'
+            ).fetchall()
+        return [{'opponent': opponent, 'games': games, 'player_wins': player_wins,
+                 'opponent_wins': opponent_wins, 'draws': draws}
+                for opponent, games, player_wins, opponent_wins, draws in rows]
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+        with self._lock:
+            self._conn.close()
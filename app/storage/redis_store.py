@@ -0,0 +1,331 @@
+import socket
+import threading
+from urllib.parse import unquote, urlparse
+
+from app.storage.base import (GameStateStore, check_version, parse_queue_entry,
+                               queue_entry, take_waiting)
+from app.utils.exceptions import StaleStateError, StateStoreError
+
+
+class RespConnection:
+    """
+    Minimal client for the Redis serialization protocol (RESP2).
+
+    Only what the state store needs is implemented: sending commands and parsing the
+    reply types. Any server that speaks RESP (Redis, KeyDB, Valkey or a local stand-in)
+    can be used.
+
+    Attributes:
+        host (str): Server host name.
+        port (int): Server port.
+        db (int): Database number selected after connecting.
+        password (str): Password sent with AUTH after connecting, or None.
+        timeout (float): Socket timeout in seconds.
+    """
+
+    def __init__(self, host='localhost', port=6379, db=0, password=None, timeout=5.0):
+        """
+        Initializes the connection. The socket is opened lazily on first use.
+
+        Args:
+            host (str, optional): Server host name. Defaults to 'localhost'.
+            port (int, optional): Server port. Defaults to 6379.
+            db (int, optional): Database number. Defaults to 0.
+            password (str, optional): Password for AUTH. Defaults to None.
+            timeout (float, optional): Socket timeout in seconds. Defaults to 5.0.
+        """
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url, timeout=5.0):
+        """
+        Creates a connection from a URL of the form redis://[:password@]host[:port][/db].
+
+        Args:
+            url (str): The server URL.
+            timeout (float, optional): Socket timeout in seconds. Defaults to 5.0.
+
+        Returns:
+            RespConnection: The (not yet opened) connection.
+        """
+        parsed = urlparse(url)
+        db = parsed.path.lstrip('/')
+        return cls(
+            host=parsed.hostname or 'localhost',
+            port=parsed.port or 6379,
+            db=int(db) if db else 0,
+            password=unquote(parsed.password) if parsed.password else None,
+            timeout=timeout
+        )
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._sock.makefile('rb')
+        if self.password:
+            self._call(('AUTH', self.password))
+        if self.db:
+            self._call(('SELECT', self.db))
+
+    def close(self):
+        """
+        Closes the socket, if open.
+        """
+        if self._sock is not None:
+            try:
+                self._reader.close()
+                self._sock.close()
+            finally:
+                self._sock = None
+                self._reader = None
+
+    def execute(self, *args):
+        """
+        Sends a command and returns its reply.
+
+        The connection is re-established once if it was dropped.
+
+        Args:
+            *args: The command name and its arguments.
+
+        Returns:
+            The parsed reply: bytes, int, str (status replies), list or None.
+
+        Raises:
+            StateStoreError: If the server cannot be reached or replies with an error.
+        """
+        return self.pipeline(args)[0]
+
+    def pipeline(self, *commands):
+        """
+        Sends several commands in one round trip and returns their replies.
+
+        The connection is re-established once if it was dropped.
+
+        Args:
+            *commands (tuple): The commands, each a tuple of a command name and its arguments.
+
+        Returns:
+            list: The parsed replies, in command order.
+
+        Raises:
+            StateStoreError: If the server cannot be reached or replies to any command with an error.
+        """
+        with self._lock:
+            return self._pipeline(commands)
+
+    def transaction(self, keys, reads, writes, check):
+        """
+        Runs commands atomically if the values they depend on did not change meanwhile.
+
+        The keys are WATCHed and `reads` sent in one round trip; if `check` accepts their
+        replies, `writes` are sent in a MULTI/EXEC block in a second one, which the server
+        aborts if another client modified any of the keys in between. The connection is
+        held for both round trips.
+
+        Args:
+            keys (list): The keys to watch.
+            reads (list): The commands whose replies are checked.
+            writes (list or callable): The commands to run atomically, or a callable
+                building them from the replies to `reads`.
+            check (callable): Called with the replies to `reads`; raises to abort.
+
+        Returns:
+            list: The replies to `writes`, or None if a watched key was modified.
+
+        Raises:
+            StateStoreError: If the server cannot be reached or replies with an error.
+        """
+        with self._lock:
+            replies = self._pipeline([('WATCH', *keys), *reads])
+            try:
+                check(replies[1:])
+                if callable(writes):
+                    writes = writes(replies[1:])
+            except BaseException:
+                self._pipeline([('UNWATCH',)])
+                raise
+            # No reconnection here: a new connection would not be watching the keys.
+            return self._pipeline([('MULTI',), *writes, ('EXEC',)], attempts=1)[-1]
+
+    def _pipeline(self, commands, attempts=2):
+        for attempt in range(attempts):
+            try:
+                if self._sock is None:
+                    self._connect()
+                self._sock.sendall(b''.join(self._encode(args) for args in commands))
+                replies, error = [], None
+                for _ in commands:
+                    try:
+                        replies.append(self._read_reply())
+                    except StateStoreError as e:
+                        replies.append(None)
+                        error = error or e
+                if error is not None:
+                    raise error
+                return replies
+            except (ConnectionError, socket.timeout, OSError) as e:
+                self.close()
+                if attempt == attempts - 1:
+                    raise StateStoreError(f"Redis connection failed: {e}") from e
+
+    def _call(self, args):
+        self._sock.sendall(self._encode(args))
+        return self._read_reply()
+
+    @staticmethod
+    def _encode(args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if isinstance(arg, str):
+                arg = arg.encode('utf-8')
+            elif isinstance(arg, int):
+                arg = str(arg).encode('ascii')
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode('utf-8')
+        if kind == b'-':
+            raise StateStoreError(f"Redis error: {payload.decode('utf-8')}")
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise StateStoreError(f"Unexpected Redis reply: {line!r}")
+
+
+class RedisStore(GameStateStore):
+    """
+    Stores games on a Redis-protocol server, as a snapshot string key plus a delta list key.
+
+    Every operation is a single pipelined round trip, except conditional writes: these
+    WATCH a key holding the game's version and check it before writing in a MULTI/EXEC
+    transaction (see `RespConnection.transaction`), two round trips. Expiry is delegated
+    to the server through the key TTLs, so `purge_expired` has nothing to do.
+
+    Matchmaking queues are lists; `pair` reads the head of one and pops or pushes in a
+    transaction on the list key, retried if another worker changed the queue meanwhile.
+
+    Attributes:
+        connection (RespConnection): The server connection.
+        prefix (str): Prefix added to every key.
+    """
+
+    # Entries read from the head of a matchmaking queue at once.
+    QUEUE_SCAN = 16
+
+    def __init__(self, connection, ttl=None, snapshot_interval=20, prefix='flaskgame:'):
+        """
+        Initializes the store.
+
+        Args:
+            connection (RespConnection): The server connection.
+            ttl (int, optional): Seconds after the last write at which a game expires. Defaults to None.
+            snapshot_interval (int, optional): Number of versions between full snapshots. Defaults to 20.
+            prefix (str, optional): Prefix added to every key. Defaults to 'flaskgame:'.
+        """
+        super().__init__(ttl, snapshot_interval)
+        self.connection = connection
+        self.prefix = prefix
+
+    def _key(self, game_id):
+        return f"{self.prefix}state:{game_id}"
+
+    def _log_key(self, game_id):
+        return f"{self.prefix}log:{game_id}"
+
+    def _version_key(self, game_id):
+        return f"{self.prefix}version:{game_id}"
+
+    def _queue_key(self, queue):
+        return f"{self.prefix}queue:{queue}"
+
+    def _read(self, game_id):
+        snapshot, deltas = self.connection.pipeline(('GET', self._key(game_id)),
+                                                    ('LRANGE', self._log_key(game_id), 0, -1))
+        return None if snapshot is None else (snapshot, deltas)
+
+    def _write(self, game_id, data, version, expected_version):
+        expiry = () if self.ttl is None else ('EX', self.ttl)
+        self._run(game_id, [('SET', self._key(game_id), data, *expiry),
+                            ('SET', self._version_key(game_id), version, *expiry),
+                            ('DEL', self._log_key(game_id))], expected_version)
+
+    def _append(self, game_id, data, version, expected_version):
+        expiry = () if self.ttl is None else ('EX', self.ttl)
+        commands = [('RPUSH', self._log_key(game_id), data),
+                    ('SET', self._version_key(game_id), version, *expiry)]
+        if self.ttl is not None:
+            commands.append(('EXPIRE', self._log_key(game_id), self.ttl))
+            commands.append(('EXPIRE', self._key(game_id), self.ttl))
+        self._run(game_id, commands, expected_version)
+
+    def _remove(self, game_id):
+        self.connection.execute('DEL', self._key(game_id), self._log_key(game_id), self._version_key(game_id))
+
+    def _pair(self, queue, game_id, now, stale_before):
+        key = self._queue_key(queue)
+        while True:
+            outcome = {}
+
+            def writes(replies):
+                head, = replies
+                count, taken = take_waiting(map(parse_queue_entry, head), game_id, stale_before)
+                # A head of discarded entries only is removed, and the next one read.
+                outcome['done'] = taken is not None or len(head) < self.QUEUE_SCAN
+                outcome['taken'] = taken
+                commands = [('LTRIM', key, count, -1)] if count else []
+                if outcome['done'] and taken is None:
+                    commands.append(('RPUSH', key, queue_entry(game_id, now)))
+                return commands
+
+            replies = self.connection.transaction([key], [('LRANGE', key, 0, self.QUEUE_SCAN - 1)], writes,
+                                                  lambda replies: None)
+            if replies is not None and outcome['done']:
+                return outcome['taken']
+
+    def _run(self, game_id, commands, expected_version):
+        """
+        Runs the commands of a write, in a transaction checking the stored version unless
+        `expected_version` is None.
+
+        Games saved before versions were stored have a snapshot but no version key; they
+        are not checked until their next write sets one.
+        """
+        if expected_version is None:
+            self.connection.pipeline(*commands)
+            return
+
+        def check(replies):
+            version, exists = replies
+            if version is not None:
+                check_version(game_id, int(version), expected_version)
+            elif not exists:
+                check_version(game_id, None, expected_version)
+
+        keys = [self._version_key(game_id), self._key(game_id)]
+        reads = [('GET', self._version_key(game_id)), ('EXISTS', self._key(game_id))]
+        if self.connection.transaction(keys, reads, commands, check) is None:
+            raise StaleStateError(f"Game {game_id} was modified during the write.")
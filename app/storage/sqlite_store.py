@@ -0,0 +1,155 @@
+import sqlite3
+import threading
+import time
+
+from app.storage.base import GameStateStore, check_version, take_waiting
+
+
+class SQLiteStore(GameStateStore):
+    """
+    Stores game snapshots and their delta logs in SQLite tables.
+
+    The database runs in WAL mode so readers in other workers are not blocked by a
+    writer. Each store instance keeps one connection, guarded by a lock.
+
+    The version of each game is kept next to its snapshot, so a conditional write checks
+    it in the same transaction; databases created before the column existed get it added,
+    and their games are not checked until they are next written.
+
+    Attributes:
+        path (str): Path of the SQLite database file, or ':memory:'.
+    """
+
+    def __init__(self, path, ttl=None, snapshot_interval=20):
+        """
+        Initializes the store, creating the tables if needed.
+
+        Args:
+            path (str): Path of the SQLite database file, or ':memory:'.
+            ttl (int, optional): Seconds after the last write at which a game expires. Defaults to None.
+            snapshot_interval (int, optional): Number of versions between full snapshots. Defaults to 20.
+        """
+        super().__init__(ttl, snapshot_interval)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS game_state ('
+            ' game_id TEXT PRIMARY KEY,'
+            ' state BLOB NOT NULL,'
+            ' updated_at REAL NOT NULL)'
+        )
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(game_state)')]
+        if 'version' not in columns:
+            self._conn.execute('ALTER TABLE game_state ADD COLUMN version INTEGER')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS game_state_updated_at ON game_state (updated_at)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS game_delta ('
+            ' game_id TEXT NOT NULL,'
+            ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' delta BLOB NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS game_delta_game_id ON game_delta (game_id, seq)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS game_queue ('
+            ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' queue TEXT NOT NULL,'
+            ' game_id TEXT NOT NULL,'
+            ' queued_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS game_queue_queue ON game_queue (queue, seq)')
+
+    def _read(self, game_id):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT state, updated_at FROM game_state WHERE game_id = ?', (game_id,)
+            ).fetchone()
+            if row is not None:
+                deltas = [delta for delta, in self._conn.execute(
+                    'SELECT delta FROM game_delta WHERE game_id = ? ORDER BY seq', (game_id,)
+                )]
+        if row is None:
+            return None
+        if self.ttl is not None and row[1] < time.time() - self.ttl:
+            self._remove(game_id)
+            return None
+        return row[0], deltas
+
+    def version(self, game_id):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT version, updated_at FROM game_state WHERE game_id = ?', (game_id,)
+            ).fetchone()
+        if row is None or self.ttl is not None and row[1] < time.time() - self.ttl:
+            return None
+        if row[0] is None:
+            # Saved before versions were stored.
+            return super().version(game_id)
+        return row[0]
+
+    def _stored_version(self, game_id, expected_version):
+        row = self._conn.execute('SELECT version FROM game_state WHERE game_id = ?', (game_id,)).fetchone()
+        if row is None:
+            check_version(game_id, None, expected_version)
+        elif row[0] is not None:
+            check_version(game_id, row[0], expected_version)
+
+    def _write(self, game_id, data, version, expected_version):
+        with self._lock, self._conn:
+            # IMMEDIATE takes the write lock before the version is read.
+            self._conn.execute('BEGIN IMMEDIATE')
+            if expected_version is not None:
+                self._stored_version(game_id, expected_version)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO game_state (game_id, state, updated_at, version) VALUES (?, ?, ?, ?)',
+                (game_id, data, time.time(), version)
+            )
+            self._conn.execute('DELETE FROM game_delta WHERE game_id = ?', (game_id,))
+
+    def _append(self, game_id, data, version, expected_version):
+        with self._lock, self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            if expected_version is not None:
+                self._stored_version(game_id, expected_version)
+            self._conn.execute('INSERT INTO game_delta (game_id, delta) VALUES (?, ?)', (game_id, data))
+            self._conn.execute('UPDATE game_state SET updated_at = ?, version = MAX(IFNULL(version, 0), ?) '
+                               'WHERE game_id = ?', (time.time(), version, game_id))
+
+    def _remove(self, game_id):
+        with self._lock, self._conn:
+            self._conn.execute('BEGIN')
+            self._conn.execute('DELETE FROM game_state WHERE game_id = ?', (game_id,))
+            self._conn.execute('DELETE FROM game_delta WHERE game_id = ?', (game_id,))
+
+    def _pair(self, queue, game_id, now, stale_before):
+        with self._lock, self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            while True:
+                row = self._conn.execute('SELECT seq, game_id, queued_at FROM game_queue WHERE queue = ? '
+                                         'ORDER BY seq LIMIT 1', (queue,)).fetchone()
+                if row is None:
+                    self._conn.execute('INSERT INTO game_queue (queue, game_id, queued_at) VALUES (?, ?, ?)',
+                                       (queue, game_id, now))
+                    return None
+                self._conn.execute('DELETE FROM game_queue WHERE seq = ?', (row[0],))
+                _, taken = take_waiting([row[1:]], game_id, stale_before)
+                if taken is not None:
+                    return taken
+
+    def purge_expired(self):
+        if self.ttl is None:
+            return 0
+        with self._lock, self._conn:
+            self._conn.execute('BEGIN')
+            cursor = self._conn.execute('DELETE FROM game_state WHERE updated_at < ?', (time.time() - self.ttl,))
+            self._conn.execute('DELETE FROM game_delta WHERE game_id NOT IN (SELECT game_id FROM game_state)')
+        return cursor.rowcount
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+        with self._lock:
+            self._conn.close()
@@ -9,3 +9,15 @@ class InsufficientMoneyError(Exception):
 class InsufficientSupplementError(Exception):
     """Exception raised for insufficient supplement."""
     pass
+
+class StateStoreError(Exception):
+    """Exception raised when the game state store cannot be reached or returns an error."""
+    pass
+
+class StaleStateError(StateStoreError):
+    """Exception raised when a game was changed by another request since it was loaded."""
+    pass
+
+class NotYourTurnError(Exception):
+    """Exception raised for an action sent by a player whose turn it is not."""
+    pass
@@ -0,0 +1,94 @@
+import logging
+
+GAME_LOGGER_NAME = 'flaskgame.game'
+
+
+class _Fields:
+    """
+    Renders the fields of a game event only when a log record is actually formatted.
+    """
+
+    __slots__ = ('fields',)
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    def __str__(self):
+        return ' '.join(f"{key}={_render(value)}" for key, value in self.fields.items())
+
+
+def _render(value):
+    """
+    Renders a single event field value.
+
+    Cards (anything with `to_dict`) are shown by their attributes and lists are rendered
+    element by element.
+    """
+    if hasattr(value, 'to_dict'):
+        return f"[{value.name} cost={value.cost} attack={value.attack} money={value.money}]"
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(_render(item) for item in value) + ']'
+    return repr(value) if isinstance(value, str) else str(value)
+
+
+class GameEventLogger:
+    """
+    Structured, level-gated logger for game events.
+
+    Each event has a name and a set of key/value fields. Fields are passed to the
+    underlying logger unformatted and are only rendered if the record is emitted,
+    and `enabled` lets callers skip building the fields altogether.
+
+    Attributes:
+        logger (logging.Logger): The underlying standard library logger.
+    """
+
+    def __init__(self, name=GAME_LOGGER_NAME):
+        """
+        Initializes the event logger.
+
+        Args:
+            name (str, optional): Name of the underlying logger. Defaults to GAME_LOGGER_NAME.
+        """
+        self.logger = logging.getLogger(name)
+
+    @property
+    def enabled(self):
+        """
+        bool: Whether game events are currently being recorded.
+        """
+        return self.logger.isEnabledFor(logging.INFO)
+
+    def event(self, name, **fields):
+        """
+        Records a game event.
+
+        Args:
+            name (str): The event name, e.g. 'card_bought'.
+            **fields: Event fields, rendered lazily.
+        """
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info('%s %s', name, _Fields(fields))
+
+
+game_log = GameEventLogger()
+
+
+def configure_game_logging(level):
+    """
+    Sets the level of the game event logger.
+
+    A stream handler is attached only when the logger would otherwise have nowhere to
+    write, so servers that configure logging themselves (e.g. gunicorn) are left alone.
+
+    Args:
+        level (str or int): Logging level name or number. None leaves the level unchanged.
+    """
+    if level is None:
+        return
+    logger = game_log.logger
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    if logger.isEnabledFor(logging.INFO) and not logger.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+        logger.addHandler(handler)
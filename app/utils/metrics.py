@@ -0,0 +1,292 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds, in seconds, of the histogram buckets; a last +Inf bucket is implied.
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+PHASE_METRIC = 'flaskgame_phase_duration_seconds'
+REQUEST_METRIC = 'flaskgame_request_duration_seconds'
+HELP = {
+    PHASE_METRIC: 'Time spent in each phase of handling a game request.',
+    REQUEST_METRIC: 'Time spent handling each request, by endpoint.',
+}
+
+
+class Histogram:
+    """
+    A Prometheus-style histogram of durations.
+
+    Attributes:
+        buckets (tuple): Upper bounds of the buckets.
+        counts (list): Observations per bucket (not cumulative), plus a last +Inf bucket.
+        sum (float): Sum of all observations.
+        count (int): Number of observations.
+    """
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """
+        Records one observation.
+
+        Args:
+            value (float): The observed duration in seconds.
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, counts, total, count):
+        """
+        Adds the observations of another histogram with the same buckets.
+        """
+        for index, value in enumerate(counts):
+            self.counts[index] += value
+        self.sum += total
+        self.count += count
+
+
+class _Timer:
+    """
+    Context manager that records the time spent in its block into a histogram.
+    """
+
+    __slots__ = ('metrics', 'histogram', 'started')
+
+    def __init__(self, metrics, histogram):
+        self.metrics = metrics
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.histogram, time.perf_counter() - self.started)
+        return False
+
+
+class _NullTimer:
+    """
+    Shared do-nothing timer handed out while metrics are disabled.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    In-process registry of timing histograms, aggregated across worker processes.
+
+    Every worker records into its own histograms. When a directory is configured, each
+    worker periodically writes a snapshot of its histograms to `<directory>/<pid>.json`,
+    and `collect` merges the snapshots of all workers, so whichever worker answers a
+    `/metrics` scrape reports the totals. Histograms are cumulative, so the files of
+    workers that have exited still count; clear the directory when the service is
+    redeployed.
+
+    While disabled, `time` returns a shared no-op context manager, so instrumented code
+    costs one attribute check per phase.
+
+    Attributes:
+        enabled (bool): Whether timings are recorded.
+        directory (str): Directory shared by the workers, or None to report this process only.
+        flush_interval (float): Minimum seconds between two snapshots of this worker.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.directory = None
+        self.flush_interval = 5.0
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def configure(self, enabled=False, directory=None, flush_interval=5.0):
+        """
+        Turns instrumentation on or off and sets where worker snapshots are written.
+
+        Args:
+            enabled (bool, optional): Whether to record timings. Defaults to False.
+            directory (str, optional): Directory shared by the workers. Defaults to None.
+            flush_interval (float, optional): Minimum seconds between snapshots. Defaults to 5.
+        """
+        self.enabled = bool(enabled)
+        self.directory = directory
+        self.flush_interval = flush_interval
+        if self.enabled and directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def reset(self):
+        """
+        Discards the histograms of this process.
+        """
+        with self._lock:
+            self._histograms = {}
+
+    def histogram(self, name, **labels):
+        """
+        Returns the histogram of a metric and label set, creating it on first use.
+
+        Args:
+            name (str): Metric name.
+            **labels: Label values.
+
+        Returns:
+            Histogram: The histogram.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        return histogram
+
+    def time(self, phase):
+        """
+        Returns a context manager that records the duration of a request handling phase.
+
+        Args:
+            phase (str): The phase, e.g. 'session_load' or 'play_turn'.
+
+        Returns:
+            A context manager; a shared no-op one while metrics are disabled.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, self.histogram(PHASE_METRIC, phase=phase))
+
+    def observe(self, histogram, value):
+        """
+        Records one observation in a histogram.
+
+        Args:
+            histogram (Histogram): The histogram.
+            value (float): The observed duration in seconds.
+        """
+        with self._lock:
+            histogram.observe(value)
+
+    def maybe_flush(self):
+        """
+        Writes this worker's snapshot if the flush interval has elapsed.
+        """
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Atomically writes this worker's histograms to `<directory>/<pid>.json`.
+        """
+        if not self.directory:
+            return
+        self._last_flush = time.monotonic()
+        data = json.dumps({'histograms': self._snapshot()})
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(data)
+            os.replace(temp_path, os.path.join(self.directory, f'{os.getpid()}.json'))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _snapshot(self):
+        with self._lock:
+            return [
+                {'name': name, 'labels': dict(labels), 'counts': list(histogram.counts),
+                 'sum': histogram.sum, 'count': histogram.count}
+                for (name, labels), histogram in self._histograms.items()
+            ]
+
+    def collect(self):
+        """
+        Merges the histograms of this process and, if configured, of every other worker.
+
+        Returns:
+            dict: Histograms keyed by (metric name, sorted label tuple).
+        """
+        if self.directory:
+            self.flush()
+            entries = []
+            for filename in os.listdir(self.directory):
+                if not filename.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(self.directory, filename)) as f:
+                        entries.extend(json.load(f)['histograms'])
+                except (OSError, ValueError, KeyError):
+                    continue
+        else:
+            entries = self._snapshot()
+
+        merged = {}
+        for entry in entries:
+            key = (entry['name'], tuple(sorted(entry['labels'].items())))
+            histogram = merged.setdefault(key, Histogram())
+            if len(entry['counts']) == len(histogram.counts):
+                histogram.merge(entry['counts'], entry['sum'], entry['count'])
+        return merged
+
+    def render(self):
+        """
+        Renders the merged histograms in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics page.
+        """
+        merged = self.collect()
+        lines = []
+        for name in sorted({name for name, _ in merged}):
+            lines.append(f'# HELP {name} {HELP.get(name, name)}')
+            lines.append(f'# TYPE {name} histogram')
+            for (metric, labels), histogram in sorted(merged.items()):
+                if metric != name:
+                    continue
+                label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+                prefix = label_text + ',' if label_text else ''
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{label_text}}} {histogram.sum}')
+                lines.append(f'{name}_count{{{label_text}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def configure_metrics(config):
+    """
+    Configures the shared metrics registry from the application config.
+
+    Args:
+        config (dict): Flask config with METRICS_ENABLED, METRICS_DIR and METRICS_FLUSH_INTERVAL.
+    """
+    metrics.configure(
+        enabled=config.get('METRICS_ENABLED', False),
+        directory=config.get('METRICS_DIR'),
+        flush_interval=config.get('METRICS_FLUSH_INTERVAL', 5.0)
+    )
@@ -0,0 +1,249 @@
+import cProfile
+import os
+import pstats
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+
+# Stacks deeper than this are cut off when reconstructing collapsed stacks.
+MAX_STACK_DEPTH = 64
+
+
+def frame_label(func):
+    """
+    Returns the flamegraph frame name of a pstats function key.
+
+    Args:
+        func (tuple): The (filename, line number, function name) key.
+
+    Returns:
+        str: e.g. 'game.py:167(play_turn)', or the built-in's name.
+    """
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return f'{os.path.basename(filename)}:{line}({name})'
+
+
+def collapse_stats(stats):
+    """
+    Reconstructs collapsed stacks ('frame;frame;frame count' lines) from cProfile data.
+
+    cProfile only records caller/callee pairs, not whole stacks, so every stack is
+    rebuilt by walking down from the root functions. The time of a function called
+    from several places is split between its callers in proportion to the time each
+    caller spent in it, which is the usual approximation for flamegraphs of
+    deterministic profiles.
+
+    Args:
+        stats (pstats.Stats): The profile.
+
+    Returns:
+        Counter: Microseconds of own time per stack, keyed by ';'-joined frames.
+    """
+    table = stats.stats
+    callees = defaultdict(list)
+    for func, (_, _, _, _, callers) in table.items():
+        for caller, edge in callers.items():
+            callees[caller].append((func, edge[3]))
+
+    stacks = Counter()
+
+    def walk(func, path, on_path, fraction):
+        _, _, own, total, _ = table[func]
+        path = path + (frame_label(func),)
+        micros = round(own * fraction * 1e6)
+        if micros:
+            stacks[';'.join(path)] += micros
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_total in callees[func]:
+            callee_total = table[callee][3]
+            if callee in on_path or callee_total <= 0:
+                continue
+            share = fraction * edge_total / callee_total
+            if share * callee_total >= 1e-7:
+                walk(callee, path, on_path | {callee}, share)
+
+    for func, (_, _, _, _, callers) in table.items():
+        if not callers:
+            walk(func, (), frozenset((func,)), 1.0)
+    return stacks
+
+
+def write_collapsed(stacks, path):
+    """
+    Writes collapsed stacks in the format read by flamegraph.pl and speedscope.
+
+    Args:
+        stacks (Counter): Counts per ';'-joined stack.
+        path (str): The file to write.
+    """
+    with open(path, 'w') as f:
+        for stack, count in sorted(stacks.items()):
+            f.write(f'{stack} {count}\n')
+
+
+def read_collapsed(path):
+    """
+    Reads a collapsed stacks file.
+
+    Args:
+        path (str): The file to read.
+
+    Returns:
+        Counter: Counts per ';'-joined stack.
+    """
+    stacks = Counter()
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack and count.isdigit():
+                stacks[stack] += int(count)
+    return stacks
+
+
+class RequestProfiler:
+    """
+    Opt-in cProfile sampling of production requests.
+
+    When enabled, a request to one of the profiled endpoints is profiled if it carries
+    the `X-Profile` header, or at random with probability `sample_rate`. Each profile is
+    written to the directory as a pstats file and a collapsed stacks file sharing one
+    name, and only the `max_profiles` most recent profiles are kept.
+
+    Attributes:
+        enabled (bool): Whether requests may be profiled at all.
+        sample_rate (float): Share of requests profiled without the header.
+        directory (str): Where profiles are written.
+        max_profiles (int): Number of profiles kept in the directory.
+        endpoints (tuple): URL rules whose requests may be profiled.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 0.0
+        self.directory = '.flask_profiles'
+        self.max_profiles = 100
+        self.endpoints = ('/play_turn', '/play_turns')
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def configure(self, enabled=False, sample_rate=0.0, directory='.flask_profiles', max_profiles=100,
+                  endpoints=('/play_turn', '/play_turns')):
+        """
+        Sets the profiling options.
+
+        Args:
+            enabled (bool, optional): Whether requests may be profiled. Defaults to False.
+            sample_rate (float, optional): Share of requests profiled without the header. Defaults to 0.
+            directory (str, optional): Where profiles are written. Defaults to '.flask_profiles'.
+            max_profiles (int, optional): Number of profiles kept. Defaults to 100.
+            endpoints (tuple, optional): URL rules that may be profiled. Defaults to ('/play_turn', '/play_turns').
+        """
+        self.enabled = bool(enabled)
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self.endpoints = tuple(endpoints)
+
+    def should_profile(self, rule, headers):
+        """
+        Decides whether a request is profiled.
+
+        Args:
+            rule (str): The URL rule of the request, e.g. '/play_turn'.
+            headers (Mapping): The request headers.
+
+        Returns:
+            bool: True if the request should be profiled.
+        """
+        if not self.enabled or rule not in self.endpoints:
+            return False
+        if headers.get(PROFILE_HEADER, '').lower() in ('1', 'true', 'yes'):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self):
+        """
+        Starts profiling the current thread.
+
+        Returns:
+            cProfile.Profile: The running profiler, to pass to `finish`.
+        """
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def finish(self, profile, label):
+        """
+        Stops a profiler and writes its pstats and collapsed stacks files.
+
+        Args:
+            profile (cProfile.Profile): The profiler returned by `start`.
+            label (str): Short description included in the file names, e.g. the action.
+
+        Returns:
+            str: The profile ID, the common name of both files.
+        """
+        profile.disable()
+        with self._lock:
+            self._counter += 1
+            counter = self._counter
+        safe_label = ''.join(char if char.isalnum() or char in '-_' else '_' for char in label)[:40]
+        profile_id = f'{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}-{counter}-{safe_label}'
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, profile_id)
+        stats = pstats.Stats(profile)
+        stats.dump_stats(base + '.pstats')
+        write_collapsed(collapse_stats(stats), base + '.collapsed')
+        self._rotate()
+        return profile_id
+
+    def _rotate(self):
+        """
+        Removes the oldest profiles beyond `max_profiles`.
+        """
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith('.pstats')]
+        except OSError:
+            return
+        if len(names) <= self.max_profiles:
+            return
+        paths = sorted((os.path.join(self.directory, name) for name in names), key=_mtime)
+        for path in paths[:len(paths) - self.max_profiles]:
+            for suffix in ('.pstats', '.collapsed'):
+                try:
+                    os.remove(path[:-len('.pstats')] + suffix)
+                except OSError:
+                    pass
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0
+
+
+profiler = RequestProfiler()
+
+
+def configure_profiling(config):
+    """
+    Configures the shared request profiler from the application config.
+
+    Args:
+        config (dict): Flask config with the PROFILE_* settings.
+    """
+    profiler.configure(
+        enabled=config.get('PROFILE_ENABLED', False),
+        sample_rate=config.get('PROFILE_SAMPLE_RATE', 0.0),
+        directory=config.get('PROFILE_DIR', '.flask_profiles'),
+        max_profiles=config.get('PROFILE_MAX_FILES', 100),
+        endpoints=config.get('PROFILE_ENDPOINTS', ('/play_turn', '/play_turns'))
+    )
@@ -0,0 +1,75 @@
+"""
+Compares the size and speed of the game state encodings.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_codec
+"""
+import argparse
+import json
+import pickle
+import timeit
+
+from app.models.game import Game
+from app.storage import codec
+from app.storage.base import decode_state, encode_state
+
+
+def sample_states(seed=1):
+    """
+    Returns the states of one seeded game after 0, 3 and 6 rounds.
+    """
+    game = Game(seed=seed)
+    game.start()
+    states = {'early': game.get_state()}
+    for label in ('mid', 'late'):
+        for _ in range(3):
+            game.play_turn('P')
+            game.play_turn('A')
+            if game.central['active'] and game.pO['money'] >= game.central['active'][0].cost:
+                game.play_turn('B', 0)
+            game.play_turn('E')
+        states[label] = game.get_state()
+    states['late+rng'] = game.get_state(include_rng=True)
+    return states
+
+
+def measure(function, number):
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare game state encodings.")
+    parser.add_argument('-n', '--number', type=int, default=2000, help="calls per timing (default: 2000)")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    formats = {
+        'pickle': (lambda state: pickle.dumps(state, pickle.HIGHEST_PROTOCOL), pickle.loads),
+        'json': (encode_state, decode_state),
+        'binary': (codec.encode, codec.decode),
+    }
+    results = []
+    for label, state in sample_states().items():
+        for name, (encode, decode) in formats.items():
+            data = encode(state)
+            results.append({
+                'state': label,
+                'format': name,
+                'bytes': len(data),
+                'encode_us': round(measure(lambda: encode(state), args.number), 2),
+                'decode_us': round(measure(lambda: decode(data), args.number), 2),
+                'restore_us': round(measure(lambda: Game.from_state(decode(data)), args.number), 2),
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'state':<9} {'format':<7} {'bytes':>6} {'encode us':>10} {'decode us':>10} {'restore us':>11}")
+    for row in results:
+        print(f"{row['state']:<9} {row['format']:<7} {row['bytes']:>6} {row['encode_us']:>10} "
+              f"{row['decode_us']:>10} {row['restore_us']:>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""
+Micro-benchmarks of the Game engine primitives.
+
+Every primitive is timed on seeded early-, mid- and late-game positions, since the
+discard piles (and with them the cost of playing and serializing a game) grow as
+players buy cards. Besides the wall time per call, the memory allocated per call is
+measured with tracemalloc: the peak of temporary allocations and what is still held
+after the call.
+
+    python -m benchmarks.bench_game
+    python -m benchmarks.bench_game --stage late --bench end_turn --bench get_state
+    python -m benchmarks.bench_game --save game_baseline.json
+    python -m benchmarks.bench_game --compare game_baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from app.models.game import Game
+from app.models.policies import AGGRESSIVE
+
+# Rounds played before each position is captured. With the standard nine-card central
+# deck, the late position is the last one that still has cards left to buy.
+STAGES = {
+    'early': 0,
+    'mid': 2,
+    'late': 3,
+}
+
+
+def build_position(rounds, seed=1):
+    """
+    Plays a seeded game for some rounds, buying greedily, and returns its state.
+
+    Args:
+        rounds (int): Rounds to play before capturing the position.
+        seed (int, optional): Seed of the game. Defaults to 1.
+
+    Returns:
+        dict: The state of the game after `rounds` rounds.
+    """
+    game = Game(seed=seed)
+    game.start()
+    for _ in range(rounds):
+        game.play_turn('P')
+        game.play_turn('A')
+        while True:
+            market = [card.card_id for card in game.central['active']]
+            supplement = [card.card_id for card in game.central['supplement']]
+            choice = AGGRESSIVE.choose(market, supplement, game.pO['money'], game.rng)
+            if choice is None or len(market) <= 1:
+                break
+            game.play_turn('B', choice)
+        game.play_turn('E')
+    return game.get_state(include_rng=True)
+
+
+def pile_sizes(state):
+    """
+    Returns the total number of cards held by each player in a state.
+    """
+    return {player: sum(len(state[player][pile]) for pile in ('deck', 'hand', 'active', 'discard'))
+            for player in ('pO', 'pC')}
+
+
+def _restore(state):
+    return Game.from_state(state)
+
+
+def _played(state):
+    game = Game.from_state(state)
+    game.play_turn('P')
+    return game
+
+
+def _rich(state):
+    game = Game.from_state(state)
+    game.pO['money'] = 100
+    return game
+
+
+def _unstarted(state):
+    return Game(seed=1)
+
+
+# Name: (setup creating the object to call from the position, the call). Setup is not timed.
+BENCHMARKS = {
+    '__init__': (lambda state: None, lambda _, state: Game(seed=1)),
+    'start': (_unstarted, lambda game, state: game.start()),
+    'play_all': (_restore, lambda game, state: game.play_turn('P')),
+    'play_that_card': (_restore, lambda game, state: game.play_turn('C', 0)),
+    'buy_card': (_rich, lambda game, state: game.play_turn('B', 0)),
+    'attack': (_played, lambda game, state: game.play_turn('A')),
+    'end_turn': (_played, lambda game, state: game.play_turn('E')),
+    'get_status': (_restore, lambda game, state: game.get_status()),
+    'get_state': (_restore, lambda game, state: game.get_state()),
+    'set_state': (_restore, lambda game, state: game.set_state(state)),
+    'from_state': (lambda state: None, lambda _, state: Game.from_state(state)),
+}
+
+
+def measure(name, state, number=1000, repeat=5, allocation_calls=200):
+    """
+    Measures one primitive on one position.
+
+    Args:
+        name (str): Name of the primitive, a key of BENCHMARKS.
+        state (dict): The position.
+        number (int, optional): Calls per timing run. Defaults to 1000.
+        repeat (int, optional): Timing runs; the fastest is kept. Defaults to 5.
+        allocation_calls (int, optional): Calls traced for allocations. Defaults to 200.
+
+    Returns:
+        dict: Time per call in microseconds, and peak and retained bytes allocated per call.
+    """
+    setup, call = BENCHMARKS[name]
+
+    best = None
+    for _ in range(repeat):
+        targets = [setup(state) for _ in range(number)]
+        started = time.perf_counter_ns()
+        for target in targets:
+            call(target, state)
+        elapsed = time.perf_counter_ns() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    targets = [setup(state) for _ in range(allocation_calls)]
+    results = [None] * allocation_calls
+    peak = 0
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        for index, target in enumerate(targets):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            # Keep results alive so that what a call returns counts as retained.
+            results[index] = call(target, state)
+            peak += tracemalloc.get_traced_memory()[1] - before
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'us_per_call': round(best / number / 1000, 3),
+        'alloc_peak_bytes': round(peak / allocation_calls),
+        'alloc_retained_bytes': round(retained / allocation_calls),
+    }
+
+
+def run(benchmarks=None, stages=None, number=1000, repeat=5, seed=1):
+    """
+    Measures primitives on positions.
+
+    Returns:
+        dict: The report, with results per stage and primitive.
+    """
+    report = {'python': platform.python_version(), 'seed': seed, 'number': number, 'stages': {}}
+    for stage in stages or STAGES:
+        state = build_position(STAGES[stage], seed)
+        results = {name: measure(name, state, number, repeat) for name in benchmarks or BENCHMARKS}
+        report['stages'][stage] = {'cards': pile_sizes(state), 'results': results}
+    return report
+
+
+def compare(report, baseline, tolerance):
+    """
+    Lists the primitives that got slower or allocate more than `tolerance` above the baseline.
+
+    Returns:
+        list: Human readable descriptions of the regressions.
+    """
+    regressions = []
+    for stage, data in report['stages'].items():
+        before_stage = baseline['stages'].get(stage, {}).get('results', {})
+        for name, result in data['results'].items():
+            before = before_stage.get(name)
+            if before is None:
+                continue
+            for field in ('us_per_call', 'alloc_peak_bytes'):
+                if result[field] > before[field] * (1 + tolerance):
+                    regressions.append(f"{stage} {name} {field} {result[field]} > baseline {before[field]}")
+    return regressions
+
+
+def print_report(report):
+    for stage, data in report['stages'].items():
+        cards = data['cards']
+        print(f"{stage} game ({cards['pO']} player cards, {cards['pC']} computer cards)")
+        print(f"  {'primitive':<16} {'us/call':>9} {'peak B':>9} {'kept B':>9}")
+        for name, result in data['results'].items():
+            print(f"  {name:<16} {result['us_per_call']:>9} {result['alloc_peak_bytes']:>9} "
+                  f"{result['alloc_retained_bytes']:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmark the Game engine primitives.")
+    parser.add_argument('--bench', action='append', choices=sorted(BENCHMARKS),
+                        help="primitive to measure; repeat for several (default: all)")
+    parser.add_argument('--stage', action='append', choices=list(STAGES),
+                        help="game stage to measure; repeat for several (default: all)")
+    parser.add_argument('-n', '--number', type=int, default=1000, help="calls per timing run (default: 1000)")
+    parser.add_argument('-r', '--repeat', type=int, default=5, help="timing runs, fastest kept (default: 5)")
+    parser.add_argument('-s', '--seed', type=int, default=1, help="seed of the positions (default: 1)")
+    parser.add_argument('--save', metavar='PATH', help="save the report as a JSON baseline")
+    parser.add_argument('--compare', metavar='PATH', help="compare against a saved baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative regression (default: 0.25)")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args.bench, args.stage, args.number, args.repeat, args.seed)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,319 @@
+"""
+Load test of the /start, /play_turn and /status flow.
+
+Simulated clients play complete games concurrently, each with its own session cookie,
+and the latency of every request is recorded per endpoint and per turn action. The
+application runs in this process (through Flask's test client) or is reached over
+HTTP, e.g. behind gunicorn:
+
+    python -m benchmarks.bench_http --clients 8 --games 200
+    gunicorn run:app --bind 127.0.0.1:5000 --workers 4 &
+    python -m benchmarks.bench_http --url http://127.0.0.1:5000 --clients 32 --games 1000
+
+A run can be saved as a JSON baseline and later runs compared against it; the command
+exits with status 1 if a latency percentile or the throughput regressed by more than
+the tolerance:
+
+    python -m benchmarks.bench_http --seed 1 --save baseline.json
+    python -m benchmarks.bench_http --seed 1 --compare baseline.json --tolerance 0.2
+"""
+import argparse
+import http.cookiejar
+import json
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+PERCENTILES = (50, 95, 99)
+
+
+class InProcessClient:
+    """
+    Sends requests to an application object through Flask's test client.
+    """
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, payload=None):
+        response = self._client.open(path, method=method, json=payload)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    """
+    Sends requests to a running server, keeping the session cookie between requests.
+    """
+
+    def __init__(self, url, timeout=30):
+        self._url = url.rstrip('/')
+        self._timeout = timeout
+        self._opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, payload=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(self._url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with self._opener.open(request, timeout=self._timeout) as response:
+                return response.status, json.loads(response.read() or b'null')
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read() or b'null')
+
+
+class Recorder:
+    """
+    Collects request latencies per endpoint and per turn action from several threads.
+
+    Attributes:
+        latencies (dict): Latencies in seconds per key, e.g. 'POST /play_turn' or 'play_turn:attack'.
+        errors (int): Number of requests answered with an unexpected status.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def timed(self, client, method, path, payload=None, action=None):
+        """
+        Sends a request and records how long it took.
+
+        Returns:
+            tuple: The status code and the decoded JSON body.
+        """
+        started = time.perf_counter()
+        status, body = client.request(method, path, payload)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies[f'{method} {path}'].append(elapsed)
+            if action is not None:
+                self.latencies[f'play_turn:{action}'].append(elapsed)
+            if status != 200:
+                self.errors += 1
+        return status, body
+
+
+def play_game(client, recorder, rng, max_rounds=100):
+    """
+    Plays one complete game through the API: every round the client plays all cards,
+    attacks, buys random affordable cards, ends the turn and polls the status.
+
+    Returns:
+        int: Number of requests sent.
+    """
+    requests = 1
+    recorder.timed(client, 'POST', '/start', {'opponent_type': rng.choice('AQ')})
+
+    def turn(action, card_index=None):
+        nonlocal requests
+        requests += 1
+        payload = {'action': action} if card_index is None else {'action': action, 'card_index': card_index}
+        status, body = recorder.timed(client, 'POST', '/play_turn', payload, action=action)
+        if status != 200 or body.get('game_status') != 'running':
+            return None
+        return body['current_status']
+
+    for _ in range(max_rounds):
+        if turn('play_all') is None:
+            break
+        current = turn('attack')
+        if current is None:
+            break
+        while True:
+            money = current['player']['values']['money']
+            central = current['central']
+            options = [card['card_index'] for card in central['available_cards'] + central['supplement_card']
+                       if card['cost'] <= money]
+            if not options:
+                break
+            current = turn('buy_card', rng.choice(options))
+            if current is None:
+                return requests
+        if turn('end_turn') is None:
+            break
+        requests += 1
+        status, body = recorder.timed(client, 'GET', '/status')
+        if status != 200 or body.get('game_status') != 'running':
+            break
+    return requests
+
+
+def percentile(sorted_values, percent):
+    """
+    Returns a nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(recorder, elapsed):
+    """
+    Computes latency percentiles (in milliseconds) and throughput per key.
+
+    Returns:
+        dict: Statistics per key.
+    """
+    stats = {}
+    for key, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        stats[key] = {
+            'count': len(values),
+            'rps': round(len(values) / elapsed, 1),
+            'mean_ms': round(sum(values) / len(values) * 1000, 3),
+            **{f'p{p}_ms': round(percentile(values, p) * 1000, 3) for p in PERCENTILES},
+            'max_ms': round(values[-1] * 1000, 3),
+        }
+    return stats
+
+
+def run(make_client, games, clients, seed, max_rounds):
+    """
+    Plays `games` games with `clients` concurrent clients.
+
+    Returns:
+        dict: The benchmark report.
+    """
+    recorder = Recorder()
+    next_game = iter(range(games))
+    next_game_lock = threading.Lock()
+
+    def client_loop(index):
+        client = make_client()
+        rng = random.Random(f'{seed}:{index}')
+        played = requests = 0
+        while True:
+            with next_game_lock:
+                if next(next_game, None) is None:
+                    return played, requests
+            requests += play_game(client, recorder, rng, max_rounds)
+            played += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        totals = list(pool.map(client_loop, range(clients)))
+    elapsed = time.perf_counter() - started
+
+    requests = sum(count for _, count in totals)
+    return {
+        'games': sum(played for played, _ in totals),
+        'clients': clients,
+        'seed': seed,
+        'requests': requests,
+        'errors': recorder.errors,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(requests / elapsed, 1),
+        'games_per_second': round(games / elapsed, 2),
+        'endpoints': summarize(recorder, elapsed),
+    }
+
+
+def compare(report, baseline, tolerance):
+    """
+    Lists the regressions of a report against a baseline.
+
+    A regression is a p50/p95/p99 latency more than `tolerance` above the baseline's,
+    or a total throughput more than `tolerance` below it.
+
+    Returns:
+        list: Human readable descriptions of the regressions.
+    """
+    regressions = []
+    if report['throughput_rps'] < baseline['throughput_rps'] * (1 - tolerance):
+        regressions.append(f"throughput {report['throughput_rps']} req/s < baseline {baseline['throughput_rps']} req/s")
+    for key, stats in report['endpoints'].items():
+        before = baseline['endpoints'].get(key)
+        if before is None:
+            continue
+        for p in PERCENTILES:
+            field = f'p{p}_ms'
+            if stats[field] > before[field] * (1 + tolerance):
+                regressions.append(f"{key} {field} {stats[field]} > baseline {before[field]}")
+    return regressions
+
+
+def print_report(report):
+    print(f"{report['games']} games, {report['clients']} clients, {report['requests']} requests in "
+          f"{report['seconds']}s: {report['throughput_rps']} req/s, {report['games_per_second']} games/s, "
+          f"{report['errors']} errors")
+    print(f"  {'endpoint':<24} {'count':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for key, stats in report['endpoints'].items():
+        print(f"  {key:<24} {stats['count']:>7} {stats['rps']:>9} {stats['p50_ms']:>9} {stats['p95_ms']:>9} "
+              f"{stats['p99_ms']:>9} {stats['max_ms']:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the /start, /play_turn and /status flow.")
+    parser.add_argument('--url', default=None, help="server to test, e.g. http://127.0.0.1:5000 (default: in-process)")
+    parser.add_argument('--store', default='filesystem', help="state store of the in-process app (default: filesystem)")
+    parser.add_argument('-g', '--games', type=int, default=200, help="games to play (default: 200)")
+    parser.add_argument('-c', '--clients', type=int, default=8, help="concurrent clients (default: 8)")
+    parser.add_argument('-s', '--seed', type=int, default=1, help="seed of the clients' choices (default: 1)")
+    parser.add_argument('--max-rounds', type=int, default=100, help="rounds after which a client gives up a game")
+    parser.add_argument('--save', metavar='PATH', help="save the report as a JSON baseline")
+    parser.add_argument('--compare', metavar='PATH', help="compare against a saved baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative regression (default: 0.2)")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    state_dir = None
+    history = None
+    if args.url:
+        target = args.url
+        make_client = lambda: HttpClient(args.url)  # noqa: E731
+    else:
+        from app import create_app
+        from app.config import Config
+
+        state_dir = tempfile.mkdtemp(prefix='flaskgame-bench-')
+        config = type('BenchmarkConfig', (Config,), {
+            'STATE_STORE_TYPE': args.store,
+            'STATE_STORE_DIR': state_dir,
+            'STATE_STORE_SQLITE_PATH': f'{state_dir}/bench.db',
+            'HISTORY_DB_PATH': f'{state_dir}/history.db',
+        })
+        app = create_app(config)
+        history = app.extensions['game_history']
+        target = f'in-process ({args.store} store)'
+        make_client = lambda: InProcessClient(app)  # noqa: E731
+
+    try:
+        report = run(make_client, args.games, args.clients, args.seed, args.max_rounds)
+    finally:
+        if history is not None:
+            history.close()
+        if state_dir:
+            shutil.rmtree(state_dir, ignore_errors=True)
+    report['target'] = target
+    report['python'] = platform.python_version()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
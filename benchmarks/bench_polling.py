@@ -0,0 +1,267 @@
+"""
+Status polling benchmark of the sync (gunicorn) and async (ASGI) serving modes.
+
+Every simulated client starts a game, then polls /status at a fixed interval over a
+keep-alive connection, like a browser waiting for the next move. The benchmark starts
+each server on a fresh state directory, ramps the clients up, polls for a while, and
+reports the polls answered per second against those offered, the latency percentiles
+and the failed polls:
+
+    python -m benchmarks.bench_polling --clients 1000 --interval 1 --duration 20
+    python -m benchmarks.bench_polling --mode async --clients 5000 --ramp 10
+    python -m benchmarks.bench_polling --url http://127.0.0.1:5000 --clients 200
+
+'sync' is the deployment of the Dockerfile (gunicorn with 4 sync workers) and 'async'
+the ASGI application under uvicorn. The clients run in this process, so on a small
+machine they compete with the server for the CPU; compare modes on the same machine.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+
+from benchmarks.bench_http import PERCENTILES, percentile
+
+SERVERS = {
+    'sync': lambda host, port: ['gunicorn', 'run:app', '--bind', f'{host}:{port}', '--workers', '4',
+                                '--log-level', 'warning'],
+    'async': lambda host, port: ['uvicorn', 'asgi:app', '--host', host, '--port', str(port),
+                                 '--log-level', 'warning', '--no-access-log'],
+}
+
+
+class Connection:
+    """
+    Minimal HTTP/1.1 client connection over asyncio streams, reopened when the server closes it.
+    """
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, payload=None, cookie=None):
+        """
+        Sends a request and reads the whole response.
+
+        Returns:
+            tuple: The status code, the response headers (lower-case names) and the body.
+        """
+        return await asyncio.wait_for(self._request(method, path, payload, cookie), self.timeout)
+
+    async def _request(self, method, path, payload, cookie):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode() if payload is not None else b''
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', f'Content-Length: {len(body)}']
+        if payload is not None:
+            lines.append('Content-Type: application/json')
+        if cookie:
+            lines.append(f'Cookie: {cookie}')
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        try:
+            head = await self.reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, ConnectionError):
+            await self.close()
+            raise
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        headers = {}
+        for line in header_lines:
+            if line:
+                name, _, value = line.partition(':')
+                headers.setdefault(name.strip().lower(), value.strip())
+        content = await self.reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return int(status_line.split()[1]), headers, content
+
+    async def close(self):
+        if self.writer is not None:
+            writer, self.reader, self.writer = self.writer, None, None
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (OSError, asyncio.CancelledError):
+                pass
+
+
+class PollStats:
+    """
+    Poll latencies and failures of all clients.
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.failures = {}
+        self.clients_started = 0
+
+    def fail(self, reason):
+        self.failures[reason] = self.failures.get(reason, 0) + 1
+
+
+async def poll_client(host, port, interval, ramp_delay, stop_at, measure_from, stats, timeout):
+    """
+    Starts a game, then polls /status every `interval` seconds until `stop_at`.
+    """
+    await asyncio.sleep(ramp_delay)
+    connection = Connection(host, port, timeout)
+    try:
+        try:
+            status, headers, _ = await connection.request('POST', '/start', {'opponent_type': 'A'})
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            stats.fail('start')
+            return
+        if status != 200 or 'set-cookie' not in headers:
+            stats.fail('start')
+            return
+        cookie = headers['set-cookie'].split(';', 1)[0]
+        stats.clients_started += 1
+
+        # Spread the polls of the clients over the interval.
+        next_poll = time.monotonic() + random.random() * interval
+        while True:
+            await asyncio.sleep(max(0.0, next_poll - time.monotonic()))
+            if time.monotonic() >= stop_at:
+                return
+            started = time.monotonic()
+            try:
+                status, _, _ = await connection.request('GET', '/status', cookie=cookie)
+            except asyncio.TimeoutError:
+                outcome = 'timeout'
+            except (OSError, asyncio.IncompleteReadError):
+                outcome = 'connection'
+            else:
+                outcome = None if status == 200 else f'status {status}'
+            if started >= measure_from:
+                if outcome is None:
+                    stats.latencies.append(time.monotonic() - started)
+                else:
+                    stats.fail(outcome)
+            next_poll = max(next_poll + interval, time.monotonic())
+    finally:
+        await connection.close()
+
+
+async def poll(url, clients, interval, duration, ramp, timeout):
+    """
+    Runs the polling clients against a server.
+
+    Returns:
+        dict: The report of the run.
+    """
+    parsed = urlparse(url)
+    host, port = parsed.hostname, parsed.port or 80
+    stats = PollStats()
+    measure_from = time.monotonic() + ramp + interval
+    stop_at = measure_from + duration
+    await asyncio.gather(*(
+        poll_client(host, port, interval, ramp * index / clients, stop_at, measure_from, stats, timeout)
+        for index in range(clients)
+    ))
+    latencies = sorted(stats.latencies)
+    report = {
+        'clients': clients,
+        'clients_started': stats.clients_started,
+        'interval_s': interval,
+        'offered_rps': round(clients / interval, 1),
+        'answered_rps': round(len(latencies) / duration, 1),
+        'failures': stats.failures,
+    }
+    if latencies:
+        report.update({f'p{p}_ms': round(percentile(latencies, p) * 1000, 2) for p in PERCENTILES})
+        report['max_ms'] = round(latencies[-1] * 1000, 2)
+    return report
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(host, port, process, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server did not listen on {host}:{port} within {timeout} seconds")
+
+
+def run_mode(mode, args):
+    """
+    Starts the server of a serving mode on a fresh state directory and polls it.
+
+    Returns:
+        dict: The report of the run.
+    """
+    host, port = '127.0.0.1', free_port()
+    state_dir = tempfile.mkdtemp(prefix='bench_polling_')
+    env = dict(os.environ, STATE_STORE_DIR=state_dir, SESSION_TYPE='cookie')
+    process = subprocess.Popen(SERVERS[mode](host, port), env=env)
+    try:
+        wait_for_port(host, port, process)
+        return asyncio.run(poll(f'http://{host}:{port}', args.clients, args.interval, args.duration,
+                                args.ramp, args.timeout))
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+
+def print_report(reports):
+    columns = ['clients_started', 'offered_rps', 'answered_rps'] + [f'p{p}_ms' for p in PERCENTILES] + ['max_ms']
+    print(f"{'mode':<8}" + ''.join(f"{column:>16}" for column in columns) + "  failures")
+    for mode, report in reports.items():
+        print(f"{mode:<8}" + ''.join(f"{str(report.get(column, '-')):>16}" for column in columns)
+              + f"  {report['failures'] or '-'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare /status polling on the sync and async servers.")
+    parser.add_argument('--mode', choices=('sync', 'async', 'both'), default='both',
+                        help="server to start and poll (default: both)")
+    parser.add_argument('--url', help="poll an already running server instead of starting one")
+    parser.add_argument('-c', '--clients', type=int, default=1000, help="polling clients (default: 1000)")
+    parser.add_argument('--interval', type=float, default=1.0, help="seconds between polls of a client (default: 1)")
+    parser.add_argument('-d', '--duration', type=float, default=20.0, help="seconds of measured polling (default: 20)")
+    parser.add_argument('--ramp', type=float, default=5.0, help="seconds over which clients start (default: 5)")
+    parser.add_argument('--timeout', type=float, default=10.0, help="seconds before a request fails (default: 10)")
+    parser.add_argument('--json', action='store_true', help="print the reports as JSON")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        reports = {'server': asyncio.run(poll(args.url, args.clients, args.interval, args.duration,
+                                               args.ramp, args.timeout))}
+    else:
+        modes = ('sync', 'async') if args.mode == 'both' else (args.mode,)
+        reports = {mode: run_mode(mode, args) for mode in modes}
+
+    if args.json:
+        print(json.dumps({'python': platform.python_version(), 'cpus': os.cpu_count(), 'reports': reports},
+                         indent=2))
+    else:
+        print_report(reports)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
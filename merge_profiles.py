@@ -0,0 +1,68 @@
+import argparse
+import glob
+import os
+import pstats
+import sys
+
+from app.utils.profiling import read_collapsed, write_collapsed
+
+
+def find_profiles(paths, suffix):
+    """
+    Lists the profile files with a suffix in the given files and directories.
+
+    Args:
+        paths (list): Profile files or directories holding them.
+        suffix (str): '.collapsed' or '.pstats'.
+
+    Returns:
+        list: The matching files, sorted.
+    """
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(glob.glob(os.path.join(path, '*' + suffix)))
+        elif path.endswith(suffix):
+            found.append(path)
+    return sorted(found)
+
+
+def main(argv=None):
+    """
+    Entry point for merging request profiles.
+    Sums the collapsed stacks written by the request profiler into one file, ready for
+    flamegraph.pl or speedscope, and optionally merges the pstats files.
+    """
+    parser = argparse.ArgumentParser(description="Merge request profiles into one flamegraph-ready file.")
+    parser.add_argument('paths', nargs='*', default=['.flask_profiles'],
+                        help="profile files or directories (default: .flask_profiles)")
+    parser.add_argument('-o', '--output', default='profile.collapsed',
+                        help="merged collapsed stacks file (default: profile.collapsed)")
+    parser.add_argument('--pstats', metavar='PATH', default=None, help="also merge the pstats files into PATH")
+    parser.add_argument('--top', type=int, default=0, help="print the N functions with the most own time")
+    args = parser.parse_args(argv)
+
+    collapsed = find_profiles(args.paths, '.collapsed')
+    if not collapsed:
+        print("No profiles found.", file=sys.stderr)
+        return 1
+
+    stacks = read_collapsed(collapsed[0])
+    for path in collapsed[1:]:
+        stacks.update(read_collapsed(path))
+    write_collapsed(stacks, args.output)
+    print(f"Merged {len(collapsed)} profiles ({len(stacks)} stacks) into {args.output}")
+
+    pstats_files = find_profiles(args.paths, '.pstats')
+    if pstats_files and (args.pstats or args.top):
+        stats = pstats.Stats(*pstats_files)
+        if args.pstats:
+            stats.dump_stats(args.pstats)
+            print(f"Merged pstats written to {args.pstats}")
+        if args.top:
+            stats.sort_stats('tottime').print_stats(args.top)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
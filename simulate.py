@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import random
+import time
+
+from app.simulation.runner import ENGINES, run_parallel
+from app.models.policies import POLICIES, get_policy
+
+
+def main(argv=None):
+    """
+    Entry point for the headless batch simulator.
+    Plays AI-vs-AI games without starting the Flask application and prints the results.
+    """
+    parser = argparse.ArgumentParser(description="Run headless Card Duel games between two buying policies.")
+    parser.add_argument('-n', '--games', type=int, default=10000, help="number of games to play (default: 10000)")
+    parser.add_argument('-p', '--player', default='aggressive',
+                        help=f"player policy: {', '.join(sorted(POLICIES))} (default: aggressive)")
+    parser.add_argument('-c', '--computer', default='acquisitive',
+                        help="computer policy (default: acquisitive)")
+    parser.add_argument('-s', '--seed', type=int, default=None, help="random seed (default: a random seed, printed)")
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: one per CPU core)")
+    parser.add_argument('--engine', choices=ENGINES + ('vectorized',), default='fast',
+                        help="'fast' simulation engine, the 'game' model itself, or the NumPy 'vectorized' "
+                             "engine for greedy policies (default: fast)")
+    parser.add_argument('--sweep', metavar='CARD.STAT=V1,V2,...', default=None,
+                        help="play a batch with the vectorized engine for each value of one card stat, "
+                             "e.g. archer.attack=1,2,3,4")
+    parser.add_argument('--max-rounds', type=int, default=1000, help="rounds after which a game is a draw")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        player, computer = get_policy(args.player), get_policy(args.computer)
+    except ValueError as e:
+        parser.error(str(e))
+
+    seed = args.seed if args.seed is not None else random.getrandbits(32)
+    if args.sweep:
+        return _sweep(parser, args, player, computer, seed)
+
+    started = time.perf_counter()
+    try:
+        if args.engine == 'vectorized':
+            result = _vectorized().simulate_vectorized(args.games, player.name, computer.name, seed=seed,
+                                                       max_rounds=args.max_rounds)
+        else:
+            result = run_parallel(args.games, player.name, computer.name, seed=seed, workers=args.workers,
+                                  engine=args.engine, max_rounds=args.max_rounds)
+    except (ImportError, ValueError) as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - started
+
+    summary = result.to_dict()
+    summary.update({
+        'player_policy': player.name,
+        'computer_policy': computer.name,
+        'seed': seed,
+        'workers': args.workers,
+        'engine': args.engine,
+        'seconds': round(elapsed, 3),
+        'games_per_minute': round(args.games / elapsed * 60) if elapsed else None
+    })
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    print(f"{summary['games']} games, {player.name} (player) vs {computer.name} (computer), seed {seed}, "
+          f"{args.workers} workers, {args.engine} engine")
+    for outcome, rate in summary['win_rates'].items():
+        print(f"  {outcome:<9} {summary['wins'][outcome]:>10}  {rate:7.2%}")
+    rounds = summary['rounds']
+    print(f"  rounds    mean {rounds['mean']:.2f}, min {rounds['min']}, p50 {rounds['p50']}, "
+          f"p95 {rounds['p95']}, max {rounds['max']}")
+    for side, frequencies in summary['purchases_per_game'].items():
+        bought = ', '.join(f"{name} {count:.2f}" for name, count in sorted(frequencies.items(), key=lambda item: -item[1]))
+        print(f"  {side:<9} buys per game: {bought}")
+    print(f"  {elapsed:.2f}s ({summary['games_per_minute']} games/minute)")
+
+
+def _vectorized():
+    """
+    Imports the vectorized engine, which needs the optional NumPy dependency.
+    """
+    try:
+        from app.simulation import vectorized
+    except ImportError as e:
+        raise ImportError(f"The vectorized engine needs NumPy (pip install numpy): {e}") from e
+    return vectorized
+
+
+def _sweep(parser, args, player, computer, seed):
+    """
+    Runs a card stat sweep with the vectorized engine and prints one result per value.
+    """
+    try:
+        target, values = args.sweep.split('=', 1)
+        card, stat = target.rsplit('.', 1)
+        values = [int(value) for value in values.split(',')]
+    except ValueError:
+        parser.error(f"Invalid sweep: {args.sweep}. Expected CARD.STAT=V1,V2,...")
+
+    started = time.perf_counter()
+    try:
+        results = _vectorized().sweep(card, stat, values, args.games, player.name, computer.name, seed=seed,
+                                      max_rounds=args.max_rounds)
+    except (ImportError, ValueError) as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps({
+            'card': card,
+            'stat': stat,
+            'player_policy': player.name,
+            'computer_policy': computer.name,
+            'seed': seed,
+            'seconds': round(elapsed, 3),
+            'results': [dict(result.to_dict(), value=value) for value, result in results]
+        }, indent=2))
+        return
+
+    print(f"{card} {stat} sweep, {args.games} games per value, {player.name} (player) vs "
+          f"{computer.name} (computer), seed {seed}")
+    for value, result in results:
+        rates = result.win_rates()
+        print(f"  {stat} {value:>3}: player {rates['player']:7.2%}  computer {rates['computer']:7.2%}  "
+              f"draw {rates['draw']:7.2%}  mean rounds {result.to_dict()['rounds']['mean']:.2f}")
+    print(f"  {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+import socketserver
+import threading
+import time
+
+
+class RedisStub:
+    """
+    Tiny in-process server speaking the Redis protocol, used as a local stand-in for
+    Redis in tests. Only the commands used by the application are implemented.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+        # Number of writes to each key, compared by EXEC against the values seen by WATCH.
+        self.revisions = {}
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                session = {'watched': {}, 'queue': None}
+                while True:
+                    try:
+                        command = stub._read_command(self.rfile)
+                    except ConnectionError:
+                        return
+                    if command is None:
+                        return
+                    self.wfile.write(stub._dispatch(command, session))
+
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.url = f"redis://127.0.0.1:{self.port}/0"
+        self._thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @staticmethod
+    def _read_command(rfile):
+        line = rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            raise ConnectionError("Inline commands are not supported")
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(rfile.readline()[1:-2])
+            args.append(rfile.read(length + 2)[:-2])
+        return args
+
+    @staticmethod
+    def _encode(value):
+        if value is None:
+            return b'$-1\r\n'
+        if isinstance(value, int):
+            return b':%d\r\n' % value
+        if isinstance(value, str):
+            return b'+%s\r\n' % value.encode()
+        if isinstance(value, list):
+            return b'*%d\r\n' % len(value) + b''.join(RedisStub._encode(item) for item in value)
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def _alive(self, key):
+        deadline = self.expiry.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+        return key in self.data
+
+    def _dispatch(self, args, session):
+        name = args[0].upper().decode()
+        if session['queue'] is not None and name not in ('EXEC', 'DISCARD'):
+            session['queue'].append(args)
+            return b'+QUEUED\r\n'
+        if name == 'WATCH':
+            with self.lock:
+                session['watched'].update((key, self.revisions.get(key, 0)) for key in args[1:])
+            return b'+OK\r\n'
+        if name == 'UNWATCH':
+            session['watched'].clear()
+            return b'+OK\r\n'
+        if name == 'MULTI':
+            session['queue'] = []
+            return b'+OK\r\n'
+        if name in ('EXEC', 'DISCARD'):
+            queue, session['queue'] = session['queue'], None
+            watched = dict(session['watched'])
+            session['watched'].clear()
+            if queue is None:
+                return b'-ERR ' + name.encode() + b' without MULTI\r\n'
+            if name == 'DISCARD':
+                return b'+OK\r\n'
+            with self.lock:
+                if any(self.revisions.get(key, 0) != revision for key, revision in watched.items()):
+                    return b'*-1\r\n'
+                return b'*%d\r\n' % len(queue) + b''.join(self._call(command) for command in queue)
+        with self.lock:
+            return self._call(args)
+
+    def _call(self, args):
+        name = args[0].decode().lower()
+        handler = getattr(self, f"cmd_{name}", None)
+        if handler is None:
+            return b'-ERR unknown command ' + name.upper().encode() + b'\r\n'
+        return self._encode(handler(*args[1:]))
+
+    def _touch(self, key):
+        self.revisions[key] = self.revisions.get(key, 0) + 1
+
+    def cmd_ping(self):
+        return 'PONG'
+
+    def cmd_auth(self, password):
+        return 'OK'
+
+    def cmd_select(self, db):
+        return 'OK'
+
+    def cmd_get(self, key):
+        return self.data[key] if self._alive(key) else None
+
+    def cmd_exists(self, *keys):
+        return sum(self._alive(key) for key in keys)
+
+    def cmd_set(self, key, value, *options):
+        self._touch(key)
+        self.data[key] = value
+        self.expiry.pop(key, None)
+        if options and options[0].upper() == b'EX':
+            self.expiry[key] = time.monotonic() + int(options[1])
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            self._touch(key)
+            if self._alive(key):
+                removed += 1
+                del self.data[key]
+            self.expiry.pop(key, None)
+        return removed
+
+    def cmd_expire(self, key, seconds):
+        if not self._alive(key):
+            return 0
+        self._touch(key)
+        self.expiry[key] = time.monotonic() + int(seconds)
+        return 1
+
+    def cmd_rpush(self, key, *values):
+        self._touch(key)
+        if not self._alive(key):
+            self.data[key] = []
+        self.data[key].extend(values)
+        return len(self.data[key])
+
+    def cmd_lrange(self, key, start, stop):
+        if not self._alive(key):
+            return []
+        start, stop = int(start), int(stop)
+        items = self.data[key]
+        return items[start:] if stop == -1 else items[start:stop + 1]
+
+    def cmd_ltrim(self, key, start, stop):
+        if not self._alive(key):
+            return 'OK'
+        self._touch(key)
+        start, stop = int(start), int(stop)
+        items = self.data[key]
+        self.data[key] = items[start:] if stop == -1 else items[start:stop + 1]
+        if not self.data[key]:
+            del self.data[key]
+            self.expiry.pop(key, None)
+        return 'OK'
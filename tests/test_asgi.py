@@ -0,0 +1,193 @@
+import asyncio
+import json
+import time
+from unittest import mock
+
+from app import create_app
+from app.asgi import GameASGIApp
+from app.config import TestingConfig
+from app.models.game import Game
+from tests.base import BaseTestCase
+
+
+class AsgiConfig(TestingConfig):
+    SESSION_TYPE = 'cookie'
+
+
+async def request(app, method, path, body=None, cookie=None):
+    """
+    Sends one request to an ASGI application and returns its status, headers and body,
+    decoded if it is JSON.
+    """
+    headers = [(b'content-type', b'application/json')]
+    if cookie:
+        headers.append((b'cookie', cookie.encode('latin-1')))
+    scope = {'type': 'http', 'method': method, 'path': path, 'headers': headers}
+    messages = [{'type': 'http.request', 'body': json.dumps(body).encode() if body is not None else b''}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    await asyncio.wait_for(app(scope, receive, send), 5)
+    response_headers = {name.decode(): value.decode() for name, value in sent[0]['headers']}
+    payload = b''.join(message.get('body', b'') for message in sent[1:])
+    if response_headers.get('content-type') == 'application/json':
+        payload = json.loads(payload)
+    return sent[0]['status'], response_headers, payload
+
+
+def call(app, method, path, body=None, cookie=None):
+    """
+    Sends one request to an ASGI application; see `request`.
+    """
+    return asyncio.run(request(app, method, path, body, cookie))
+
+
+def session_cookie(headers):
+    return headers['set-cookie'].split(';', 1)[0]
+
+
+class TestGameASGIApp(BaseTestCase):
+
+    def create_app(self):
+        return create_app(AsgiConfig)
+
+    def setUp(self):
+        super().setUp()
+        self.asgi = GameASGIApp(self.app)
+
+    def test_game_is_played_over_asgi(self):
+        """Test that a game can be started, played and polled through the ASGI application."""
+        status, headers, data = call(self.asgi, 'POST', '/start', {'opponent_type': 'A'})
+        self.assertEqual(status, 200)
+        self.assertTrue(data['success'])
+        cookie = session_cookie(headers)
+
+        status, _, data = call(self.asgi, 'POST', '/play_turn', {'action': 'play_all'}, cookie)
+        self.assertEqual(status, 200)
+        self.assertEqual(data['current_status']['player']['hand'], [])
+
+        status, _, data = call(self.asgi, 'POST', '/play_turns', {'actions': ['attack', 'end_turn']}, cookie)
+        self.assertEqual(status, 200)
+        self.assertEqual(data['steps_applied'], 2)
+
+        status, _, polled = call(self.asgi, 'GET', '/status', cookie=cookie)
+        self.assertEqual(status, 200)
+        self.assertEqual(polled['current_status'], data['current_status'])
+
+    def test_session_is_shared_with_flask(self):
+        """Test that the session cookie set by the ASGI application is accepted by the Flask app."""
+        _, headers, data = call(self.asgi, 'POST', '/start', {'opponent_type': 'A'})
+        name, value = session_cookie(headers).split('=', 1)
+        self.client.set_cookie(name, value)
+        response = self.client.get('/status')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['current_status'], data['current_status'])
+
+    def test_errors(self):
+        """Test the responses to requests without a game, malformed requests and unknown routes."""
+        status, _, data = call(self.asgi, 'GET', '/status')
+        self.assertEqual((status, data['error']), (400, "Game not started. Please start a game first."))
+        self.assertEqual(call(self.asgi, 'GET', '/status', cookie='session=forged')[0], 400)
+        self.assertEqual(call(self.asgi, 'GET', '/nowhere')[0], 404)
+        self.assertEqual(call(self.asgi, 'GET', '/start')[0], 405)
+
+        _, headers, _ = call(self.asgi, 'POST', '/start', {})
+        cookie = session_cookie(headers)
+        self.assertIn('action', call(self.asgi, 'POST', '/play_turn', {'card_index': 0}, cookie)[2]['message'])
+        status, _, data = call(self.asgi, 'POST', '/play_turn', {'action': 'buy_card', 'card_index': 99}, cookie)
+        self.assertEqual(status, 400)
+        self.assertFalse(data['success'])
+
+    def test_lobby_over_asgi(self):
+        """Test that the session's games can be created, played, listed and deleted through the ASGI application."""
+        status, headers, data = call(self.asgi, 'POST', '/games', {'opponent_type': 'A'})
+        self.assertEqual(status, 201)
+        game_id = data['game_id']
+        cookie = session_cookie(headers)
+
+        status, _, data = call(self.asgi, 'POST', f'/games/{game_id}/play_turn', {'action': 'play_all'}, cookie)
+        self.assertEqual(status, 200)
+        self.assertEqual(data['current_status']['player']['hand'], [])
+        status, _, data = call(self.asgi, 'GET', '/games', cookie=cookie)
+        self.assertEqual([(game['game_id'], game['version']) for game in data['games']], [(game_id, 1)])
+        self.assertEqual(call(self.asgi, 'GET', '/games/unknown/status', cookie=cookie)[0], 404)
+
+        status, headers, _ = call(self.asgi, 'DELETE', f'/games/{game_id}', cookie=cookie)
+        self.assertEqual(status, 200)
+        self.assertEqual(call(self.asgi, 'GET', f'/games/{game_id}/status', cookie=session_cookie(headers))[0], 404)
+
+    def test_match_over_asgi(self):
+        """Test that two players are paired and take turns through the ASGI application."""
+        status, headers, data = call(self.asgi, 'POST', '/match', {})
+        self.assertEqual((status, data['seat']), (202, 'first'))
+        game_id, first = data['game_id'], session_cookie(headers)
+        status, headers, data = call(self.asgi, 'POST', '/match', {})
+        self.assertEqual((status, data['seat'], data['game_id']), (200, 'second', game_id))
+        second = session_cookie(headers)
+
+        self.assertEqual(call(self.asgi, 'POST', f'/games/{game_id}/play_turn', {'action': 'P'}, second)[0], 403)
+        status, _, data = call(self.asgi, 'POST', f'/games/{game_id}/play_turns', {'actions': ['P', 'E']}, first)
+        self.assertEqual((status, data['message']), (200, "It is your opponent's turn"))
+        status, _, data = call(self.asgi, 'GET', f'/games/{game_id}/status', cookie=second)
+        self.assertEqual((data['message'], data['current_status']['opponent']['hand']), ('It is your turn', 5))
+
+    def test_server_side_sessions(self):
+        """Test that the ASGI application serves the Flask-Session session types as well."""
+        asgi = GameASGIApp(create_app(TestingConfig))
+        _, headers, _ = call(asgi, 'POST', '/start', {'opponent_type': 'A'})
+        status, _, data = call(asgi, 'GET', '/status', cookie=session_cookie(headers))
+        self.assertEqual((status, data['game_status']), (200, 'running'))
+
+    def test_open_streams_do_not_block_other_requests(self):
+        """Test that /status is answered while more /events streams are open than the stream pool has threads."""
+        self.app.config.update(EVENTS_POLL_INTERVAL=0.05, EVENTS_MAX_DURATION=1)
+        asgi = GameASGIApp(self.app, threads=2, stream_threads=2)
+        _, headers, _ = call(asgi, 'POST', '/start', {'opponent_type': 'A'})
+        cookie = session_cookie(headers)
+
+        async def scenario():
+            streams = [asyncio.ensure_future(request(asgi, 'GET', '/events', cookie=cookie)) for _ in range(4)]
+            await asyncio.sleep(0.1)
+            started = time.monotonic()
+            status, _, _ = await request(asgi, 'GET', '/status', cookie=cookie)
+            polled_in = time.monotonic() - started
+            finished = sum(stream.done() for stream in streams)
+            await asyncio.gather(*streams)
+            return status, polled_in, finished
+
+        status, polled_in, finished = asyncio.run(scenario())
+        self.assertEqual((status, finished), (200, 0))
+        self.assertLess(polled_in, 0.5)
+
+    def test_slow_moves_do_not_block_other_requests(self):
+        """Test that a request busy with game work does not hold up the requests of other clients."""
+        _, headers, data = call(self.asgi, 'POST', '/games', {'opponent_type': 'A'})
+        cookie, game_id = session_cookie(headers), data['game_id']
+        play_turn = Game.play_turn
+
+        def slow_play_turn(game, *args, **kwargs):
+            time.sleep(0.5)
+            return play_turn(game, *args, **kwargs)
+
+        async def scenario():
+            with mock.patch.object(Game, 'play_turn', slow_play_turn):
+                move = asyncio.ensure_future(request(self.asgi, 'POST', f'/games/{game_id}/play_turn',
+                                                     {'action': 'play_all'}, cookie))
+                await asyncio.sleep(0.05)
+                started = time.monotonic()
+                status, _, _ = await request(self.asgi, 'GET', f'/games/{game_id}/status', cookie=cookie)
+                polled_in = time.monotonic() - started
+                self.assertEqual((await move)[0], 200)
+            return status, polled_in
+
+        status, polled_in = asyncio.run(scenario())
+        self.assertEqual(status, 200)
+        self.assertLess(polled_in, 0.4)
+
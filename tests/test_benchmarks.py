@@ -0,0 +1,82 @@
+import asyncio
+import copy
+
+from benchmarks import bench_game
+from benchmarks.bench_polling import poll
+from benchmarks.bench_http import InProcessClient, compare, run
+from tests.base import BaseTestCase
+
+
+class TestHttpBenchmark(BaseTestCase):
+
+    def test_plays_complete_games(self):
+        """Test that the load test plays games through every endpoint without errors."""
+        report = run(lambda: InProcessClient(self.app), games=3, clients=2, seed=1, max_rounds=100)
+        self.assertEqual((report['games'], report['errors']), (3, 0))
+        for key in ('POST /start', 'POST /play_turn', 'GET /status', 'play_turn:attack', 'play_turn:end_turn'):
+            self.assertIn(key, report['endpoints'])
+        self.assertLessEqual(report['endpoints']['GET /status']['p50_ms'],
+                             report['endpoints']['GET /status']['p99_ms'])
+
+    def test_compare_flags_regressions(self):
+        """Test that slower percentiles and lower throughput are reported as regressions."""
+        baseline = {'throughput_rps': 100.0, 'endpoints': {'GET /status': {'p50_ms': 1.0, 'p95_ms': 2.0, 'p99_ms': 3.0}}}
+        self.assertEqual(compare(baseline, baseline, 0.2), [])
+        report = copy.deepcopy(baseline)
+        report['throughput_rps'] = 70.0
+        report['endpoints']['GET /status']['p95_ms'] = 2.5
+        self.assertEqual(len(compare(report, baseline, 0.2)), 2)
+
+
+class TestGameBenchmark(BaseTestCase):
+
+    def test_positions_grow_with_the_stage(self):
+        """Test that later positions hold more cards and still have a market to buy from."""
+        sizes = [sum(bench_game.pile_sizes(bench_game.build_position(rounds)).values())
+                 for rounds in bench_game.STAGES.values()]
+        self.assertEqual(sizes, sorted(sizes))
+        self.assertLess(sizes[0], sizes[-1])
+        self.assertTrue(bench_game.build_position(bench_game.STAGES['late'])['central']['active'])
+
+    def test_every_primitive_runs_on_every_stage(self):
+        """Test that each benchmark reports time and allocations on each position."""
+        report = bench_game.run(number=2, repeat=1)
+        for stage in bench_game.STAGES:
+            results = report['stages'][stage]['results']
+            self.assertEqual(set(results), set(bench_game.BENCHMARKS))
+            self.assertGreater(results['end_turn']['alloc_peak_bytes'], 0)
+        self.assertEqual(bench_game.compare(report, report, 0.0), [])
+
+
+class TestPollingBenchmark(BaseTestCase):
+
+    def test_clients_poll_over_kept_alive_connections(self):
+        """Test that every client starts a game and its polls are counted and timed."""
+        connections = []
+
+        async def handle(reader, writer):
+            connections.append(writer)
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except asyncio.IncompleteReadError:
+                    break
+                length = int(next((line.split(b':')[1] for line in head.split(b'\r\n')
+                                   if line.lower().startswith(b'content-length')), 0))
+                await reader.readexactly(length)
+                cookie = b'Set-Cookie: session=abc; Path=/\r\n' if head.startswith(b'POST') else b''
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n' + cookie + b'\r\n{}')
+            writer.close()
+
+        async def scenario():
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                return await poll(f'http://127.0.0.1:{port}', clients=4, interval=0.05, duration=0.3,
+                                  ramp=0.05, timeout=2)
+
+        report = asyncio.run(scenario())
+        self.assertEqual((report['clients_started'], report['failures']), (4, {}))
+        self.assertEqual(len(connections), 4)
+        self.assertGreater(report['answered_rps'], 0)
+        self.assertLessEqual(report['p50_ms'], report['max_ms'])
@@ -0,0 +1,71 @@
+import struct
+
+from app.models.game import Game
+from app.storage import codec
+from app.storage.base import decode_snapshot, encode_snapshot, encode_state
+from tests.base import BaseTestCase
+
+
+class TestCodec(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.game = Game(seed=3)
+        self.game.start()
+
+    def play_a_round(self):
+        for action in ('P', 'A', 'E'):
+            self.game.play_turn(action)
+
+    def test_round_trip(self):
+        """Test that a state decodes to exactly the dict it was encoded from."""
+        for _ in range(3):
+            state = self.game.get_state()
+            self.assertEqual(codec.decode(codec.encode(state)), state)
+            self.play_a_round()
+
+    def test_binary_is_smaller_than_json(self):
+        """Test that the binary payload is much smaller than the JSON one."""
+        state = self.game.get_state()
+        self.assertLess(len(codec.encode(state)) * 3, len(encode_state(state)))
+
+    def test_rng_state_round_trip(self):
+        """Test that a game restored with its RNG state shuffles exactly like the original."""
+        state = codec.decode(codec.encode(self.game.get_state(include_rng=True)))
+        restored = Game.from_state(state)
+        for _ in range(4):
+            self.play_a_round()
+            restored.play_turn('P')
+            restored.play_turn('A')
+            restored.play_turn('E')
+        self.assertEqual(restored.get_state(), self.game.get_state())
+
+    def test_negative_values(self):
+        """Test that health below zero survives the round trip."""
+        state = self.game.get_state()
+        state['pO']['health'] = -4
+        self.assertEqual(codec.decode(codec.encode(state))['pO']['health'], -4)
+
+    def test_unencodable_states_fall_back_to_json(self):
+        """Test that legacy card dicts and unknown fields are stored as JSON instead."""
+        state = self.game.get_state()
+        state['pO']['hand'].append({'name': 'Custom', 'cost': 1, 'attack': 1, 'money': 1})
+        data = encode_snapshot(state)
+        self.assertFalse(codec.is_encoded(data))
+        self.assertEqual(decode_snapshot(data), state)
+        with self.assertRaises(ValueError):
+            codec.encode(dict(self.game.get_state(), extra=1))
+
+    def test_legacy_json_snapshots_are_read(self):
+        """Test that snapshots written as JSON by older versions still load."""
+        state = self.game.get_state()
+        self.assertEqual(decode_snapshot(encode_state(state)), state)
+        self.assertTrue(codec.is_encoded(encode_snapshot(state)))
+
+    def test_corrupt_payloads_are_rejected(self):
+        """Test that truncated payloads and unknown format versions raise ValueError."""
+        data = codec.encode(self.game.get_state())
+        with self.assertRaises(ValueError):
+            codec.decode(data[:-3])
+        with self.assertRaises(ValueError):
+            codec.decode(data[:3] + struct.pack('<B', codec.FORMAT_VERSION + 1) + data[4:])
@@ -0,0 +1,150 @@
+import asyncio
+import json
+from unittest import mock
+
+from app import create_app
+from app.asgi import GameASGIApp
+from app.config import TestingConfig
+from app.models.game import Game
+from app.services.game_events import GameNotifier
+from tests.base import BaseTestCase
+
+
+class EventsConfig(TestingConfig):
+    SESSION_TYPE = 'cookie'
+    EVENTS_POLL_INTERVAL = 0.05
+    EVENTS_MAX_DURATION = 0.5
+
+
+def parse_events(data):
+    """
+    Returns the (id, event, data) triples of a server-sent events stream, skipping comments.
+    """
+    events = []
+    for block in data.decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n') if line and not line.startswith(':'))
+        if fields:
+            events.append((fields.get('id'), fields.get('event'), json.loads(fields['data'])))
+    return events
+
+
+class TestStatusETag(BaseTestCase):
+
+    def test_unchanged_status_is_not_rebuilt(self):
+        """Test that a poll with the current ETag gets a 304 without restoring the game."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        response = self.client.get('/status')
+        etag = response.headers['ETag']
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+
+        with mock.patch.object(Game, 'from_state', side_effect=AssertionError("game restored")):
+            response = self.client.get('/status', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.headers['ETag'], etag)
+
+        self.client.post('/play_turn', json={'action': 'play_all'})
+        response = self.client.get('/status', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+
+class TestEventStream(BaseTestCase):
+
+    def create_app(self):
+        return create_app(EventsConfig)
+
+    def test_status_is_pushed_when_the_version_changes(self):
+        """Test that /events sends the status, then a new one after a turn, labelled with the version."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        response = self.client.get('/events')
+        self.assertTrue(response.content_type.startswith('text/event-stream'))
+        stream = iter(response.response)
+        first = parse_events(next(stream))
+        self.assertEqual([(event_id, name) for event_id, name, _ in first], [('0', 'status')])
+
+        self.client.post('/play_turn', json={'action': 'play_all'})
+        second = parse_events(next(stream))
+        self.assertEqual(second[0][0], '1')
+        self.assertEqual(second[0][2]['current_status']['player']['hand'], [])
+        self.assertEqual(parse_events(b''.join(stream)), [])
+
+    def test_reconnecting_client_is_not_sent_the_same_version(self):
+        """Test that a stream resumed with the current Last-Event-ID waits for the next change."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        response = self.client.get('/events', headers={'Last-Event-ID': '0'})
+        self.assertEqual(parse_events(response.data), [])
+
+    def test_stream_ends_when_the_game_is_replaced(self):
+        """Test that the stream of a game tells its client when a new game replaces it."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        stream = iter(self.client.get('/events').response)
+        next(stream)
+        self.client.post('/start', json={'opponent_type': 'A'})
+        self.assertEqual([name for _, name, _ in parse_events(b''.join(stream))], ['end'])
+
+    def test_events_without_a_game(self):
+        """Test that /events answers 400 when no game was started."""
+        self.assertEqual(self.client.get('/events').status_code, 400)
+
+
+class TestNotifier(BaseTestCase):
+
+    def test_subscribers_are_woken_and_removed(self):
+        """Test that publishing sets the events of the game's subscribers only."""
+        notifier = GameNotifier()
+        with notifier.subscribe('a') as changed_a, notifier.subscribe('b') as changed_b:
+            notifier.publish('a')
+            self.assertTrue(changed_a.is_set())
+            self.assertFalse(changed_b.is_set())
+        self.assertEqual(notifier.subscriber_count('a'), 0)
+
+
+class TestAsgiEvents(BaseTestCase):
+
+    def create_app(self):
+        return create_app(EventsConfig)
+
+    def test_etag_and_event_stream(self):
+        """Test the ETag of /status and the pushed updates of /events on the ASGI application."""
+        asgi = GameASGIApp(self.app)
+
+        async def request(method, path, body=None, headers=()):
+            messages = [{'type': 'http.request', 'body': json.dumps(body).encode() if body is not None else b''}]
+            sent = []
+
+            async def receive():
+                if messages:
+                    return messages.pop(0)
+                await asyncio.sleep(3600)
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {'type': 'http', 'method': method, 'path': path,
+                     'headers': [(b'content-type', b'application/json')] +
+                                [(name.encode(), value.encode()) for name, value in headers]}
+            await asyncio.wait_for(asgi(scope, receive, send), 5)
+            response_headers = {name.decode(): value.decode() for name, value in sent[0]['headers']}
+            return sent[0]['status'], response_headers, b''.join(message.get('body', b'') for message in sent[1:])
+
+        async def scenario():
+            _, headers, _ = await request('POST', '/start', {'opponent_type': 'A'})
+            cookie = ('cookie', headers['set-cookie'].split(';', 1)[0])
+            _, headers, _ = await request('GET', '/status', headers=[cookie])
+            status, _, body = await request('GET', '/status', headers=[cookie, ('if-none-match', headers['etag'])])
+            self.assertEqual((status, body), (304, b''))
+
+            async def play_later():
+                await asyncio.sleep(0.1)
+                await request('POST', '/play_turn', {'action': 'play_all'}, [cookie])
+
+            player = asyncio.ensure_future(play_later())
+            _, headers, body = await request('GET', '/events', headers=[cookie])
+            await player
+            return headers, body
+
+        headers, body = asyncio.run(scenario())
+        self.assertEqual(headers['content-type'].split(';')[0], 'text/event-stream')
+        self.assertEqual([(event_id, name) for event_id, name, _ in parse_events(body)],
+                         [('0', 'status'), ('1', 'status')])
@@ -1,9 +1,16 @@
+import logging
+
 from app.models.game import Game
 from app.utils.exceptions import (InsufficientMoneyError,
                                   InsufficientSupplementError,
                                   InvalidCardIndexError)
 from tests.base import BaseTestCase
 from app.models.card import Card
+from app.models.catalog import SERF, get_card
+from app.models.policies import ACQUISITIVE, AGGRESSIVE, COST, POLICIES, Policy, get_policy, register_policy
+from app.simulation.lookahead import ExpertPolicy
+from app.storage.base import apply_delta
+from app.utils.game_logger import game_log
 from unittest.mock import patch
 
 class TestGame(BaseTestCase):
@@ -141,3 +148,190 @@ class TestGame(BaseTestCase):
         new_game.set_state(state)
         self.assertEqual(self.game.pO['health'], new_game.pO['health'])
         self.assertEqual(self.game.pC['health'], new_game.pC['health'])
+
+    def test_get_state_stores_card_ids(self):
+        """Test that piles are serialized as compact catalog card IDs."""
+        state = self.game.get_state()
+        self.assertTrue(all(isinstance(card_id, int) for card_id in state['pO']['hand']))
+        self.assertTrue(all(isinstance(card_id, int) for card_id in state['central']['active']))
+        self.assertEqual(state['central']['activeSize'], 5)
+
+    def test_set_state_reuses_catalog_cards(self):
+        """Test that restored cards are the interned catalog instances."""
+        new_game = Game()
+        new_game.set_state(self.game.get_state())
+        for restored, original in zip(new_game.pO['hand'], self.game.pO['hand']):
+            self.assertIs(restored, get_card(original.card_id))
+
+    def test_set_state_accepts_legacy_card_dicts(self):
+        """Test that states with full card dictionaries can still be loaded."""
+        state = self.game.get_state()
+        state['pO']['hand'] = [card.to_dict() for card in self.game.pO['hand']]
+        del state['central']['activeSize']
+        new_game = Game()
+        new_game.set_state(state)
+        self.assertEqual([card.name for card in new_game.pO['hand']], [card.name for card in self.game.pO['hand']])
+        self.assertEqual(new_game.central['activeSize'], 5)
+
+    def test_legacy_card_dicts_are_played(self):
+        """Test that a state stored with card dictionaries restores catalog cards and plays an end_turn."""
+        state = self.game.get_state()
+        for side, piles in (('central', ('deck', 'active', 'supplement')),
+                            ('pO', ('deck', 'hand', 'active', 'discard')), ('pC', ('deck', 'hand', 'active', 'discard'))):
+            for pile in piles:
+                state[side][pile] = [get_card(card_id).to_dict() for card_id in state[side][pile]]
+        for opponent in ('aggressive', 'random', 'expert'):
+            state['opponent'] = opponent
+            game = Game.from_state(state)
+            self.assertIs(game.pO['hand'][0], get_card(game.pO['hand'][0].card_id))
+            game.play_turn('P')
+            game.play_turn('E')
+            self.assertEqual(game.version, state['version'] + 2)
+
+    def test_cards_outside_catalog_are_bought(self):
+        """Test that the computer buys by card fields when the market holds a card outside the catalog."""
+        self.game.central['active'][0] = Card("TestCard", 5, 9, 0)
+        self.game.pC['hand'] = [get_card(SERF)] * 5
+        self.game.play_turn('E')
+        self.assertIn("TestCard", [card.name for card in self.game.pC['discard']])
+
+    def test_get_state_keeps_cards_outside_catalog(self):
+        """Test that cards without a catalog ID survive a state round trip."""
+        self.game.pO['discard'] = [Card("TestCard", 1, 1, 1)]
+        new_game = Game()
+        new_game.set_state(self.game.get_state())
+        self.assertEqual(new_game.pO['discard'][0].to_dict(), {'name': 'TestCard', 'cost': 1, 'attack': 1, 'money': 1})
+
+    def test_from_state(self):
+        """Test restoring a game without setting up a new one."""
+        with patch('app.models.game.random.Random') as rng:
+            restored = Game.from_state(self.game.get_state())
+        rng.assert_not_called()
+        self.assertEqual(restored.get_state(), self.game.get_state())
+        self.assertEqual(restored.get_status(), self.game.get_status())
+
+    def test_end_turn_does_not_format_when_logging_disabled(self):
+        """Test that game events are not rendered when the event logger is off."""
+        self.addCleanup(game_log.logger.setLevel, game_log.logger.level)
+        game_log.logger.setLevel(logging.WARNING)
+        with patch('app.utils.game_logger._render') as render:
+            self.game.play_turn("P")
+            self.game.play_turn("E")
+        render.assert_not_called()
+
+    def test_end_turn_logs_events_when_enabled(self):
+        """Test that game events are recorded when the event logger is at INFO."""
+        with self.assertLogs(game_log.logger, level='INFO') as logs:
+            self.game.play_turn("E")
+        self.assertTrue(any('computer_turn_ended' in line for line in logs.output))
+
+    def test_get_delta_only_contains_changed_fields(self):
+        """Test that a delta after playing all cards only holds the player's changed fields."""
+        self.game.dirty.clear()
+        self.game.play_turn("P")
+        delta = self.game.get_delta()
+        self.assertEqual(set(delta), {'version', 'pO'})
+        self.assertEqual(set(delta['pO']), {'hand', 'active', 'money', 'attack'})
+
+    def test_apply_delta_reproduces_state(self):
+        """Test that applying each action's delta to the previous state gives the new state."""
+        self.game.pO['money'] = 10
+        for action, card_index in [("P", None), ("B", 0), ("A", None), ("E", None), ("C", 1)]:
+            restored = Game.from_state(self.game.get_state())
+            before = restored.get_state()
+            restored.play_turn(action, card_index)
+            self.assertEqual(apply_delta(before, restored.get_delta()), restored.get_state())
+            self.game = restored
+
+    def test_failed_action_does_not_mark_state_dirty(self):
+        """Test that an action rejected by the rules leaves no changes to persist."""
+        restored = Game.from_state(self.game.get_state())
+        with self.assertRaises(InsufficientMoneyError):
+            restored.play_turn("B", 0)
+        self.assertEqual(restored.dirty, set())
+
+    def test_same_seed_gives_same_game(self):
+        """Test that seeded games deal and reshuffle identically."""
+        first, second = Game(seed=123), Game(seed=123)
+        for game in (first, second):
+            game.start()
+            for _ in range(3):
+                game.play_turn("P")
+                game.play_turn("E")
+        self.assertEqual(first.get_state(), second.get_state())
+
+    def test_opponent_is_chosen_by_policy_name(self):
+        """Test that the opponent type selects a registered policy and survives a save and restore."""
+        self.assertIs(Game("Q").opponent, ACQUISITIVE)
+        self.assertIs(Game("unknown").opponent, ACQUISITIVE)
+        game = Game("random", seed=1)
+        game.start()
+        state = game.get_state()
+        self.assertEqual(state['opponent'], 'random')
+        self.assertNotIn('opponent', self.game.get_state())
+        self.assertIs(Game.from_state(state).opponent, get_policy('random'))
+        self.assertIs(Game.from_state(self.game.get_state()).opponent, AGGRESSIVE)
+
+    def test_computer_buys_with_its_policy(self):
+        """Test that the computer buys what its policy chooses, shown catalog IDs it cannot modify."""
+        class FirstCardPolicy(Policy):
+            name = 'first_card'
+            seen = []
+
+            def choose(self, market, supplement, money, rng):
+                self.seen.append((tuple(market), money))
+                return 0 if market and COST[market[0]] <= money else None
+
+        register_policy(FirstCardPolicy())
+        try:
+            game = Game("first_card", seed=2)
+            game.start()
+            game.pC['hand'] = [get_card(SERF)] * 5
+            first = game.central['active'][0]
+            game.play_turn("E")
+        finally:
+            del POLICIES['first_card']
+        self.assertEqual(FirstCardPolicy.seen[0][1], 5)
+        self.assertEqual(FirstCardPolicy.seen[0][0][0], first.card_id)
+        self.assertIn(first, game.pC['discard'])
+        self.assertEqual([card.card_id for card in game.central['active']],
+                         list(FirstCardPolicy.seen[-1][0]))
+
+    def test_record_replays_the_game(self):
+        """Test that a game rebuilt from its seed and log is identical, down to its next shuffles."""
+        for opponent in ('A', 'random'):
+            game = Game(opponent, seed=7)
+            game.start()
+            for _ in range(6):
+                game.play_turn("P")
+                if game.central['active'] and game.pO['money'] >= game.central['active'][0].cost:
+                    game.play_turn("B", 0)
+                game.play_turn("A")
+                game.play_turn("E")
+            record = game.get_record()
+            self.assertEqual(len(record['log']), game.version)
+            self.assertTrue(any(entry.startswith('E ') for entry in record['log']))
+            replayed = Game.from_record(record)
+            self.assertEqual(replayed.get_state(include_rng=True), game.get_state(include_rng=True))
+            self.assertEqual(replayed.log, game.log)
+            self.assertEqual(replayed.dirty, set())
+
+    def test_replay_does_not_ask_the_policy_again(self):
+        """Test that logged purchases are replayed without deciding them again."""
+        game = Game(ExpertPolicy(budget=0.001, max_rollouts=20), seed=3)
+        game.start()
+        for _ in range(3):
+            game.play_turn("P")
+            game.play_turn("E")
+        with patch('app.simulation.lookahead.ExpertPolicy.choose_in_game', side_effect=AssertionError("decided")):
+            replayed = Game.from_record(game.get_record())
+        self.assertEqual(replayed.get_state(include_rng=True), game.get_state(include_rng=True))
+
+    def test_restored_games_cannot_be_replayed(self):
+        """Test that a game restored from its state has no record."""
+        self.game.play_turn("P")
+        restored = Game.from_state(self.game.get_state())
+        self.assertFalse(restored.replayable)
+        with self.assertRaises(ValueError):
+            restored.get_record()
+        self.assertEqual(Game.from_state(self.game.get_record()).get_state(), self.game.get_state())
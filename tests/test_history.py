@@ -0,0 +1,164 @@
+import asyncio
+import json
+import time
+
+from app import create_app
+from app.asgi import GameASGIApp
+from app.config import TestingConfig
+from app.models.game import Game
+from app.services import game_service
+from app.services.game_history import GameHistory
+from app.storage.history_store import HistoryStore
+from tests.base import BaseTestCase
+
+
+class HistoryConfig(TestingConfig):
+    SESSION_TYPE = 'cookie'
+
+
+class NoHistoryConfig(HistoryConfig):
+    HISTORY_ENABLED = False
+
+
+def finished_row(game_id, opponent='aggressive', winner='player', turns=10, health=20):
+    return (game_id, opponent, winner, turns, health, 0, 5, 4, time.time())
+
+
+class TestHistoryStore(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.store = HistoryStore(':memory:')
+
+    def tearDown(self):
+        super().tearDown()
+        self.store.close()
+
+    def test_summary_counts_each_game_once(self):
+        """Test that the per-opponent summary counts inserted games and skips games already stored."""
+        rows = [finished_row('a'), finished_row('b', winner='opponent'), finished_row('c', winner='draw'),
+                finished_row('d', opponent='random')]
+        self.assertEqual(self.store.insert(rows), 4)
+        self.assertEqual(self.store.insert([finished_row('a'), finished_row('e')]), 1)
+        self.assertEqual(self.store.opponent_summary(), [
+            {'opponent': 'aggressive', 'games': 4, 'player_wins': 2, 'opponent_wins': 1, 'draws': 1},
+            {'opponent': 'random', 'games': 1, 'player_wins': 1, 'opponent_wins': 0, 'draws': 0},
+        ])
+
+    def test_fastest_wins_are_read_in_index_order(self):
+        """Test that the fastest wins skip losses and unknown turns, and are read from the index without sorting."""
+        self.store.insert([finished_row('slow', turns=30), finished_row('fast', turns=8, health=3),
+                           finished_row('fast_healthy', turns=8, health=25), finished_row('unknown', turns=None),
+                           finished_row('lost', winner='opponent', turns=2)])
+        self.assertEqual([(win['turns'], win['health']) for win in self.store.fastest_wins(2)], [(8, 25), (8, 3)])
+        self.assertEqual(len(self.store.fastest_wins(10)), 3)
+        plan = ' '.join(str(row) for row in self.store._conn.execute(
+            'EXPLAIN QUERY PLAN SELECT opponent FROM game_history WHERE winner = \'player\' AND turns IS NOT NULL'
+            ' ORDER BY turns, player_health DESC LIMIT 10'))
+        self.assertIn('game_history_wins', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class TestHistoryRow(BaseTestCase):
+
+    def test_only_ended_games_have_a_row(self):
+        """Test that a running game has no row, and an ended one its winner, turns, health and purchases."""
+        game = Game('A', seed=4)
+        game.start()
+        for action in ('P', 'E', 'P'):
+            game.play_turn(action)
+        self.assertIsNone(game_service.history_row('g', game))
+        game.pC['health'] = 0
+        game.pO['discard'].append(game.central['supplement'][0])
+        game_id, opponent, winner, turns, player_health, opponent_health, bought, _, _ = \
+            game_service.history_row('g', game)
+        self.assertEqual((game_id, opponent, winner, turns), ('g', 'aggressive', 'player', 1))
+        self.assertEqual((player_health, opponent_health, bought), (game.pO['health'], 0, 1))
+
+        game.pC['health'] = game.pO['health'] = 10
+        game.central['activeSize'] = 0
+        self.assertEqual(game_service.history_row('g', game)[2], 'draw')
+        self.assertIsNone(game_service.history_row('g', Game.from_state(game.get_state()))[3])
+
+
+class TestGameHistory(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.history = GameHistory(HistoryStore(':memory:'), batch_size=3, flush_interval=60, refresh_interval=60)
+
+    def tearDown(self):
+        super().tearDown()
+        self.history.close()
+
+    def test_games_are_written_in_batches(self):
+        """Test that recorded games are only written once a batch is full, by the writer thread."""
+        self.history.record(finished_row('a'))
+        self.history.record(finished_row('b'))
+        time.sleep(0.05)
+        self.assertEqual(self.history.store.opponent_summary(), [])
+        self.history.record(finished_row('c'))
+        deadline = time.monotonic() + 5
+        while not self.history.store.opponent_summary() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.history.store.opponent_summary()[0]['games'], 3)
+
+    def test_leaderboard_is_refreshed_periodically(self):
+        """Test that the leaderboard is served as built until the refresh interval elapses."""
+        self.history.record(finished_row('a'))
+        self.history.flush()
+        leaderboard = json.loads(self.history.leaderboard())
+        self.assertEqual(leaderboard['opponents'][0]['win_rate'], 1.0)
+        self.history.record(finished_row('b', winner='opponent'))
+        self.history.flush()
+        self.assertEqual(json.loads(self.history.leaderboard()), leaderboard)
+        self.history.refresh_interval = 0
+        self.assertEqual(json.loads(self.history.leaderboard())['opponents'][0]['win_rate'], 0.5)
+
+
+class TestLeaderboardRoutes(BaseTestCase):
+
+    def create_app(self):
+        return create_app(HistoryConfig)
+
+    def end_game(self):
+        game_id = self.client.post('/games', json={'opponent_type': 'A'}).get_json()['game_id']
+
+        def win(game):
+            game.pC['health'] = 0
+            game.play_turn('P')
+
+        self.app.extensions['game_registry'].update(game_id, win)
+        self.app.extensions['game_history'].flush()
+
+    def test_finished_games_are_on_the_leaderboard(self):
+        """Test that a game ended by a move is recorded and listed by /leaderboard."""
+        self.assertEqual(self.client.get('/leaderboard').get_json()['opponents'], [])
+        self.end_game()
+        self.app.extensions['game_history'].refresh_interval = 0
+        leaderboard = self.client.get('/leaderboard').get_json()
+        self.assertEqual([(entry['opponent'], entry['games'], entry['player_wins']) for entry in
+                          leaderboard['opponents']], [('aggressive', 1, 1)])
+        self.assertEqual(leaderboard['fastest_wins'][0]['turns'], 0)
+
+    def test_leaderboard_over_asgi(self):
+        """Test that the ASGI application serves the same leaderboard, and 404 without a history."""
+        self.end_game()
+        expected = self.client.get('/leaderboard').get_json()
+        messages, sent = [{'type': 'http.request', 'body': b''}], []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.sleep(3600)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/leaderboard', 'headers': []}
+        asyncio.run(GameASGIApp(self.app)(scope, receive, send))
+        self.assertEqual((sent[0]['status'], json.loads(sent[1]['body'])), (200, expected))
+
+        app = create_app(NoHistoryConfig)
+        self.assertIsNone(app.extensions['game_registry'].history)
+        self.assertEqual(app.test_client().get('/leaderboard').status_code, 404)
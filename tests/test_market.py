@@ -0,0 +1,85 @@
+import random
+from unittest.mock import patch
+
+from app.models.catalog import ARCHER, ATTACK, BAKER, COST, CROSSBOWMAN, LEVY, SWORDSMAN, TAILOR, THUG, get_card
+from app.models.game import Game
+from app.models.market import MarketIndex
+from app.models.policies import ACQUISITIVE, AGGRESSIVE, RandomPolicy
+from tests.base import BaseTestCase
+
+ATTACK_RANK = tuple(zip(COST, ATTACK))
+
+
+class TestMarketIndex(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.market = [THUG, BAKER, ARCHER, SWORDSMAN, CROSSBOWMAN]
+
+    def test_best_affordable_card(self):
+        """Test that the most expensive affordable card is preferred, then the tie-break stat."""
+        market = MarketIndex(self.market, ATTACK_RANK)
+        self.assertEqual(market.best(2), 2)
+        self.assertEqual(market.best(1), 0)
+        self.assertIsNone(market.best(0))
+        self.assertEqual(MarketIndex(self.market, ACQUISITIVE.rank).best(2), 1)
+
+    def test_earliest_card_wins_a_full_tie(self):
+        """Test that identical preferences go to the card that entered the market first."""
+        market = MarketIndex(self.market, ATTACK_RANK)
+        self.assertEqual(market.best(3), 3)
+        market.pop(3)
+        market.append(SWORDSMAN)
+        self.assertEqual(market[market.best(3)], CROSSBOWMAN)
+
+    def test_pop_and_append_keep_the_list_in_sync(self):
+        """Test that the wrapped market list is updated with the index, and read through it."""
+        market = MarketIndex(self.market, ACQUISITIVE.rank)
+        self.assertEqual(market.pop(1), BAKER)
+        market.append(TAILOR)
+        self.assertEqual(self.market, [THUG, ARCHER, SWORDSMAN, CROSSBOWMAN, TAILOR])
+        self.assertEqual(list(market), self.market)
+        self.assertEqual((market.best(5), len(market), market[:2]), (4, 5, [THUG, ARCHER]))
+
+    def test_matches_a_linear_scan(self):
+        """Test that lookups agree with scanning the market in order on a large random market."""
+        rng = random.Random(5)
+        rank = [(rng.randint(0, 8), rng.randint(0, 3)) for _ in range(400)]
+        market = list(range(200))
+        index = MarketIndex(market, rank)
+        for card_id in range(200, 400):
+            money = rng.randint(0, 9)
+            expected = None
+            for position, candidate in enumerate(market):
+                if rank[candidate][0] <= money and (expected is None or rank[candidate] > rank[market[expected]]):
+                    expected = position
+            self.assertEqual(index.best(money), expected)
+            if market:
+                index.pop(rng.randrange(len(market)))
+            if rng.random() < 0.5:
+                index.append(card_id)
+
+
+class TestGreedyPolicyIndex(BaseTestCase):
+
+    def test_decisions_match_the_scan(self):
+        """Test that the greedy policies decide the same on the index as on the plain market, supplement ties included."""
+        rng = random.Random(3)
+        cards = [THUG, BAKER, ARCHER, SWORDSMAN, CROSSBOWMAN, TAILOR, LEVY]
+        for policy in (AGGRESSIVE, ACQUISITIVE):
+            for _ in range(200):
+                market = [rng.choice(cards) for _ in range(rng.randint(0, 6))]
+                supplement = [LEVY] * rng.randint(0, 2)
+                money = rng.randint(0, 7)
+                self.assertEqual(policy.choose_in_game(None, policy.market_view(market[:]), supplement, money),
+                                 policy.choose(market, supplement, money, None))
+
+    def test_game_purchases_go_through_the_index(self):
+        """Test that the computer's purchases in a game are looked up in the index, and other policies get the list."""
+        game = Game('A', seed=2)
+        game.start()
+        game.pC['hand'] = [get_card(TAILOR)] * 5
+        with patch.object(MarketIndex, 'best', autospec=True, side_effect=MarketIndex.best) as best:
+            game.play_turn('E')
+        self.assertTrue(best.called)
+        self.assertIs(RandomPolicy().market_view(game.central['active']), game.central['active'])
@@ -0,0 +1,127 @@
+from unittest import mock
+
+from app.models.game import Game
+from app.models.policies import HUMAN
+from app.utils.exceptions import NotYourTurnError, StaleStateError
+from tests.base import BaseTestCase
+
+
+class TestPlayerVersusPlayerGame(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.game = Game(HUMAN, seed=1)
+        self.game.start()
+
+    def test_game_waits_for_its_second_player(self):
+        """Test that nobody can play before the second player joins, and nobody can join twice."""
+        with self.assertRaises(NotYourTurnError):
+            self.game.play_turn('P', player='pO')
+        self.game.join()
+        self.assertEqual(self.game.turn, 'pO')
+        with self.assertRaises(ValueError):
+            self.game.join()
+        with self.assertRaises(ValueError):
+            Game('A').join()
+
+    def test_players_take_turns(self):
+        """Test that only the side whose turn it is can play, and that end_turn hands the turn over."""
+        self.game.join()
+        computer_hand = list(self.game.pC['hand'])
+        with self.assertRaises(NotYourTurnError):
+            self.game.play_turn('P', player='pC')
+        self.game.play_turn('P', player='pO')
+        self.game.play_turn('A', player='pO')
+        self.game.play_turn('E', player='pO')
+        self.assertEqual(self.game.turn, 'pC')
+        # No computer turn: the second player's hand is untouched.
+        self.assertEqual(self.game.pC['hand'], computer_hand)
+        self.assertLess(self.game.pC['health'], 30)
+
+        self.game.play_turn('P', player='pC')
+        self.assertEqual(self.game.pC['hand'], [])
+        self.game.play_turn('E', player='pC')
+        self.assertEqual(self.game.turn, 'pO')
+
+    def test_turn_is_stored(self):
+        """Test that the opponent and the turn survive a state round trip and a delta."""
+        restored = Game.from_state(self.game.get_state())
+        self.assertTrue(restored.pvp)
+        self.assertIsNone(restored.turn)
+        restored.join()
+        restored.play_turn('E', player='pO')
+        self.assertEqual(restored.get_delta()['turn'], 'pC')
+        self.assertEqual(Game.from_state(restored.get_state()).turn, 'pC')
+        self.assertNotIn('turn', Game('A').get_state())
+
+    def test_status_is_seen_from_each_side(self):
+        """Test that each side sees itself as the player, the opponent's hand hidden, and actions on its turn only."""
+        self.game.join()
+        first, second = self.game.get_status('pO'), self.game.get_status('pC')
+        self.assertEqual([card['name'] for card in second['player']['hand']],
+                         [card.name for card in self.game.pC['hand']])
+        self.assertEqual(first['opponent']['hand'], 5)
+        self.assertEqual((first['turn'], second['turn']), ('yours', 'opponent'))
+        self.assertTrue(first['next_action'])
+        self.assertEqual(second['next_action'], [])
+
+
+class TestMatchRoutes(BaseTestCase):
+
+    def match(self, client):
+        response = client.post('/match', json={})
+        return response.status_code, response.get_json()
+
+    def test_players_are_paired(self):
+        """Test that the first player waits and the second one joins the first player's game."""
+        with self.app.test_client() as second:
+            status, first_body = self.match(self.client)
+            self.assertEqual((status, first_body['seat'], first_body['game_status']), (202, 'first', 'waiting'))
+            status, second_body = self.match(second)
+            self.assertEqual((status, second_body['seat']), (200, 'second'))
+            game_id = first_body['game_id']
+            self.assertEqual(second_body['game_id'], game_id)
+            self.assertEqual(second_body['message'], "It is your opponent's turn")
+
+            # The first player learns of the match from the game's status, or by asking again.
+            self.assertEqual(self.client.get(f'/games/{game_id}/status').get_json()['message'], 'It is your turn')
+            self.assertEqual(self.match(self.client)[0], 200)
+            self.assertEqual([game['seat'] for game in second.get('/games').get_json()['games']], ['second'])
+
+    def test_only_the_player_whose_turn_it_is_can_play(self):
+        """Test that /play_turn and /play_turns answer 403 to the player whose turn it is not."""
+        with self.app.test_client() as second:
+            game_id = self.match(self.client)[1]['game_id']
+            self.match(second)
+
+            response = second.post(f'/games/{game_id}/play_turn', json={'action': 'play_all'})
+            self.assertEqual(response.status_code, 403)
+            self.assertEqual(response.get_json()['error'], "It is not your turn.")
+            response = self.client.post(f'/games/{game_id}/play_turns', json={'actions': ['P', 'A', 'E', 'P']})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual((response.get_json()['steps_applied'], response.get_json()['failed_step']), (3, 3))
+
+            response = second.post(f'/games/{game_id}/play_turns', json={'actions': ['P', 'A']})
+            self.assertEqual(response.status_code, 200)
+            status = response.get_json()['current_status']
+            self.assertEqual(status['opponent']['health'], 30 - sum(card['attack'] for card in status['player']['active']))
+
+    def test_a_waiting_player_is_not_paired_with_itself(self):
+        """Test that asking again while waiting keeps the same game and ticket."""
+        status, body = self.match(self.client)
+        self.assertEqual(self.match(self.client), (status, body))
+        self.assertEqual(len(self.client.get('/games').get_json()['games']), 1)
+
+    def test_deleted_and_joined_games_are_skipped(self):
+        """Test that tickets of games that were deleted or joined meanwhile are passed over."""
+        with self.app.test_client() as second, self.app.test_client() as third:
+            deleted_id = self.match(self.client)[1]['game_id']
+            self.client.delete(f'/games/{deleted_id}')
+            waiting_id = self.match(second)[1]['game_id']
+            registry = self.app.extensions['game_registry']
+            with mock.patch.object(registry, 'update', side_effect=StaleStateError("joined")):
+                status, body = self.match(third)
+            self.assertEqual(status, 202)
+            self.assertNotEqual(body['game_id'], waiting_id)
+            status, joined = self.match(self.client)
+            self.assertEqual((status, joined['game_id']), (200, body['game_id']))
@@ -0,0 +1,88 @@
+import json
+import os
+import shutil
+import tempfile
+
+from app import create_app
+from app.config import TestingConfig
+from app.utils.metrics import PHASE_METRIC, Histogram, Metrics, metrics
+from tests.base import BaseTestCase
+
+
+class MetricsConfig(TestingConfig):
+    METRICS_ENABLED = True
+    METRICS_DIR = None
+    # Restore games on every turn, like a worker that does not hold them in memory.
+    GAME_IDLE_TIMEOUT = 0
+
+
+class TestHistogram(BaseTestCase):
+
+    def test_observations_land_in_their_bucket(self):
+        """Test that each observation is counted in the first bucket whose bound it does not exceed."""
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.sum, 3.65)
+
+    def test_disabled_metrics_record_nothing(self):
+        """Test that timers are no-ops while metrics are disabled."""
+        registry = Metrics()
+        with registry.time('play_turn'):
+            pass
+        self.assertIs(registry.time('play_turn'), registry.time('get_status'))
+        self.assertEqual(registry.collect(), {})
+
+    def test_workers_are_aggregated(self):
+        """Test that the snapshots written by other workers are merged into the totals."""
+        directory = tempfile.mkdtemp()
+        try:
+            registry = Metrics()
+            registry.configure(enabled=True, directory=directory)
+            with registry.time('play_turn'):
+                pass
+            other = Histogram()
+            other.observe(0.002)
+            with open(os.path.join(directory, '999999.json'), 'w') as f:
+                json.dump({'histograms': [{'name': PHASE_METRIC, 'labels': {'phase': 'play_turn'},
+                                           'counts': other.counts, 'sum': other.sum, 'count': 1}]}, f)
+            merged = registry.collect()
+            self.assertEqual(merged[(PHASE_METRIC, (('phase', 'play_turn'),))].count, 2)
+            self.assertIn(f'{os.getpid()}.json', os.listdir(directory))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestMetricsEndpoint(BaseTestCase):
+
+    def create_app(self):
+        return create_app(MetricsConfig)
+
+    def tearDown(self):
+        super().tearDown()
+        metrics.configure()
+        metrics.reset()
+
+    def test_phases_are_exposed(self):
+        """Test that a played turn shows up per phase and per endpoint in the Prometheus output."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        self.client.post('/play_turn', json={'action': 'play_all'})
+        self.client.post('/play_turn', json={'action': 'end_turn'})
+        self.client.get('/status')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        text = response.get_data(as_text=True)
+        self.assertIn(f'# TYPE {PHASE_METRIC} histogram', text)
+        for phase in ('session_load', 'set_state', 'play_turn', 'computer_buy', 'get_status', 'session_save'):
+            self.assertIn(f'{PHASE_METRIC}_count{{phase="{phase}"}}', text)
+        self.assertIn('flaskgame_request_duration_seconds_count{endpoint="/play_turn",method="POST"} 2', text)
+        self.assertIn(f'{PHASE_METRIC}_bucket{{phase="play_turn",le="+Inf"}} 2', text)
+
+    def test_endpoint_is_off_when_disabled(self):
+        """Test that /metrics answers 404 when instrumentation is disabled."""
+        metrics.configure(enabled=False)
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
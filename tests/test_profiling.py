@@ -0,0 +1,103 @@
+import cProfile
+import os
+import pstats
+import shutil
+import tempfile
+
+import merge_profiles
+from app import create_app
+from app.config import TestingConfig
+from app.utils.profiling import (PROFILE_ID_HEADER, RequestProfiler,
+                                 collapse_stats, profiler, read_collapsed)
+from tests.base import BaseTestCase
+
+
+class ProfilingConfig(TestingConfig):
+    PROFILE_ENABLED = True
+    PROFILE_DIR = '.test_flask_session/profiles'
+    PROFILE_MAX_FILES = 3
+
+
+def _leaf(n):
+    return sum(range(n))
+
+
+def _outer():
+    return _leaf(20000) + _leaf(20000)
+
+
+class TestCollapsedStacks(BaseTestCase):
+
+    def test_stacks_follow_the_call_graph(self):
+        """Test that the time of a callee is attributed to the stack going through its caller."""
+        profile = cProfile.Profile()
+        profile.enable()
+        _outer()
+        profile.disable()
+        stacks = collapse_stats(pstats.Stats(profile))
+        leaf_stacks = [stack for stack in stacks if stack.endswith('(_leaf);<built-in method builtins.sum>')]
+        self.assertEqual(len(leaf_stacks), 1)
+        self.assertIn('(_outer);', leaf_stacks[0])
+
+    def test_sampling_decision(self):
+        """Test that only enabled, listed endpoints are profiled, on the header or the sample rate."""
+        registry = RequestProfiler()
+        self.assertFalse(registry.should_profile('/play_turn', {'X-Profile': '1'}))
+        registry.configure(enabled=True)
+        self.assertTrue(registry.should_profile('/play_turn', {'X-Profile': '1'}))
+        self.assertFalse(registry.should_profile('/play_turn', {}))
+        self.assertFalse(registry.should_profile('/status', {'X-Profile': '1'}))
+        registry.configure(enabled=True, sample_rate=1.0)
+        self.assertTrue(registry.should_profile('/play_turn', {}))
+
+
+class TestRequestProfiling(BaseTestCase):
+
+    def create_app(self):
+        return create_app(ProfilingConfig)
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(ProfilingConfig.PROFILE_DIR, ignore_errors=True)
+        profiler.configure()
+
+    def test_requested_profile_is_written(self):
+        """Test that a /play_turn request with the header leaves a pstats and a collapsed stacks file."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        self.assertNotIn(PROFILE_ID_HEADER, self.client.post('/play_turn', json={'action': 'P'}).headers)
+
+        response = self.client.post('/play_turn', json={'action': 'E'}, headers={'X-Profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        profile_id = response.headers[PROFILE_ID_HEADER]
+        base = os.path.join(ProfilingConfig.PROFILE_DIR, profile_id)
+        self.assertTrue(profile_id.endswith('-play_turn-E'))
+        self.assertTrue(os.path.exists(base + '.pstats'))
+        stacks = read_collapsed(base + '.collapsed')
+        self.assertTrue(any('(play_turn)' in stack for stack in stacks))
+
+    def test_directory_is_bounded(self):
+        """Test that only the most recent PROFILE_MAX_FILES profiles are kept."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        for _ in range(5):
+            self.client.post('/play_turn', json={'action': 'P'}, headers={'X-Profile': '1'})
+        names = os.listdir(ProfilingConfig.PROFILE_DIR)
+        self.assertEqual(sum(name.endswith('.pstats') for name in names), 3)
+        self.assertEqual(sum(name.endswith('.collapsed') for name in names), 3)
+
+    def test_profiles_are_merged(self):
+        """Test that the merge CLI sums the stacks of all profiles into one file."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        for _ in range(2):
+            self.client.post('/play_turn', json={'action': 'P'}, headers={'X-Profile': '1'})
+        output = tempfile.mkdtemp()
+        try:
+            merged_path = os.path.join(output, 'merged.collapsed')
+            pstats_path = os.path.join(output, 'merged.pstats')
+            code = merge_profiles.main([ProfilingConfig.PROFILE_DIR, '-o', merged_path, '--pstats', pstats_path])
+            self.assertEqual(code, 0)
+            totals = [sum(read_collapsed(os.path.join(ProfilingConfig.PROFILE_DIR, name)).values())
+                      for name in os.listdir(ProfilingConfig.PROFILE_DIR) if name.endswith('.collapsed')]
+            self.assertEqual(sum(read_collapsed(merged_path).values()), sum(totals))
+            self.assertTrue(os.path.exists(pstats_path))
+        finally:
+            shutil.rmtree(output, ignore_errors=True)
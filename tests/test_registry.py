@@ -0,0 +1,216 @@
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from app.models.game import Game
+from app.services.game_registry import GameRegistry
+from app.storage.cached_store import CachedStore
+from app.storage.filesystem_store import FilesystemStore
+from app.utils.exceptions import StaleStateError
+from tests.base import BaseTestCase
+
+
+class TestGameRegistry(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.store = CachedStore(FilesystemStore(self.directory, ttl=60))
+        self.registry = GameRegistry(self.store)
+        game = Game(seed=1)
+        game.start()
+        self.game_id = self.registry.create(game)
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    @staticmethod
+    def play_all(game):
+        game.play_turn('P')
+
+    def test_held_games_are_not_read_from_the_store(self):
+        """Test that moves on a game the worker holds skip loading it."""
+        with mock.patch.object(self.store, 'load', side_effect=AssertionError("game loaded")):
+            game, _ = self.registry.update(self.game_id, self.play_all)
+            self.registry.update(self.game_id, self.play_all)
+        self.assertEqual(game.version, 2)
+        self.assertEqual(self.store.load(self.game_id, use_cache=False)['version'], 2)
+
+    def test_game_changed_by_another_worker_is_reloaded(self):
+        """Test that a held game that another worker moved on is re-read and the move applied to it."""
+        other = GameRegistry(self.store)
+        other.update(self.game_id, self.play_all)
+        game, _ = self.registry.update(self.game_id, self.play_all)
+        self.assertEqual(game.version, 2)
+        self.assertEqual(self.store.load(self.game_id, use_cache=False)['version'], 2)
+
+    def test_failed_move_on_a_stale_game_is_retried(self):
+        """Test that a move failing on a held game another worker moved on is applied again to the stored game."""
+        other = GameRegistry(self.store)
+        moved, _ = other.update(self.game_id, self.play_all)
+        cheapest = min(range(len(moved.central['active'])), key=lambda index: moved.central['active'][index].cost)
+        game, _ = self.registry.update(self.game_id, lambda game: game.play_turn('B', cheapest))
+        self.assertEqual((game.version, len(game.pO['discard'])), (2, 1))
+        self.assertEqual(self.store.load(self.game_id, use_cache=False)['version'], 2)
+
+    def test_no_op_on_a_stale_game_reads_the_stored_game(self):
+        """Test that a move changing nothing on a held game another worker moved on returns the stored game."""
+        GameRegistry(self.store).update(self.game_id, self.play_all)
+        game, version = self.registry.update(self.game_id, lambda game: game.version)
+        self.assertEqual((game.version, version), (1, 1))
+
+    def test_lost_race_raises_stale_state_error(self):
+        """Test that a game saved by another worker while it was being changed is not overwritten."""
+        registry = GameRegistry(self.store, idle_timeout=0)
+        other = GameRegistry(self.store, idle_timeout=0)
+
+        def racing_move(game):
+            other.update(self.game_id, self.play_all)
+            game.play_turn('P')
+
+        with self.assertRaises(StaleStateError):
+            registry.update(self.game_id, racing_move)
+        self.assertEqual(self.store.load(self.game_id, use_cache=False)['version'], 1)
+
+    def test_moves_within_a_worker_are_serialized(self):
+        """Test that concurrent moves on one game in one worker are all applied, one after the other."""
+        registry = GameRegistry(self.store, idle_timeout=0)
+        errors = []
+
+        def move():
+            try:
+                registry.update(self.game_id, self.play_all)
+            except Exception as e:  # Collected for the assertion below
+                errors.append(e)
+
+        threads = [threading.Thread(target=move) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.store.load(self.game_id, use_cache=False)['version'], 8)
+
+    def test_games_are_spread_over_a_fixed_lock_table(self):
+        """Test that a game always gets the same lock, taken from a table of lock_shards locks."""
+        registry = GameRegistry(self.store, lock_shards=4)
+        self.assertIs(registry.lock('a'), registry.lock('a'))
+        self.assertEqual(len({id(registry.lock(str(index))) for index in range(100)}), 4)
+
+    def test_failed_moves_keep_the_game(self):
+        """Test that a move rejected by the game neither saves it nor drops it from memory."""
+        with self.assertRaises(ValueError), \
+                mock.patch.object(self.store, 'load', side_effect=AssertionError("game loaded")):
+            self.registry.update(self.game_id, lambda game: game.play_turn('nonsense'))
+        self.assertEqual(len(self.registry), 1)
+        self.assertEqual(self.store.load(self.game_id, use_cache=False)['version'], 0)
+
+    def test_sweep_drops_idle_games_in_bulk(self):
+        """Test that a sweep drops the games idle for idle_timeout and purges the store."""
+        registry = GameRegistry(self.store, idle_timeout=60)
+        now = time.monotonic()
+        with mock.patch('app.services.game_registry.time.monotonic', return_value=now):
+            for _ in range(3):
+                registry.create(Game())
+        with mock.patch('app.services.game_registry.time.monotonic', return_value=now + 30):
+            registry.create(Game())
+        with mock.patch('app.services.game_registry.time.monotonic', return_value=now + 61), \
+                mock.patch.object(self.store, 'purge_expired', return_value=0) as purge_expired:
+            registry.sweep()
+        self.assertEqual(len(registry), 1)
+        purge_expired.assert_called_once_with()
+
+    def test_games_can_be_stored_as_their_log(self):
+        """Test that the log format stores the seed and log, with the new entries as deltas, and replays them."""
+        registry = GameRegistry(self.store, idle_timeout=0, state_format='log')
+        game = Game('random', seed=5)
+        game.start()
+        game_id = registry.create(game)
+        for action in ('P', 'A', 'E', 'P'):
+            game, _ = registry.update(game_id, lambda game: game.play_turn(action))
+        record = self.store.load(game_id, use_cache=False)
+        self.assertNotIn('central', record)
+        self.assertEqual((record['seed'], record['log']), (5, game.log))
+        self.assertEqual(len(record['log']), 4)
+        self.assertEqual(Game.from_state(record).get_state(include_rng=True), game.get_state(include_rng=True))
+
+    def test_games_stored_in_another_format_are_saved_in_full(self):
+        """Test that switching formats never applies a delta of one format to a snapshot of the other."""
+        logged = GameRegistry(self.store, idle_timeout=0, state_format='log')
+        game = Game(seed=2)
+        game.start()
+        game_id = logged.create(game)
+        registry = GameRegistry(self.store, idle_timeout=0)
+        registry.update(game_id, self.play_all)
+        state = self.store.load(game_id, use_cache=False)
+        self.assertIn('central', state)
+        self.assertEqual(state['version'], 1)
+
+        logged.update(self.game_id, self.play_all)
+        logged.update(self.game_id, self.play_all)
+        self.assertIn('central', self.store.load(self.game_id, use_cache=False))
+        with self.assertRaises(ValueError):
+            GameRegistry(self.store, state_format='json')
+
+    def test_missing_game(self):
+        """Test that updating a game that does not exist returns no game."""
+        self.assertEqual(self.registry.update('missing', self.play_all), (None, None))
+
+
+class TestLobbyRoutes(BaseTestCase):
+
+    def test_session_plays_several_games(self):
+        """Test that games created in the lobby are played and listed independently."""
+        first = self.client.post('/games', json={'opponent_type': 'A'})
+        self.assertEqual(first.status_code, 201)
+        first_id = first.get_json()['game_id']
+        second_id = self.client.post('/games', json={'opponent_type': 'Q'}).get_json()['game_id']
+
+        played = self.client.post(f'/games/{first_id}/play_turn', json={'action': 'play_all'})
+        self.assertEqual(played.status_code, 200)
+        self.assertEqual(played.get_json()['current_status']['player']['hand'], [])
+        self.assertEqual(len(self.client.get(f'/games/{second_id}/status').get_json()['current_status']
+                             ['player']['hand']), 5)
+
+        games = self.client.get('/games').get_json()['games']
+        self.assertEqual([(game['game_id'], game['version']) for game in games], [(first_id, 1), (second_id, 0)])
+
+    def test_games_of_other_sessions_are_not_found(self):
+        """Test that a game ID outside the session is answered with 404."""
+        game_id = self.client.post('/games', json={}).get_json()['game_id']
+        with self.app.test_client() as other:
+            self.assertEqual(other.get(f'/games/{game_id}/status').status_code, 404)
+            self.assertEqual(other.post(f'/games/{game_id}/play_turn', json={'action': 'P'}).status_code, 404)
+
+    def test_delete_and_session_limit(self):
+        """Test that games can be deleted and that the oldest one goes beyond MAX_SESSION_GAMES."""
+        self.app.config['MAX_SESSION_GAMES'] = 2
+        ids = [self.client.post('/games', json={}).get_json()['game_id'] for _ in range(3)]
+        self.assertEqual([game['game_id'] for game in self.client.get('/games').get_json()['games']], ids[1:])
+        self.assertIsNone(self.app.extensions['game_store'].load(ids[0]))
+
+        self.assertEqual(self.client.delete(f'/games/{ids[1]}').status_code, 200)
+        self.assertEqual(self.client.get(f'/games/{ids[1]}/status').status_code, 404)
+        self.assertEqual([game['game_id'] for game in self.client.get('/games').get_json()['games']], ids[2:])
+
+    def test_start_game_is_the_current_game(self):
+        """Test that the game of /start is listed as the current one and reachable by ID."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        games = self.client.get('/games').get_json()['games']
+        self.assertEqual(len(games), 1)
+        self.assertTrue(games[0]['current'])
+        self.assertEqual(self.client.get(f"/games/{games[0]['game_id']}/status").get_json(),
+                         self.client.get('/status').get_json())
+
+    def test_lost_race_is_a_conflict(self):
+        """Test that a move saved by another worker first is answered with 409."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        self.app.extensions['game_registry'].idle_timeout = 0
+        backend = self.app.extensions['game_store'].backend
+        with mock.patch.object(backend, 'save_delta', side_effect=StaleStateError("moved on")):
+            response = self.client.post('/play_turn', json={'action': 'play_all'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(len(self.client.get('/status').get_json()['current_status']['player']['hand']), 5)
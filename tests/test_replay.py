@@ -0,0 +1,144 @@
+import asyncio
+import json
+import shutil
+import tempfile
+from unittest import mock
+
+from app import create_app
+from app.asgi import GameASGIApp
+from app.config import TestingConfig
+from app.models.game import Game
+from app.services.game_registry import GameRegistry
+from app.storage.base import decode_snapshot, encode_snapshot
+from app.storage.cached_store import CachedStore
+from app.storage.filesystem_store import FilesystemStore
+from tests.base import BaseTestCase
+
+
+class ReplayConfig(TestingConfig):
+    SESSION_TYPE = 'cookie'
+    STATE_FORMAT = 'log'
+    STATE_SNAPSHOT_INTERVAL = 4
+
+
+def played_game(actions, opponent_type='A', seed=3):
+    game = Game(opponent_type, seed=seed)
+    game.start()
+    for action in actions:
+        game.play_turn(action)
+    return game
+
+
+def parse_lines(data):
+    return [json.loads(line) for line in data.decode().splitlines()]
+
+
+class TestCheckpoints(BaseTestCase):
+
+    def test_record_is_replayed_from_its_checkpoint(self):
+        """Test that from_record starts from the checkpoint and replays only the actions logged after it."""
+        game = played_game(['P', 'A', 'E', 'P', 'A', 'E'])
+        record = game.get_record(checkpoint=True)
+        self.assertEqual(record['checkpoint']['version'], 6)
+        for action in ('P', 'E'):
+            game.play_turn(action)
+        record['log'] = game.log[:]
+        with mock.patch.object(Game, 'apply', autospec=True, side_effect=Game.apply) as apply:
+            restored = Game.from_record(record)
+        self.assertEqual([call.args[1] for call in apply.call_args_list], game.log[6:])
+        self.assertEqual(restored.get_state(include_rng=True), game.get_state(include_rng=True))
+        self.assertTrue(restored.replayable)
+
+    def test_earlier_versions_are_replayed_from_the_seed(self):
+        """Test that a version before the checkpoint is rebuilt from the seed, and matches the game at that version."""
+        game = played_game(['P', 'A'])
+        expected = game.get_state(include_rng=True)
+        for action in ('E', 'P', 'A', 'E'):
+            game.play_turn(action)
+        restored = Game.from_record(game.get_record(checkpoint=True), version=2)
+        self.assertEqual(restored.get_state(include_rng=True), expected)
+        self.assertEqual(restored.log, game.log[:2])
+
+    def test_checkpoint_is_stored_in_the_binary_format(self):
+        """Test that a stored record packs its checkpoint, random number generator included, and reads it back."""
+        record = played_game(['P', 'A', 'E']).get_record(checkpoint=True)
+        data = encode_snapshot(record)
+        self.assertIsInstance(json.loads(data)['checkpoint'], str)
+        self.assertLess(len(data), len(json.dumps(record)) // 2)
+        self.assertEqual(decode_snapshot(data), record)
+
+    def test_registry_stores_a_checkpoint_with_each_snapshot(self):
+        """Test that the log format writes a checkpoint at every full snapshot and restores games from it."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        store = CachedStore(FilesystemStore(directory, ttl=60, snapshot_interval=4))
+        registry = GameRegistry(store, idle_timeout=0, state_format='log')
+        game_id = registry.create(played_game([]))
+        self.assertNotIn('checkpoint', store.load(game_id, use_cache=False))
+        for action in ('P', 'A', 'E', 'P', 'A'):
+            game, _ = registry.update(game_id, lambda game: game.play_turn(action))
+        record = store.load(game_id, use_cache=False)
+        self.assertEqual((record['checkpoint']['version'], len(record['log'])), (4, 5))
+        self.assertEqual(Game.from_state(record).get_state(include_rng=True), game.get_state(include_rng=True))
+
+
+class TestReplayRoutes(BaseTestCase):
+
+    def create_app(self):
+        return create_app(ReplayConfig)
+
+    def start(self, actions):
+        game_id = self.client.post('/games', json={'opponent_type': 'A'}).get_json()['game_id']
+        self.client.post(f'/games/{game_id}/play_turns', json={'actions': actions})
+        return game_id
+
+    def test_replay_streams_a_status_per_version(self):
+        """Test that /replay streams one NDJSON line per version, ending at the game's current status."""
+        game_id = self.start(['P', 'A', 'E', 'P', 'A'])
+        response = self.client.get(f'/replay/{game_id}')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = parse_lines(response.data)
+        self.assertEqual([line['version'] for line in lines], list(range(6)))
+        self.assertEqual([line['action'] for line in lines][:3], [None, 'P', 'A'])
+        self.assertTrue(lines[3]['action'].startswith('E'))
+        status = self.client.get(f'/games/{game_id}/status').get_json()
+        self.assertEqual(lines[-1]['current_status'], status['current_status'])
+
+        lines = parse_lines(self.client.get(f'/replay/{game_id}?start=4').data)
+        self.assertEqual([(line['version'], line['action']) for line in lines], [(4, None), (5, 'A')])
+
+    def test_replay_errors(self):
+        """Test the answers of /replay for an invalid start, a game of another session and a game stored as piles."""
+        game_id = self.start(['P'])
+        for start in ('2', '-1', 'x'):
+            self.assertEqual(self.client.get(f'/replay/{game_id}?start={start}').status_code, 400)
+        self.assertEqual(self.client.get('/replay/unknown').status_code, 404)
+
+        store = self.app.extensions['game_store']
+        store.save(game_id, Game.from_state(store.load(game_id)).get_state())
+        response = self.client.get(f'/replay/{game_id}')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json()['error'], "This game is not stored as an action log and cannot be replayed.")
+
+    def test_replay_over_asgi(self):
+        """Test that the ASGI application streams the same replay, from the start given in the query string."""
+        game_id = self.start(['P', 'A', 'E'])
+        expected = self.client.get(f'/replay/{game_id}?start=1').data
+        cookie = self.client.get_cookie(self.app.config['SESSION_COOKIE_NAME'])
+        asgi = GameASGIApp(self.app)
+        messages, sent = [{'type': 'http.request', 'body': b''}], []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.sleep(3600)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': f'/replay/{game_id}', 'query_string': b'start=1',
+                 'headers': [(b'cookie', f'{cookie.key}={cookie.value}'.encode('latin-1'))]}
+        asyncio.run(asyncio.wait_for(asgi(scope, receive, send), 5))
+        headers = {name.decode(): value.decode() for name, value in sent[0]['headers']}
+        self.assertEqual((sent[0]['status'], headers['content-type']), (200, 'application/x-ndjson'))
+        self.assertEqual(b''.join(message.get('body', b'') for message in sent[1:]), expected)
@@ -1,3 +1,4 @@
+from app.models.game import Game
 from tests.base import BaseTestCase
 
 
@@ -156,3 +157,111 @@ class TestGameRoutes(BaseTestCase):
         self.client.post('/start', json={'opponent_type': 'A'})
         response = self.client.post('/play_turn', json={'action': 'play_that_card'})
         self.assertEqual(response.status_code, 400)
+
+    # Tests related to batches of actions
+    def test_play_turns_applies_actions_in_order(self):
+        """Test that a batch of actions leaves the game as the same actions sent one by one."""
+        actions = ['play_all', {'action': 'attack'}, {'action': 'end_turn'}]
+        self.client.post('/start', json={'opponent_type': 'A'})
+        with self.client.session_transaction() as sess:
+            state = self.app.extensions['game_store'].load(sess['game_id'])
+        response = self.client.post('/play_turns', json={'actions': actions})
+        data = response.get_json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['steps_applied'], 3)
+        self.assertNotIn('steps', data)
+
+        expected = Game.from_state(state)
+        for action in ('play_all', 'attack', 'end_turn'):
+            expected.play_turn(action)
+        self.assertEqual(data['current_status'], expected.get_status())
+        self.assertEqual(self.client.get('/status').get_json()['current_status'], expected.get_status())
+
+    def test_play_turns_keeps_actions_before_a_failed_step(self):
+        """Test that a failing step answers 400 naming it, and the actions before it are saved."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        actions = ['play_all', {'action': 'buy_card', 'card_index': 99}, 'attack']
+        response = self.client.post('/play_turns', json={'actions': actions})
+        data = response.get_json()
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(data['success'])
+        self.assertEqual(data['failed_step'], 1)
+        self.assertEqual(data['steps_applied'], 1)
+        self.assertIn('Invalid card index', data['error'])
+        status = self.client.get('/status').get_json()['current_status']
+        self.assertEqual(status['player']['hand'], [])
+        self.assertEqual(status, data['current_status'])
+
+    def test_play_turns_returns_each_step(self):
+        """Test that response='steps' returns the status after every action."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        response = self.client.post('/play_turns', json={'actions': ['play_all', 'attack'], 'response': 'steps'})
+        data = response.get_json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([step['action'] for step in data['steps']], ['play_all', 'attack'])
+        self.assertEqual(data['steps'][-1]['current_status'], data['current_status'])
+
+    def test_play_turns_rejects_malformed_batches(self):
+        """Test that malformed batches are rejected without applying any action."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        for actions in ([], ['play_all', {'card_index': 0}], ['play_all', {'action': 'buy_card'}],
+                        ['play_all', {'action': 'B', 'card_index': 'x'}], ['P'] * 51):
+            response = self.client.post('/play_turns', json={'actions': actions})
+            self.assertEqual(response.status_code, 400, actions)
+        self.assertEqual(self.client.post('/play_turns', json={'actions': ['P'], 'response': 'all'}).status_code, 400)
+        with self.client.session_transaction() as sess:
+            self.assertEqual(self.app.extensions['game_store'].load(sess['game_id'])['version'], 0)
+
+    def test_play_turns_without_starting_game(self):
+        """Test playing a batch of actions without starting a game."""
+        response = self.client.post('/play_turns', json={'actions': ['play_all']})
+        self.assertEqual(response.status_code, 400)
+
+    # Tests related to state storage
+    def test_game_state_is_kept_in_state_store(self):
+        """Test that the session only references the game held in the state store."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        with self.client.session_transaction() as sess:
+            game_id = sess['game_id']
+            self.assertNotIn('game_state', sess)
+        self.assertIsNotNone(self.app.extensions['game_store'].load(game_id))
+
+    def test_play_turn_after_game_expired(self):
+        """Test playing a turn when the stored game no longer exists."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        with self.client.session_transaction() as sess:
+            self.app.extensions['game_store'].delete(sess['game_id'])
+        response = self.client.post('/play_turn', json={'action': 'P'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['error'], "Game not started. Please start a game first.")
+
+    def test_turns_are_persisted_as_deltas(self):
+        """Test that small actions append deltas which are replayed on the next request."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        self.client.post('/play_turn', json={'action': 'play_all'})
+        self.client.post('/play_turn', json={'action': 'attack'})
+        with self.client.session_transaction() as sess:
+            game_id = sess['game_id']
+        backend = self.app.extensions['game_store'].backend
+        snapshot, deltas = backend._read(game_id)
+        self.assertEqual(len(deltas), 2)
+        state = backend.load(game_id)
+        self.assertEqual(state['version'], 2)
+        self.assertEqual(state['pO']['hand'], [])
+        self.assertEqual(state['pO']['attack'], 0)
+
+    def test_start_game_with_random_opponent(self):
+        """Test that a registered policy other than the original two can be chosen as the opponent."""
+        self.client.post('/start', json={'opponent_type': 'R'})
+        self.client.post('/play_turn', json={'action': 'play_all'})
+        response = self.client.post('/play_turn', json={'action': 'end_turn'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/status').get_json()['current_status'], response.get_json()['current_status'])
+
+    def test_start_game_with_expert_opponent(self):
+        """Test that the expert opponent takes its turns through the API."""
+        self.client.post('/start', json={'opponent_type': 'expert'})
+        self.client.post('/play_turn', json={'action': 'play_all'})
+        response = self.client.post('/play_turn', json={'action': 'end_turn'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['game_status'], 'running')
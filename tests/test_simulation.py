@@ -0,0 +1,224 @@
+import importlib.util
+import io
+import json
+import random
+import time
+import unittest
+from contextlib import redirect_stdout
+
+from app.models.catalog import BAKER, COST, CROSSBOWMAN, LEVY, SWORDSMAN, TAILOR, THIEF, THUG, get_card
+from app.models.game import Game
+from app.simulation.engine import DRAW, SimulationResult, play_game, simulate
+from app.simulation.game_loop import play_game_loop
+from app.simulation.lookahead import EXPERT, ExpertPolicy
+from app.models.policies import ACQUISITIVE, AGGRESSIVE, get_policy
+from app.simulation.runner import game_seed, run_chunk, run_parallel
+from simulate import main
+from tests.base import BaseTestCase
+
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+
+
+class TestPolicies(BaseTestCase):
+
+    def test_greedy_buys_most_expensive_affordable_card(self):
+        """Test that greedy policies pick the highest cost they can afford."""
+        market = [THUG, BAKER, CROSSBOWMAN]
+        self.assertEqual(AGGRESSIVE.choose(market, [], 3, None), 2)
+        self.assertEqual(AGGRESSIVE.choose(market, [], 2, None), 1)
+        self.assertIsNone(AGGRESSIVE.choose(market, [], 0, None))
+
+    def test_tie_break_on_attack_or_money(self):
+        """Test that ties on cost are broken on attack (aggressive) or money (acquisitive)."""
+        market = [TAILOR, CROSSBOWMAN]
+        self.assertEqual(AGGRESSIVE.choose(market, [], 3, None), 1)
+        self.assertEqual(ACQUISITIVE.choose(market, [], 3, None), 0)
+
+    def test_earliest_card_wins_a_full_tie(self):
+        """Test that the earliest market card wins an exact tie."""
+        self.assertEqual(AGGRESSIVE.choose([SWORDSMAN, CROSSBOWMAN], [], 3, None), 0)
+        self.assertEqual(AGGRESSIVE.choose([CROSSBOWMAN, SWORDSMAN], [], 3, None), 0)
+
+    def test_supplement_is_bought_with_index_after_market(self):
+        """Test that the supplement is chosen using the index after the last market card."""
+        self.assertEqual(AGGRESSIVE.choose([BAKER], [LEVY], 2, None), 1)
+        self.assertEqual(ACQUISITIVE.choose([BAKER], [LEVY], 2, None), 0)
+
+    def test_get_policy_aliases(self):
+        """Test looking up policies by name and alias."""
+        self.assertIs(get_policy('A'), AGGRESSIVE)
+        self.assertIs(get_policy('acquisitive'), ACQUISITIVE)
+        with self.assertRaises(ValueError):
+            get_policy('unknown')
+
+
+class TestSimulation(BaseTestCase):
+
+    def test_same_seed_gives_same_results(self):
+        """Test that a seeded simulation is reproducible."""
+        first = simulate(200, AGGRESSIVE, ACQUISITIVE, seed=42)
+        second = simulate(200, AGGRESSIVE, ACQUISITIVE, seed=42)
+        self.assertEqual(first.to_dict(), second.to_dict())
+        self.assertEqual(first.games, 200)
+
+    def test_game_stops_at_max_rounds(self):
+        """Test that a game that never ends is declared a draw."""
+        class NeverBuy:
+            name = 'never'
+
+            def choose(self, market, supplement, money, rng):
+                return None
+
+        outcome, rounds = play_game(NeverBuy(), NeverBuy(), random.Random(1), max_rounds=1)
+        self.assertEqual((outcome, rounds), (DRAW, 1))
+
+    def test_purchases_are_counted(self):
+        """Test that purchases are added to the per-card counters."""
+        purchases = [[0] * 12, [0] * 12]
+        play_game(AGGRESSIVE, ACQUISITIVE, random.Random(3), purchases=purchases)
+        self.assertGreater(sum(purchases[0]) + sum(purchases[1]), 0)
+        self.assertLessEqual(purchases[0][THIEF] + purchases[1][THIEF], 1)
+
+    def test_merge(self):
+        """Test that merging results adds up wins, lengths and purchases."""
+        first = run_chunk('aggressive', 'acquisitive', 5, 0, 30)
+        second = run_chunk('aggressive', 'acquisitive', 5, 30, 100)
+        merged = SimulationResult().merge(first).merge(second)
+        self.assertEqual(merged.to_dict(), run_chunk('aggressive', 'acquisitive', 5, 0, 100).to_dict())
+
+    def test_command_line(self):
+        """Test the simulate.py entry point."""
+        output = io.StringIO()
+        with redirect_stdout(output):
+            main(['--games', '50', '--seed', '7', '--player', 'Q', '--computer', 'random', '--json'])
+        summary = json.loads(output.getvalue())
+        self.assertEqual(summary['games'], 50)
+        self.assertEqual(summary['player_policy'], 'acquisitive')
+        self.assertAlmostEqual(sum(summary['win_rates'].values()), 1.0)
+
+
+class TestParallelRunner(BaseTestCase):
+
+    def test_game_seeds_are_distinct(self):
+        """Test that different batch seeds and game indices never share a game seed, whatever their signs."""
+        seeds = {game_seed(seed, index) for seed in range(-50, 51) for index in (0, 1, 2**32 - 1)}
+        self.assertEqual(len(seeds), 101 * 3)
+        self.assertNotEqual(run_chunk('random', 'random', -7, 0, 20).to_dict(),
+                            run_chunk('random', 'random', 7, 0, 20).to_dict())
+
+    def test_results_do_not_depend_on_worker_count(self):
+        """Test that a seeded batch gives the same results with one or several workers."""
+        single = run_parallel(120, 'aggressive', 'random', seed=11, workers=1)
+        pooled = run_parallel(120, 'aggressive', 'random', seed=11, workers=3)
+        self.assertEqual(single.to_dict(), pooled.to_dict())
+        self.assertEqual(pooled.games, 120)
+
+    def test_game_loop_matches_fast_engine(self):
+        """Test that the Game model and the fast engine play identical games from the same seed."""
+        for index in range(25):
+            seed = game_seed(3, index)
+            fast_purchases = [[0] * 12, [0] * 12]
+            loop_purchases = [[0] * 12, [0] * 12]
+            fast = play_game(ACQUISITIVE, AGGRESSIVE, random.Random(seed), purchases=fast_purchases)
+            loop = play_game_loop(ACQUISITIVE, AGGRESSIVE, seed, purchases=loop_purchases)
+            self.assertEqual(fast, loop)
+            self.assertEqual(fast_purchases, loop_purchases)
+
+    def test_game_loop_plays_any_registered_opponent(self):
+        """Test that Game plays every registered policy as its opponent, like the fast engine."""
+        random_policy = get_policy('random')
+        for index in range(10):
+            seed = game_seed(5, index)
+            fast = play_game(AGGRESSIVE, random_policy, random.Random(seed))
+            self.assertEqual(play_game_loop(AGGRESSIVE, random_policy, seed), fast)
+
+
+class TestExpertPolicy(BaseTestCase):
+
+    def computer_buying(self, seed):
+        """
+        Returns a game whose computer is about to buy, with its market view and money.
+        """
+        game = Game('expert', seed=seed)
+        game.start()
+        game.play_turn('P')
+        game.pC['active'], game.pC['hand'] = game.pC['hand'], []
+        market = [card.card_id for card in game.central['active']]
+        supplement = [card.card_id for card in game.central['supplement']]
+        return game, market, supplement, sum(card.money for card in game.pC['active'])
+
+    def test_decision_reads_the_game_without_changing_it(self):
+        """Test that the expert picks an affordable purchase and leaves the game as it found it."""
+        game, market, supplement, money = self.computer_buying(7)
+        before = game.get_state()
+        choice = ExpertPolicy(budget=1, max_rollouts=60).choose_in_game(game, market, supplement, money)
+        self.assertEqual(game.get_state(), before)
+        self.assertTrue(choice is None or COST[(market + supplement)[choice]] <= money)
+
+    def test_decisions_are_reproducible_within_the_rollout_cap(self):
+        """Test that seeded games make the same decisions when the rollout cap, not the time budget, binds."""
+        expert = ExpertPolicy(budget=10, max_rollouts=60)
+        choices = []
+        for _ in range(2):
+            game, market, supplement, money = self.computer_buying(8)
+            choices.append((expert.choose_in_game(game, market, supplement, money), game.rng.random()))
+        self.assertEqual(choices[0], choices[1])
+
+    def test_time_budget_caps_a_decision(self):
+        """Test that a decision stops running rollouts once its time budget is spent."""
+        game, market, supplement, money = self.computer_buying(9)
+        started = time.perf_counter()
+        ExpertPolicy(budget=0.01, max_rollouts=10 ** 9).choose_in_game(game, market, supplement, money)
+        self.assertLess(time.perf_counter() - started, 0.2)
+
+    def test_time_budget_caps_a_turn(self):
+        """Test that all the purchases of an end_turn share one time budget."""
+        game = Game(ExpertPolicy(budget=0.1, max_rollouts=10 ** 9), seed=2)
+        game.start()
+        game.pC['hand'] = [get_card(TAILOR)] * 5
+        started = time.perf_counter()
+        game.play_turn('E')
+        self.assertLess(time.perf_counter() - started, 0.15)
+        self.assertGreater(len(game.log[-1].split()), 2)
+
+    def test_buys_like_its_fallback_without_a_game(self):
+        """Test that the simulators, which have no Game, get the fallback policy's purchases."""
+        self.assertIs(get_policy('X'), EXPERT)
+        market = [THUG, BAKER, CROSSBOWMAN]
+        self.assertEqual(EXPERT.choose(market, [LEVY], 3, None), AGGRESSIVE.choose(market, [LEVY], 3, None))
+
+
+@unittest.skipUnless(HAS_NUMPY, "the vectorized engine needs NumPy")
+class TestVectorizedEngine(BaseTestCase):
+
+    def test_matches_the_fast_engine(self):
+        """Test that the vectorized engine plays the same game as the fast engine, statistically."""
+        from app.simulation.vectorized import simulate_vectorized
+        vectorized = simulate_vectorized(20000, 'acquisitive', 'aggressive', seed=1)
+        fast = simulate(20000, ACQUISITIVE, AGGRESSIVE, seed=1)
+        self.assertEqual(vectorized.games, 20000)
+        for outcome, rate in fast.win_rates().items():
+            self.assertAlmostEqual(vectorized.win_rates()[outcome], rate, delta=0.025)
+        self.assertAlmostEqual(vectorized.to_dict()['rounds']['mean'], fast.to_dict()['rounds']['mean'], delta=0.1)
+
+    def test_same_seed_gives_same_results(self):
+        """Test that a seeded vectorized batch is reproducible."""
+        from app.simulation.vectorized import simulate_vectorized
+        self.assertEqual(simulate_vectorized(500, seed=4).to_dict(), simulate_vectorized(500, seed=4).to_dict())
+
+    def test_sweep(self):
+        """Test that a sweep plays one batch per value with the changed card stat."""
+        from app.simulation.vectorized import CardStats, sweep
+        results = sweep('Archer', 'attack', [0, 10], 2000, seed=2)
+        self.assertEqual([value for value, _ in results], [0, 10])
+        weak, strong = (result.win_rates()['player'] for _, result in results)
+        self.assertGreater(strong, weak)
+        self.assertEqual(CardStats.from_catalog().replace('archer', attack=10).attack[10], 10)
+        with self.assertRaises(ValueError):
+            sweep('Archer', 'speed', [1], 10)
+
+    def test_only_greedy_policies(self):
+        """Test that policies the engine cannot vectorize are rejected."""
+        from app.simulation.vectorized import simulate_vectorized
+        with self.assertRaises(ValueError):
+            simulate_vectorized(10, 'random')
@@ -0,0 +1,57 @@
+import json
+from unittest import mock
+
+from app.models.game import Game
+from app.services.status_cache import StatusCache
+from tests.base import BaseTestCase
+
+
+class TestStatusCache(BaseTestCase):
+
+    def test_only_the_cached_version_is_served(self):
+        """Test that a status is served for its own version only and that older versions never replace it."""
+        cache = StatusCache()
+        rendered = cache.put('game', 3, {'game_status': 'running'})
+        self.assertIs(cache.get('game', 3), rendered)
+        self.assertEqual(json.loads(rendered.json), {'game_status': 'running'})
+        self.assertIsNone(cache.get('game', 4))
+
+        cache.put('game', 2, {'game_status': 'ended'})
+        self.assertIs(cache.get('game', 3), rendered)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_least_recently_used_games_are_dropped(self):
+        """Test that the cache keeps at most `maxsize` games."""
+        cache = StatusCache(maxsize=2)
+        cache.put('a', 0, {})
+        cache.put('b', 0, {})
+        cache.get('a', 0)
+        cache.put('c', 0, {})
+        self.assertIsNone(cache.get('b', 0))
+        self.assertIsNotNone(cache.get('a', 0))
+        cache.forget('a')
+        self.assertIsNone(cache.get('a', 0))
+
+
+class TestCachedStatusRoutes(BaseTestCase):
+
+    def test_repeated_polls_do_not_rebuild_the_status(self):
+        """Test that /status polls after a turn are served from the status the turn built."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        played = self.client.post('/play_turn', json={'action': 'play_all'}).get_json()
+
+        with mock.patch.object(Game, 'from_state', side_effect=AssertionError("game restored")), \
+                mock.patch.object(Game, 'get_status', side_effect=AssertionError("status rebuilt")):
+            for _ in range(3):
+                response = self.client.get('/status')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.get_json(), played)
+
+    def test_new_version_is_rendered(self):
+        """Test that the status is rebuilt once the game moves to a new version."""
+        self.client.post('/start', json={'opponent_type': 'A'})
+        before = self.client.get('/status').get_json()
+        self.client.post('/play_turn', json={'action': 'play_all'})
+        after = self.client.get('/status').get_json()
+        self.assertNotEqual(before['current_status'], after['current_status'])
+        self.assertEqual(after['current_status']['player']['hand'], [])
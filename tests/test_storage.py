@@ -0,0 +1,309 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest.mock import patch
+
+from app.models.game import Game
+from app.storage.cached_store import CachedStore
+from app.storage.filesystem_store import FilesystemStore
+from app.storage.redis_store import RedisStore, RespConnection
+from app.storage.sqlite_store import SQLiteStore
+from app.utils.exceptions import StaleStateError
+from tests.base import BaseTestCase
+from tests.redis_stub import RedisStub
+
+
+class StoreContractMixin:
+    """Behaviour shared by every state store backend."""
+
+    def make_store(self, ttl=None):
+        raise NotImplementedError
+
+    def setUp(self):
+        super().setUp()
+        self.state = Game().get_state()
+
+    def test_save_and_load(self):
+        """Test that a saved state is loaded back unchanged."""
+        store = self.make_store()
+        store.save('game1', self.state)
+        self.assertEqual(store.load('game1'), self.state)
+
+    def test_load_missing(self):
+        """Test loading a game that was never saved."""
+        self.assertIsNone(self.make_store().load('missing'))
+
+    def test_save_overwrites(self):
+        """Test that saving again replaces the previous state."""
+        store = self.make_store()
+        store.save('game1', self.state)
+        self.state['pO']['health'] = 12
+        store.save('game1', self.state)
+        self.assertEqual(store.load('game1')['pO']['health'], 12)
+
+    def test_delete(self):
+        """Test removing a game."""
+        store = self.make_store()
+        store.save('game1', self.state)
+        store.save_delta('game1', {'version': 1, 'pO': {'health': 12}})
+        store.delete('game1')
+        self.assertIsNone(store.load('game1'))
+
+    def test_deltas_are_replayed_on_load(self):
+        """Test that deltas appended after a snapshot are applied when loading."""
+        store = self.make_store()
+        store.save('game1', self.state)
+        store.save_delta('game1', {'version': 1, 'pO': {'health': 25, 'money': 3}})
+        store.save_delta('game1', {'version': 2, 'pC': {'health': 20}})
+        state = store.load('game1')
+        self.assertEqual(state['version'], 2)
+        self.assertEqual((state['pO']['health'], state['pO']['money'], state['pC']['health']), (25, 3, 20))
+        self.assertEqual(state['pO']['hand'], self.state['pO']['hand'])
+
+    def test_snapshot_discards_deltas(self):
+        """Test that a full snapshot replaces the delta log."""
+        store = self.make_store()
+        store.save('game1', self.state)
+        store.save_delta('game1', {'version': 1, 'pO': {'health': 25}})
+        store.save('game1', dict(self.state, version=2))
+        self.assertEqual(store.load('game1')['pO']['health'], self.state['pO']['health'])
+
+    def test_deltas_older_than_snapshot_are_ignored(self):
+        """Test that a delta racing with a newer snapshot cannot roll the game back."""
+        store = self.make_store()
+        store.save('game1', dict(self.state, version=5))
+        store.save_delta('game1', {'version': 4, 'pO': {'health': 1}})
+        self.assertEqual(store.load('game1')['pO']['health'], self.state['pO']['health'])
+
+    def test_version_is_read_without_the_state(self):
+        """Test that the stored version follows snapshots and deltas, and is None for a missing game."""
+        store = self.make_store()
+        self.assertIsNone(store.version('game1'))
+        store.save('game1', dict(self.state, version=3))
+        self.assertEqual(store.version('game1'), 3)
+        store.save_delta('game1', {'version': 4, 'pO': {'health': 25}})
+        self.assertEqual(store.version('game1'), 4)
+        store.delete('game1')
+        self.assertIsNone(store.version('game1'))
+
+    def test_conditional_writes_check_the_stored_version(self):
+        """Test that writes expecting another version than the stored one are rejected."""
+        store = self.make_store()
+        store.save('game1', self.state)
+        store.save_delta('game1', {'version': 1, 'pO': {'health': 25}}, expected_version=0)
+        with self.assertRaises(StaleStateError):
+            store.save_delta('game1', {'version': 1, 'pO': {'health': 1}}, expected_version=0)
+        with self.assertRaises(StaleStateError):
+            store.save('game1', dict(self.state, version=1), expected_version=0)
+        self.assertEqual(store.load('game1')['pO']['health'], 25)
+
+        store.save('game1', dict(self.state, version=2), expected_version=1)
+        store.save_delta('game1', {'version': 3, 'pO': {'health': 7}}, expected_version=2)
+        self.assertEqual(store.load('game1')['pO']['health'], 7)
+
+    def test_conditional_writes_to_a_missing_game_are_rejected(self):
+        """Test that a game deleted since it was loaded is not written back."""
+        store = self.make_store()
+        store.save('game1', self.state)
+        store.delete('game1')
+        with self.assertRaises(StaleStateError):
+            store.save_delta('game1', {'version': 1, 'pO': {'health': 25}}, expected_version=0)
+        self.assertIsNone(store.load('game1'))
+
+    def test_pairing_takes_the_oldest_waiting_game(self):
+        """Test that pair queues a game when none waits and otherwise takes the oldest other one."""
+        store = self.make_store()
+        self.assertIsNone(store.pair('pvp', 'a', 60))
+        self.assertEqual(store.pair('pvp', 'b', 60), 'a')
+        self.assertIsNone(store.pair('pvp', 'c', 60))
+        # Asking again replaces the game's own entry rather than pairing it with itself.
+        self.assertIsNone(store.pair('pvp', 'c', 60))
+        self.assertEqual(store.pair('pvp', 'd', 60), 'c')
+        self.assertIsNone(store.pair('other', 'e', 60))
+        self.assertIsNone(store.pair('pvp', 'f', 60))
+
+    def test_stale_queue_entries_are_discarded(self):
+        """Test that games queued more than max_wait seconds ago are not taken."""
+        store = self.make_store()
+        now = time.time()
+        with patch('app.storage.base.time.time', return_value=now - 120):
+            store.pair('pvp', 'old', 60)
+        store.pair('pvp', 'new', 60)
+        self.assertEqual(store.pair('pvp', 'late', 60), 'new')
+
+    def test_snapshot_due(self):
+        """Test that full snapshots are requested every snapshot_interval versions."""
+        store = self.make_store()
+        store.snapshot_interval = 3
+        self.assertEqual([version for version in range(1, 10) if store.snapshot_due(version)], [3, 6, 9])
+        self.assertTrue(store.snapshot_due(7, previous_version=5))
+        self.assertFalse(store.snapshot_due(8, previous_version=6))
+
+
+class TestFilesystemStore(StoreContractMixin, BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_store(self, ttl=None):
+        return FilesystemStore(self.directory, ttl=ttl)
+
+    def test_expired_games_are_not_loaded(self):
+        """Test that a game older than the TTL is treated as missing and removed."""
+        store = self.make_store(ttl=60)
+        store.save('game1', self.state)
+        path = os.path.join(self.directory, 'game1.state')
+        os.utime(path, (time.time() - 120, time.time() - 120))
+        self.assertIsNone(store.load('game1'))
+        self.assertFalse(os.path.exists(path))
+
+    def test_purge_expired(self):
+        """Test bulk removal of expired games."""
+        store = self.make_store(ttl=60)
+        store.save('old', self.state)
+        store.save('new', self.state)
+        os.utime(os.path.join(self.directory, 'old.state'), (time.time() - 120, time.time() - 120))
+        self.assertEqual(store.purge_expired(), 1)
+        self.assertIsNotNone(store.load('new'))
+
+
+class TestSQLiteStore(StoreContractMixin, BaseTestCase):
+
+    def make_store(self, ttl=None):
+        return SQLiteStore(':memory:', ttl=ttl)
+
+    def test_purge_expired(self):
+        """Test bulk removal of expired games."""
+        store = self.make_store(ttl=60)
+        with patch('app.storage.sqlite_store.time.time', return_value=time.time() - 120):
+            store.save('old', self.state)
+        store.save('new', self.state)
+        self.assertIsNone(store.load('old'))
+        self.assertEqual(store.purge_expired(), 0)
+        with patch('app.storage.sqlite_store.time.time', return_value=time.time() - 120):
+            store.save('old', self.state)
+        self.assertEqual(store.purge_expired(), 1)
+        self.assertIsNotNone(store.load('new'))
+
+
+class TestRedisStore(StoreContractMixin, BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server = RedisStub().start()
+
+    def tearDown(self):
+        super().tearDown()
+        self.server.stop()
+
+    def make_store(self, ttl=None):
+        return RedisStore(RespConnection.from_url(self.server.url), ttl=ttl)
+
+    def test_ttl_is_set_on_the_key(self):
+        """Test that expiry is delegated to the server."""
+        self.make_store(ttl=60).save('game1', self.state)
+        self.assertIn(b'flaskgame:state:game1', self.server.expiry)
+
+    def test_reconnects_after_connection_loss(self):
+        """Test that a dropped connection is re-established transparently."""
+        store = self.make_store()
+        store.save('game1', self.state)
+        store.connection._sock.close()
+        self.assertEqual(store.load('game1'), self.state)
+
+
+class TestCachedStore(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.backend = SQLiteStore(':memory:')
+        self.state = Game().get_state()
+
+    def test_repeated_loads_are_served_from_memory(self):
+        """Test that only the first load reaches the backend."""
+        self.backend.save('game1', self.state)
+        store = CachedStore(self.backend)
+        with patch.object(self.backend, 'load', wraps=self.backend.load) as load:
+            store.load('game1')
+            store.load('game1')
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(store.hits, 1)
+
+    def test_write_through(self):
+        """Test that saves reach the backend and populate the cache."""
+        store = CachedStore(self.backend)
+        store.save('game1', self.state)
+        self.assertEqual(self.backend.load('game1'), self.state)
+        with patch.object(self.backend, 'load') as load:
+            self.assertEqual(store.load('game1'), self.state)
+        load.assert_not_called()
+
+    def test_bypassing_the_cache(self):
+        """Test that use_cache=False always reads the backend."""
+        store = CachedStore(self.backend)
+        store.save('game1', self.state)
+        other = dict(self.state, aggressive=False)
+        self.backend.save('game1', other)
+        self.assertEqual(store.load('game1', use_cache=False), other)
+        self.assertEqual(store.load('game1'), other)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test that the cache never holds more than maxsize games."""
+        store = CachedStore(self.backend, maxsize=2)
+        store.save('a', self.state)
+        store.save('b', self.state)
+        store.load('a')
+        store.save('c', self.state)
+        self.assertEqual(list(store._entries), ['a', 'c'])
+
+    def test_entries_expire_after_ttl(self):
+        """Test that entries older than the TTL are re-read from the backend."""
+        store = CachedStore(self.backend, ttl=5)
+        now = time.monotonic()
+        with patch('app.storage.cached_store.time.monotonic', return_value=now):
+            store.save('game1', self.state)
+        with patch('app.storage.cached_store.time.monotonic', return_value=now + 10), \
+                patch.object(self.backend, 'load', wraps=self.backend.load) as load:
+            store.load('game1')
+        self.assertEqual(load.call_count, 1)
+
+    def test_save_delta_updates_the_cached_state(self):
+        """Test that a delta following the cached version is applied in memory."""
+        store = CachedStore(self.backend)
+        store.save('game1', dict(self.state, version=1))
+        store.save_delta('game1', {'version': 2, 'pO': {'health': 7}})
+        with patch.object(self.backend, 'load') as load:
+            self.assertEqual(store.load('game1')['pO']['health'], 7)
+        load.assert_not_called()
+
+    def test_save_delta_drops_a_stale_cached_state(self):
+        """Test that a delta skipping versions evicts the cached state instead of corrupting it."""
+        store = CachedStore(self.backend)
+        store.save('game1', dict(self.state, version=1))
+        self.backend.save_delta('game1', {'version': 2, 'pC': {'health': 9}})
+        store.save_delta('game1', {'version': 3, 'pO': {'health': 7}})
+        state = store.load('game1')
+        self.assertEqual((state['pO']['health'], state['pC']['health']), (7, 9))
+
+    def test_stale_write_drops_the_cached_state(self):
+        """Test that a write rejected for its version evicts the cached state."""
+        store = CachedStore(self.backend)
+        store.save('game1', dict(self.state, version=1))
+        self.backend.save_delta('game1', {'version': 2, 'pC': {'health': 9}})
+        with self.assertRaises(StaleStateError):
+            store.save_delta('game1', {'version': 2, 'pO': {'health': 7}}, expected_version=1)
+        state = store.load('game1')
+        self.assertEqual((state['pO']['health'], state['pC']['health']), (self.state['pO']['health'], 9))
+
+    def test_delete_invalidates_the_cache(self):
+        """Test that a deleted game is not served from the cache."""
+        store = CachedStore(self.backend)
+        store.save('game1', self.state)
+        store.delete('game1')
+        self.assertIsNone(store.load('game1'))